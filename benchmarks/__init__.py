@@ -0,0 +1 @@
+"""Benchmarks for Homi. Run each module with `python -m benchmarks.<name>` from the repo root."""
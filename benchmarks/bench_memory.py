@@ -0,0 +1,73 @@
+"""Bytes per device and per sensor: slot-based classes vs the old __dict__ layout.
+
+    python -m benchmarks.bench_memory --count 100000
+"""
+import argparse
+import gc
+import tracemalloc
+
+import devices
+import sensors
+
+
+DEVICE_CLASSES = [
+    devices.SmartLight, devices.SmartFan, devices.SmartAC, devices.SmartHeater,
+    devices.SmartDoorLock, devices.SmartCamera, devices.SmartMusicSystem, devices.SmartBlinds,
+    devices.SmartSprinkler, devices.SmartCoffeeMaker, devices.SmartVacuumCleaner,
+    devices.SmartDishwasher, devices.SmartTV,
+]
+
+SENSOR_CLASSES = [
+    sensors.TemperatureSensor, sensors.MotionSensor, sensors.LightSensor, sensors.DoorSensor,
+    sensors.HumiditySensor, sensors.SoilMoistureSensor, sensors.FloorCleanSensor, sensors.DirtSensor,
+]
+
+
+def dict_layout(cls):
+    # a subclass that does not declare __slots__ gets a per-instance __dict__ again,
+    # which is how every device and sensor was laid out before
+    return type(f"{cls.__name__}WithDict", (cls,), {})
+
+
+def bytes_per_instance(cls, count, names):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls(names[i], "Room") for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+
+def measure(classes, count):
+    names = [f"component-{i}" for i in range(count)]  # allocated up front, shared by both layouts
+    rows = []
+    for cls in classes:
+        before = bytes_per_instance(dict_layout(cls), count, names)
+        after = bytes_per_instance(cls, count, names)
+        rows.append((cls.__name__, before, after))
+    return rows
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"{'class':<22}{'__dict__ B':>12}{'slots B':>12}{'saved':>9}")
+    for name, before, after in rows:
+        print(f"{name:<22}{before:>12.1f}{after:>12.1f}{(1 - after / before):>8.0%}")
+    avg_before = sum(r[1] for r in rows) / len(rows)
+    avg_after = sum(r[2] for r in rows) / len(rows)
+    print(f"{'average':<22}{avg_before:>12.1f}{avg_after:>12.1f}{(1 - avg_after / avg_before):>8.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000, help="instances created per class")
+    args = parser.parse_args()
+
+    print_table(f"Devices ({args.count} per class)", measure(DEVICE_CLASSES, args.count))
+    print_table(f"Sensors ({args.count} per class)", measure(SENSOR_CLASSES, args.count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""How rule passes, modes and reports scale with the size of the home.
+
+    python -m benchmarks.bench_scaling --sizes 100,1000,10000 --out benchmarks/baselines/scaling.json
+    python -m benchmarks.bench_scaling --sizes 100,1000,10000 --compare benchmarks/baselines/scaling.json
+
+Each size N builds a synthetic home with N devices, N sensors and N/10 rooms, then
+times every operation `--repeat` times. Results (latency percentiles, memory, and a
+log-log scaling exponent per operation) are written as JSON so later runs can be
+compared against them; --compare exits with status 1 when an operation regressed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import generate_home
+
+
+def _operations(c):
+    rules = c.automation_rules
+    modes = ["Sleep", "Away", "Auto"]
+    mode_turn = [0]
+    probe = c.sensors[0]
+
+    def one_sensor_change():
+        probe.update_value(probe.value)
+        rules.apply_dirty()
+
+    def set_mode():
+        c.set_system_mode(modes[mode_turn[0] % len(modes)])
+        mode_turn[0] += 1
+
+    def show_status():
+        with contextlib.redirect_stdout(io.StringIO()):
+            c.show_status()
+
+    return [
+        ("apply_all_checks", rules.apply_all_checks),
+        ("apply_temperature_rules", rules.apply_temperature_rules),
+        ("apply_light_rules", rules.apply_light_rules),
+        ("apply_security_rules", rules.apply_security_rules),
+        ("apply_garden_rules", rules.apply_garden_rules),
+        ("apply_dishwasher_rules", rules.apply_dishwasher_rules),
+        ("apply_vacuum_rules", rules.apply_vacuum_rules),
+        ("apply_dirty_one_sensor", one_sensor_change),
+        ("set_system_mode", set_mode),
+        ("get_energy_report", c.get_energy_report),
+        ("get_energy_total", c.get_energy_total),
+        ("get_room_energy_report", c.get_room_energy_report),
+        ("show_status", show_status),
+    ]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = math.floor(k), math.ceil(k)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def time_operation(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    # tracemalloc slows everything down, so memory is taken from one extra, untimed run
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        "p50_ms": percentile(samples, 50),
+        "p90_ms": percentile(samples, 90),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": samples[-1],
+        "peak_alloc_kb": peak / 1024,
+    }
+
+
+def run_size(size, repeat, seed):
+    tracemalloc.start()
+    start = time.perf_counter()
+    c = generate_home(rooms=max(1, size // 10), devices=size, sensors=size, seed=seed)
+    build_ms = (time.perf_counter() - start) * 1000
+    home_kb = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+
+    result = {"build_ms": build_ms, "home_kb": home_kb, "operations": {}}
+    for name, fn in _operations(c):
+        result["operations"][name] = time_operation(fn, repeat)
+    return result
+
+
+def scaling_exponents(results):
+    """Slope of log(p50) against log(size) between the smallest and largest size: ~1 is linear."""
+    sizes = sorted(results, key=int)
+    if len(sizes) < 2:
+        return {}
+    small, large = results[sizes[0]]["operations"], results[sizes[-1]]["operations"]
+    ratio = math.log(int(sizes[-1]) / int(sizes[0]))
+    exponents = {}
+    for name in small:
+        a, b = small[name]["p50_ms"], large[name]["p50_ms"]
+        exponents[name] = math.log(b / a) / ratio if a > 0 and b > 0 else None
+    return exponents
+
+
+def compare(current, baseline, tolerance):
+    regressions = []
+    for size, data in current["results"].items():
+        old = baseline["results"].get(size)
+        if not old:
+            continue
+        for name, stats in data["operations"].items():
+            before = old["operations"].get(name, {}).get("p50_ms")
+            if before and stats["p50_ms"] > before * tolerance:
+                regressions.append((size, name, before, stats["p50_ms"]))
+    return regressions
+
+
+def print_report(report):
+    for size, data in sorted(report["results"].items(), key=lambda kv: int(kv[0])):
+        print(f"\n=== {size} devices / {size} sensors  (build {data['build_ms']:.0f} ms, home {data['home_kb']:.0f} KiB)")
+        print(f"{'operation':<26}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'peak KiB':>10}")
+        for name, s in data["operations"].items():
+            print(f"{name:<26}{s['p50_ms']:>10.3f}{s['p90_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['max_ms']:>10.3f}{s['peak_alloc_kb']:>10.1f}")
+
+    if report["scaling_exponents"]:
+        print("\nscaling exponent (p50 vs size, 1.0 = linear)")
+        for name, k in report["scaling_exponents"].items():
+            print(f"  {name:<26}{'n/a' if k is None else f'{k:.2f}'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Homi scalability benchmark")
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma separated device/sensor counts")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="allowed p50 slowdown factor")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "results": {},
+    }
+    for size in sizes:
+        report["results"][str(size)] = run_size(size, args.repeat, args.seed)
+    report["scaling_exponents"] = scaling_exponents(report["results"])
+
+    print_report(report)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.tolerance}x:")
+            for size, name, before, after in regressions:
+                print(f"  [{size}] {name}: {before:.3f} ms -> {after:.3f} ms")
+            return 1
+        print(f"\n✅ No regressions beyond {args.tolerance}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
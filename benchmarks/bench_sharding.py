@@ -0,0 +1,81 @@
+"""Rule-check throughput of many homes, in-process vs sharded over worker processes.
+
+    python -m benchmarks.bench_sharding --homes 2000 --shards 1,2,4,8
+
+Every round feeds `--readings` random readings to each home and then runs a full
+rule pass (apply_all_checks) in all of them. "inline" does this with every
+controller in this process; each shard count does it through HomeShards. The
+figure of merit is homes per second (home rule passes, readings included).
+"""
+import argparse
+import os
+import random
+import time
+
+from benchmarks.synthetic import generate_home, random_reading
+from sharding import HomeShards
+
+
+def _round_readings(template, homes, per_home, rng):
+    sensors = template.sensors
+    return [(h, [(s.name, random_reading(s, rng)) for s in rng.sample(sensors, per_home)]) for h in range(homes)]
+
+
+def bench_inline(args, template, rounds):
+    homes = [generate_home(args.rooms, args.devices, args.sensors, seed=h) for h in range(args.homes)]
+    start = time.perf_counter()
+    for readings in rounds:
+        for h, batch in readings:
+            homes[h].ingest_batch([(name, value, None) for name, value in batch], run_rules=False)
+        for c in homes:
+            c.apply_automation_rules(full=True)
+    return time.perf_counter() - start
+
+
+def bench_sharded(args, template, rounds, shards):
+    with HomeShards(shards) as pool:
+        for h in range(args.homes):
+            pool.add_home(h, generate_home, args.rooms, args.devices, args.sensors, h)
+        pool.flush()
+        start = time.perf_counter()
+        for readings in rounds:
+            for h, batch in readings:
+                for name, value in batch:
+                    pool.submit_reading(h, name, value)
+            pool.run_checks()
+        elapsed = time.perf_counter() - start
+        if pool.errors:
+            raise RuntimeError(pool.errors[0])
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Homi multi-home sharding benchmark")
+    parser.add_argument("--homes", type=int, default=2000)
+    parser.add_argument("--rooms", type=int, default=5)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--readings", type=int, default=4, help="random readings per home per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--shards", default=None, help="comma separated shard counts (default 1..cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    counts = [int(n) for n in args.shards.split(",")] if args.shards else sorted({1, 2, cores // 2 or 1, cores})
+    rng = random.Random(args.seed)
+    template = generate_home(args.rooms, args.devices, args.sensors)
+    rounds = [_round_readings(template, args.homes, args.readings, rng) for _ in range(args.rounds)]
+    passes = args.homes * args.rounds
+
+    print(f"{args.homes} homes x {args.rounds} rounds, {args.devices} devices / {args.sensors} sensors each, "
+          f"{cores} cores")
+    inline = bench_inline(args, template, rounds)
+    print(f"{'inline':<10}{passes / inline:>12.0f} homes/s")
+    for shards in counts:
+        elapsed = bench_sharded(args, template, rounds, shards)
+        print(f"{shards:<3}shards {passes / elapsed:>12.0f} homes/s   x{inline / elapsed:.2f} vs inline")
+
+
+if __name__ == "__main__":
+    main()
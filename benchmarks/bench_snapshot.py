@@ -0,0 +1,70 @@
+"""Snapshot, change log and restore cost of a large home.
+
+    python -m benchmarks.bench_snapshot --devices 50000 --sensors 50000
+
+Builds a synthetic home, writes a snapshot, appends `--changes` change log records
+through ordinary device and sensor updates, then restores the home from disk
+(snapshot load + log replay + rebuilding indexes and the energy ledger).
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_home, random_reading
+from persistence import StateStore
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Homi snapshot/restore benchmark")
+    parser.add_argument("--devices", type=int, default=50000)
+    parser.add_argument("--sensors", type=int, default=50000)
+    parser.add_argument("--changes", type=int, default=10000, help="change log records written before restoring")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    import random
+    rng = random.Random(args.seed)
+    c = generate_home(rooms=max(1, args.devices // 10), devices=args.devices, sensors=args.sensors, seed=args.seed)
+    directory = tempfile.mkdtemp(prefix="homi-bench-")
+    try:
+        store = StateStore(directory)
+        start = time.perf_counter()
+        store.attach(c)
+        snapshot_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for i in range(args.changes):
+            if i % 2:
+                device = c.devices[rng.randrange(len(c.devices))]
+                device.turn_off() if device.is_on else device.turn_on()
+            else:
+                sensor = c.sensors[rng.randrange(len(c.sensors))]
+                sensor.update_value(random_reading(sensor, rng), verbose=False)
+        log_us = (time.perf_counter() - start) * 1e6 / max(1, args.changes)
+        store.detach()
+
+        start = time.perf_counter()
+        state = StateStore(directory).load_state()
+        load_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        restored = StateStore(directory).restore()
+        restore_ms = (time.perf_counter() - start) * 1000
+
+        snapshot_kb = os.path.getsize(store.snapshot_path) / 1024
+        log_kb = os.path.getsize(store.log_path) / 1024
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"home: {len(c.devices)} devices, {len(c.sensors)} sensors")
+    print(f"snapshot write       {snapshot_ms:>10.1f} ms   ({snapshot_kb:.0f} KiB)")
+    print(f"change + log append  {log_us:>10.1f} us/change   ({args.changes} records, {log_kb:.0f} KiB)")
+    print(f"load + replay        {load_ms:>10.1f} ms")
+    print(f"full restore         {restore_ms:>10.1f} ms   ({len(restored.devices)} devices, {len(restored.sensors)} sensors)")
+    return 0 if len(state["devices"]) == len(c.devices) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Startup cost of the headless entry point against the GUI one.
+
+    python -m benchmarks.bench_startup --runs 10
+
+Each case runs in a fresh interpreter, so module imports are paid every time:
+
+  import main      what every GUI launch pays before a window appears (customtkinter, tkinter)
+  import homi      the headless entry point's imports
+  homi status      `python -m homi --no-state -c status`: imports, demo home, runtime start,
+                   one command answered and a clean shutdown
+
+Opening the GUI window itself needs a display and is not measured.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+CASES = [
+    ("import main", [sys.executable, "-c", "import main"]),
+    ("import homi", [sys.executable, "-c", "import homi"]),
+    ("homi status", [sys.executable, "-m", "homi", "--no-state", "-c", "status"]),
+]
+
+
+def time_run(cmd):
+    start = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Homi startup benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    # python itself, so the import cost can be told apart from interpreter startup
+    baseline = statistics.median(time_run([sys.executable, "-c", "pass"]) for _ in range(args.runs))
+    print(f"{'case':<14}{'median ms':>12}{'min ms':>10}{'minus python':>14}")
+    print(f"{'python':<14}{baseline:>12.1f}")
+    for name, cmd in CASES:
+        times = [time_run(cmd) for _ in range(args.runs)]
+        median = statistics.median(times)
+        print(f"{name:<14}{median:>12.1f}{min(times):>10.1f}{median - baseline:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
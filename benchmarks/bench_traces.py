@@ -0,0 +1,47 @@
+"""Synthetic trace generation and replay throughput.
+
+    python -m benchmarks.bench_traces --days 7 --sensors 400 --interval 60
+    python -m benchmarks.bench_traces --days 1 --speedup 3600      # paced: one trace hour per second
+
+Generates a trace for every sensor of a synthetic home with traces.generate() and
+reports how many readings per second the generator produces. The trace is then
+replayed into the home (running on a virtual clock, so timers, schedules and
+energy follow trace time) and the replay's throughput and most frequent device
+actions are printed.
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import generate_home
+from simulation import Simulation
+from traces import generate, replay, format_replay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Homi trace generation and replay benchmark")
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--rooms", type=int, default=40)
+    parser.add_argument("--devices", type=int, default=400)
+    parser.add_argument("--sensors", type=int, default=400)
+    parser.add_argument("--interval", type=float, default=60, help="seconds between sampled readings")
+    parser.add_argument("--batch", type=float, default=60, help="trace seconds per ingest batch and rule pass")
+    parser.add_argument("--speedup", type=float, default=None, help="pace the replay (default: as fast as possible)")
+    parser.add_argument("--no-replay", action="store_true", help="only time the generator")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with Simulation(generate_home, args.rooms, args.devices, args.sensors, args.seed) as sim:
+        start = time.perf_counter()
+        trace = generate(sim.controller.sensors, sim.clock.now, args.days, args.interval, args.seed)
+        elapsed = time.perf_counter() - start
+        print(f"generated   {len(trace):,} readings in {elapsed:.2f} s ({len(trace) / elapsed:,.0f} readings/s)")
+        for kind, count in sorted(trace.counts().items()):
+            print(f"  {kind:<20}{count:>12,}")
+        if args.no_replay:
+            return
+        report = replay(sim.controller, trace, speedup=args.speedup, batch=args.batch)
+        print(format_replay(report))
+
+
+if __name__ == "__main__":
+    main()
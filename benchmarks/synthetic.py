@@ -0,0 +1,63 @@
+"""Synthetic homes of any size, using every device and sensor type."""
+import random
+
+from controller import SmartHomeController
+from devices import (SmartLight, SmartFan, SmartAC, SmartHeater, SmartDoorLock, SmartCamera,
+                     SmartMusicSystem, SmartBlinds, SmartSprinkler, SmartCoffeeMaker,
+                     SmartVacuumCleaner, SmartDishwasher, SmartTV)
+from sensors import (TemperatureSensor, MotionSensor, LightSensor, DoorSensor, HumiditySensor,
+                     SoilMoistureSensor, FloorCleanSensor, DirtSensor)
+
+
+DEVICE_TYPES = [
+    SmartLight, SmartFan, SmartAC, SmartHeater, SmartDoorLock, SmartCamera, SmartMusicSystem,
+    SmartBlinds, SmartSprinkler, SmartCoffeeMaker, SmartVacuumCleaner, SmartDishwasher, SmartTV,
+]
+
+SENSOR_TYPES = [
+    TemperatureSensor, MotionSensor, LightSensor, DoorSensor, HumiditySensor,
+    SoilMoistureSensor, FloorCleanSensor, DirtSensor,
+]
+
+SONGS = ["Morning Jazz", "LoFi Beats", "Classical", "Ambient", "Rock Classics"]
+
+
+def random_reading(sensor, rng):
+    """A valid random value for `sensor` (bool for on/off sensors, in-range int otherwise)."""
+    if isinstance(sensor, (MotionSensor, DoorSensor, FloorCleanSensor)):
+        return rng.random() < 0.5
+    if isinstance(sensor, TemperatureSensor):
+        return rng.randint(10, 35)
+    if isinstance(sensor, HumiditySensor):
+        return rng.randint(sensor.min_humidity, sensor.max_humidity)
+    return rng.randint(0, 100)
+
+
+def generate_home(rooms, devices, sensors, seed=0, controller=None):
+    """Builds a controller with `devices` devices and `sensors` sensors spread over `rooms` rooms.
+
+    Types are assigned round-robin so every room mixes device and sensor types, and the
+    named components the security rules look for are always present.
+    """
+    rng = random.Random(seed)
+    c = controller if controller is not None else SmartHomeController()
+    room_names = [f"Room {r}" for r in range(max(1, rooms))]
+
+    for i in range(devices):
+        cls = DEVICE_TYPES[i % len(DEVICE_TYPES)]
+        device = cls(f"{cls.__name__} {i}", room_names[(i // len(DEVICE_TYPES)) % len(room_names)])
+        if isinstance(device, SmartMusicSystem):
+            for song in rng.sample(SONGS, 3):
+                device.playlist.append(song)
+        c.add_device(device)
+
+    for i in range(sensors):
+        cls = SENSOR_TYPES[i % len(SENSOR_TYPES)]
+        sensor = cls(f"{cls.__name__} {i}", room_names[(i // len(SENSOR_TYPES)) % len(room_names)])
+        sensor.value = random_reading(sensor, rng)
+        c.add_sensor(sensor)
+
+    c.add_device(SmartCamera("Security Camera", "Entrance"))
+    c.add_device(SmartDoorLock("Main Door Lock", "Entrance"))
+    c.add_sensor(DoorSensor("Main Door Sensor", "Entrance", False))
+    return c
@@ -0,0 +1,88 @@
+"""The time every part of the home reads.
+
+Devices, sensors, rules, timers and schedules call clock.now() (a timestamp) and
+clock.localtime() (a local datetime) instead of time.time() / datetime.now(), so a
+simulation can install a VirtualClock and move time forward as fast as it likes:
+
+    sim_clock = clock.set_clock(clock.VirtualClock(start))
+    ...
+    sim_clock.advance(3600)
+
+Install the clock before building the controller and its home, so that timers,
+schedules and running devices start from the same time.
+"""
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class SystemClock:
+    """The wall clock."""
+
+    def time(self):
+        return time.time()
+
+    def datetime(self):
+        return datetime.now()
+
+
+class VirtualClock:
+    """A clock that only moves when advanced; starts at `start` (a timestamp or datetime, default now)."""
+
+    def __init__(self, start=None):
+        if start is None:
+            start = time.time()
+        elif isinstance(start, datetime):
+            start = start.timestamp()
+        self.now = float(start)
+
+    def time(self):
+        return self.now
+
+    def datetime(self):
+        return datetime.fromtimestamp(self.now)
+
+    def advance(self, seconds):
+        if seconds < 0:
+            raise ValueError("a virtual clock cannot go back")
+        self.now += seconds
+        return self.now
+
+    def set(self, timestamp):
+        if timestamp < self.now:
+            raise ValueError("a virtual clock cannot go back")
+        self.now = float(timestamp)
+        return self.now
+
+
+_clock = SystemClock()
+
+
+def now():
+    return _clock.time()
+
+
+def localtime():
+    return _clock.datetime()
+
+
+def get_clock():
+    return _clock
+
+
+def set_clock(new_clock):
+    """Installs `new_clock` for the whole process; returns it."""
+    global _clock
+    _clock = new_clock
+    return new_clock
+
+
+@contextmanager
+def using(new_clock):
+    """Runs the block with `new_clock` installed, then restores the previous clock."""
+    global _clock
+    previous, _clock = _clock, new_clock
+    try:
+        yield new_clock
+    finally:
+        _clock = previous
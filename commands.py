@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+
+from tracing import get_logger
+
+log = get_logger("commands")
+
+
+# methods whose effect is one attribute set to a fixed value; set_<attr>(value) is derived
+EFFECTS = {
+    "turn_on": ("status", "ON"),
+    "turn_off": ("status", "OFF"),
+    "lock": ("locked", True),
+    "unlock": ("locked", False),
+    "start_recording": ("recording", True),
+    "stop_recording": ("recording", False),
+}
+
+
+def effect(method, args):
+    """(attribute, value) a device command leaves behind, or None when it cannot be folded."""
+    found = EFFECTS.get(method)
+    if found is not None:
+        return found
+    if method.startswith("set_") and len(args) == 1:
+        return method[4:], args[0]
+    return None
+
+
+class CommandQueue:
+    """Device commands collected over a tick and applied once, folded per device and attribute.
+
+    Inside `with queue.tick():` submit() only records commands. A later command for
+    the same device attribute replaces the earlier one (heater on, then off: only
+    "off" is sent), so each device receives its final intended state once, in the
+    order its attributes were first touched. Commands without a known effect (next
+    song, ...) are kept in order. intended() reads an attribute as the pending
+    commands will leave it, so guards see the state the tick is heading for. Ticks
+    nest; the outermost one applies. Outside a tick submit() applies at once.
+
+    `submitted`, `applied` and `dropped` (commands superseded in their tick) count
+    over the queue's lifetime.
+    """
+
+    def __init__(self):
+        self.pending = {}  # id(device) -> (device, {key: (method, args)})
+        self.depth = 0
+        self.submitted = 0
+        self.applied = 0
+        self.dropped = 0
+
+
+    @contextmanager
+    def tick(self):
+        self.depth += 1
+        try:
+            yield self
+        finally:
+            self.depth -= 1
+            if not self.depth:
+                self.flush()
+
+
+    def submit(self, device, method, *args):
+        self.submitted += 1
+        if not self.depth:
+            self.applied += 1
+            getattr(device, method)(*args)
+            return
+
+        entry = self.pending.get(id(device))
+        if entry is None:
+            entry = self.pending[id(device)] = (device, {})
+        commands = entry[1]
+        found = effect(method, args)
+        key = found[0] if found is not None else object()
+        if key in commands:
+            self.dropped += 1
+        commands[key] = (method, args)  # a replaced command keeps its place in the order
+
+
+    def intended(self, device, attr, default=None):
+        entry = self.pending.get(id(device)) if self.pending else None
+        if entry is not None:
+            command = entry[1].get(attr)
+            if command is not None:
+                return effect(*command)[1]
+        return getattr(device, attr, default)
+
+
+    def flush(self):
+        """Applies the pending commands; returns how many were sent to devices."""
+        applied = 0
+        pending, self.pending = self.pending, {}
+        for device, commands in pending.values():
+            for method, args in commands.values():
+                try:
+                    getattr(device, method)(*args)
+                except Exception:
+                    log.exception("Command %s on %s failed", method, device.name)
+                applied += 1
+        self.applied += applied
+        return applied
+
+
+    def stats(self):
+        return {"submitted": self.submitted, "applied": self.applied, "dropped": self.dropped}
@@ -1,25 +1,167 @@
-from rules import AutomationRules
+import time
+import clock
+from rules import AutomationRules, RuleStats, format_stats, MOTION_TIMEOUT
 from devices import *
+from sensors import Sensor, MotionSensor
+from registry import ComponentIndex
+from events import EventBus, SensorChanged, DeviceChanged
+from energy import EnergyLedger
+from modes import ModePlanner
+from history import HistoryRecorder
+from timers import TimerWheel
+from schedules import ScheduleEngine
+from commands import CommandQueue
+from tracing import get_logger
+
+log = get_logger("controller")
 
 class SmartHomeController:
     def __init__ (self):
         self.devices = []
         self.sensors = []
-        self.automation_rules = None
         self.pin = "1234" #default pin
         self.system_mode ="Auto"
+        self.device_index = ComponentIndex(Device)
+        self.sensor_index = ComponentIndex(Sensor)
+        self.bus = EventBus()
+        # rules, modes, schedules and timers send device commands through one queue, so all
+        # the commands a pass issues for a device are folded into its final state
+        self.commands = CommandQueue()
+        self.automation_rules = AutomationRules(self.devices, self.sensors, self.device_index, self.sensor_index,
+                                                commands=self.commands)
+        self.bus.subscribe(self.automation_rules.on_sensor_changed, SensorChanged)
+        self.sensor_store = None
+        self.history = None
+        self.journal = None  # persistence ChangeLog recording every mutation, when attached
+        self.energy = EnergyLedger(self.bus)
+        self.modes = ModePlanner(self.bus, commands=self.commands)
+        self._actions = None  # device changes recorded during a rule pass
+        self.bus.subscribe(self._record_action, DeviceChanged)
+        # deadlines such as motion timeouts; tick() fires the expired ones
+        self.timers = TimerWheel(now=clock.now())
+        self.motion_timers = {}  # id(motion sensor) -> its timeout Timer
+        self.bus.subscribe(self._on_motion, SensorChanged, source_class=MotionSensor)
+        # time-of-day automations (auto-lock, morning coffee, ...); run_schedules() fires the due ones
+        self.schedules = ScheduleEngine()
+        self.pass_stats = None  # RuleStats over whole rule passes while profiling
+        self.stats_interval = None
+        self._stats_dumped = 0.0
 
     
     #manage devices and sensors
 
     def add_device(self, device):
         self.devices.append(device)
-        print(f"Device Added: {device.name} in {device.room}")
+        self.device_index.add(device)
+        device.bus = self.bus
+        self.energy.add(device)
+        self.modes.add(device)
+        self.automation_rules.add_device(device)
+        if self.journal is not None:
+            self.journal.log_component(device)
+        log.info("Device Added: %s in %s", device.name, device.room)
 
     
     def add_sensor(self, sensor):
         self.sensors.append(sensor)
-        print(f"Sensor Added: {sensor.name} in {sensor.room}")
+        self.sensor_index.add(sensor)
+        sensor.bus = self.bus
+        if self.sensor_store is not None:
+            self.sensor_store.attach(sensor)
+        if self.history is not None:
+            self.history.attach(sensor)
+        self.automation_rules.add_sensor(sensor)
+        if isinstance(sensor, MotionSensor):
+            self._arm_motion_timeout(sensor)
+        if self.journal is not None:
+            self.journal.log_component(sensor)
+        log.info("Sensor Added: %s in %s", sensor.name, sensor.room)
+
+
+    def remove_device(self, device):
+        self.devices.remove(device)
+        self.device_index.remove(device)
+        device.bus = None
+        self.energy.remove(device)
+        self.modes.remove(device)
+        self.automation_rules.remove_device(device)
+        if self.journal is not None:
+            self.journal.log_removed(device)
+        log.info("Device Removed: %s from %s", device.name, device.room)
+
+
+    def remove_sensor(self, sensor):
+        self.sensors.remove(sensor)
+        self.sensor_index.remove(sensor)
+        sensor.bus = None
+        if self.sensor_store is not None:
+            self.sensor_store.detach(sensor)
+        if self.history is not None:
+            self.history.detach(sensor)
+        self.automation_rules.remove_sensor(sensor)
+        timer = self.motion_timers.pop(id(sensor), None)
+        if timer is not None:
+            self.timers.cancel(timer)
+        if self.journal is not None:
+            self.journal.log_removed(sensor)
+        log.info("Sensor Removed: %s from %s", sensor.name, sensor.room)
+
+
+    def move_device(self, device, new_room):
+        old_room = device.room
+        self.device_index.move(device, new_room)
+        self.energy.move(device, old_room)
+        self.automation_rules.mark_room_dirty(new_room)
+        if self.journal is not None:
+            self.journal.log_component(device)
+        log.info("Device Moved: %s to %s", device.name, new_room)
+
+
+    def move_sensor(self, sensor, new_room):
+        self.sensor_index.move(sensor, new_room)
+        if self.sensor_store is not None:
+            self.sensor_store.move(sensor)
+        self.automation_rules.mark_dirty(sensor)
+        if self.journal is not None:
+            self.journal.log_component(sensor)
+        log.info("Sensor Moved: %s to %s", sensor.name, new_room)
+
+
+    def enable_columnar_store(self):
+        # keeps every sensor value in NumPy columns so threshold rules run as array ops
+        if self.sensor_store is None:
+            from sensor_store import SensorStore  # NumPy is only imported by homes that use it
+            self.sensor_store = SensorStore(capacity=max(64, len(self.sensors)))
+            for sensor in self.sensors:
+                self.sensor_store.attach(sensor)
+            self.automation_rules.store = self.sensor_store
+            log.info("Columnar sensor store enabled for %s sensors", len(self.sensors))
+        return self.sensor_store
+
+
+    def enable_history(self, capacity=1024, spill_dir=None):
+        # every sensor keeps its last `capacity` readings; older ones spill to spill_dir (or are dropped)
+        if self.history is None:
+            self.history = HistoryRecorder(capacity, spill_dir)
+            for sensor in self.sensors:
+                self.history.attach(sensor)
+            log.info("Sensor history enabled (%s readings in memory per sensor)", capacity)
+        return self.history
+
+
+    def query_history(self, room, sensor_class=Sensor, start=None, end=None):
+        """Readings of the `sensor_class` sensors in `room` between start and end, as {name: [(timestamp, value)]}."""
+        return {s.name: s.history.query(start, end)
+                for s in self.sensor_index.in_room(room, sensor_class)
+                if s.history is not None}
+
+
+    def get_device(self, name):
+        return self.automation_rules.device_map.get(name)
+
+
+    def get_sensor(self, name):
+        return self.automation_rules.sensor_map.get(name)
 
 
     #security methods
@@ -30,9 +172,13 @@ class SmartHomeController:
     def change_pin(self, old_pin, new_pin):
         if self.check_pin(old_pin):
             self.pin = new_pin
-            print("✅ PIN changed successfully.")
+            if self.journal is not None:
+                self.journal.log_setting("pin", new_pin)
+            log.info("✅ PIN changed successfully.")
+            return True, "PIN changed successfully."
         else:
-            print("❌ Incorrect old PIN. PIN change failed.")
+            log.warning("❌ Incorrect old PIN. PIN change failed.")
+            return False, "Incorrect old PIN. PIN change failed."
 
 
 
@@ -43,68 +189,54 @@ class SmartHomeController:
     #syestem mode methods
     
     def set_system_mode(self, mode):
-        self.system_mode = mode
-        print(f"🔄 System Mode changed to: {mode}")
-        
-        if mode == "Sleep":
-            print("💤 Executing Sleep Protocol...")
-            for dev in self.devices:
-              
-                if isinstance(dev, SmartDoorLock):
-                    dev.lock()
-               
-                if isinstance(dev, (SmartLight, SmartMusicSystem, SmartTV, SmartCoffeeMaker, SmartSprinkler)):
-                    dev.turn_off()
-                
-                if isinstance(dev, SmartBlinds):
-                    dev.turn_off() 
-
-                if isinstance(dev, SmartCamera):
-                    dev.turn_on()
-                    dev.start_recording()
-
-                    
-        elif mode == "Away":
-            print("👋 Executing Away Protocol...")
-            for dev in self.devices:
-                
-                if isinstance(dev, SmartDoorLock):
-                    dev.lock()
-               
-                if isinstance(dev, (SmartAC, SmartHeater, SmartCoffeeMaker, SmartTV, SmartMusicSystem)):
-                    dev.turn_off()
-                
-                if isinstance(dev, SmartCamera):
-                    dev.turn_on()
-                    dev.start_recording()
-                
-                if isinstance(dev, SmartVacuumCleaner):
-                    dev.turn_on()
+        """Switches mode, changing only the devices not already in the mode's target state.
+
+        Returns {"mode", "changes": [(device name, method)], "changed", "duration_ms"}.
+        """
+        previous, self.system_mode = self.system_mode, mode
+        if self.journal is not None:
+            self.journal.log_setting("system_mode", mode)
+        log.info("🔄 System Mode changed to: %s", mode)
+        if mode == "Auto" and previous != "Auto":
+            # rules were paused: the first pass back in Auto re-checks every device
+            self.automation_rules.needs_full_pass = True
+            self._resume_timeouts()
+
+        summary = self.modes.apply(mode)
+        if summary["changed"]:
+            log.info("Executed %s protocol: %s device changes", mode, summary["changed"])
+        return summary
 
 
 
 
     #energy reporting methods
 
+    # totals come from the running EnergyLedger and include devices that are still on
+
     def get_energy_report(self):
+        now = clock.now()
         report_data = []
-        total_kwh = 0.0
 
         for d in self.devices:
-            hours = getattr(d,'total_hours',0)
-            
-            if hours ==0: hours = 1
-            kwh = (d.power_usage * hours)/ 1000
-            total_kwh += kwh
-
             report_data.append({
                 "name": d.name, 
                 "room": d.room,
-                "hours": round(hours,2),
-                "kwh": round(kwh,4)
+                "hours": round(d.total_hours + d.running_hours(now),2),
+                "kwh": round(d.energy_kwh + d.running_kwh(now),4)
             })
 
-        return report_data, round(total_kwh,4)
+        return report_data, round(self.energy.total_kwh(now),4)
+
+
+    def get_energy_total(self):
+        return round(self.energy.total_kwh(), 4)
+
+
+    def get_room_energy_report(self):
+        now = clock.now()
+        rooms = [{"room": room, "kwh": round(kwh, 4)} for room, kwh in self.energy.room_kwh(now).items()]
+        return rooms, round(self.energy.total_kwh(now), 4), self.energy.running_watts()
 
 
     
@@ -120,14 +252,219 @@ class SmartHomeController:
 
 
 
-    def apply_automation_rules(self):
+    def apply_automation_rules(self, full=False):
+        """Runs a rule pass and returns the device changes it made as (device, field, old, new)."""
+        # changes made while not in Auto stay queued until the next pass
         if self.system_mode != "Auto":
-            print(f"⚠️ Automation skipped: System is in {self.system_mode} mode.")
-            return
+            log.info("⚠️ Automation skipped: System is in %s mode.", self.system_mode)
+            return []
         
-        self.automation_rules = AutomationRules(self.devices, self.sensors)
-        print("🤖 Applying AI Automation Rules ....")
-        self.automation_rules.apply_all_checks()
+        log.info("🤖 Applying AI Automation Rules ....")
+        rules = self.automation_rules
+        self._actions = actions = []
+        if self.pass_stats is not None:
+            start = time.perf_counter()
+            examined = sum(s.sensors for s in rules.stats.values())
+        try:
+            if full:
+                rules.apply_all_checks()
+            else:
+                rules.apply_dirty()
+        finally:
+            self._actions = None
+        if self.pass_stats is not None:
+            self.pass_stats.add(time.perf_counter() - start,
+                                sum(s.sensors for s in rules.stats.values()) - examined, len(actions))
+            self._maybe_dump_stats()
+        return actions
+
+
+    #rule profiling
+
+    def enable_rule_stats(self, dump_interval=None):
+        """Counts calls, latency, sensors examined and actions per rule and per pass.
+
+        With `dump_interval` (seconds) the counters are logged as a table at most that
+        often, at the end of a rule pass. Profiling is off by default and then costs a
+        couple of attribute checks per pass.
+        """
+        self.automation_rules.enable_stats()
+        if self.pass_stats is None:
+            self.pass_stats = RuleStats()
+        self.stats_interval = dump_interval
+        self._stats_dumped = time.monotonic()
+
+
+    def disable_rule_stats(self):
+        self.automation_rules.disable_stats()
+        self.pass_stats = None
+        self.stats_interval = None
+
+
+    def reset_rule_stats(self):
+        self.automation_rules.reset_stats()
+        if self.pass_stats is not None:
+            self.pass_stats = RuleStats()
+
+
+    def get_stats(self):
+        """The rules' get_stats() plus "passes" (counters over whole apply_automation_rules() calls)
+        "commands" (the command queue's submitted/applied/dropped totals) and "events" (the
+        bus's published events, queued handler calls and calls dropped from a full queue)."""
+        stats = self.automation_rules.get_stats()
+        if self.pass_stats is not None:
+            stats["passes"] = self.pass_stats.as_dict()
+        stats["commands"] = self.commands.stats()
+        stats["events"] = self.bus.stats()
+        return stats
+
+
+    def _maybe_dump_stats(self):
+        if self.stats_interval is None:
+            return
+        now = time.monotonic()
+        if now - self._stats_dumped >= self.stats_interval:
+            self._stats_dumped = now
+            log.info("Rule stats:\n%s", format_stats(self.get_stats()))
+
+
+    #timers
+
+    def tick(self, now=None):
+        """Fires the timers due by `now` and runs queued event handlers; returns the device
+        changes they made like a rule pass."""
+        self._actions = actions = []
+        try:
+            with self.commands.tick():
+                self.timers.advance(clock.now() if now is None else now)
+                self.bus.drain()
+        finally:
+            self._actions = None
+        # a light timed out on one motion sensor may still be wanted by another in its room:
+        # the next dirty pass re-checks the rooms whose devices changed
+        for name, *_ in actions:
+            device = self.get_device(name)
+            if device is not None:
+                self.automation_rules.mark_room_dirty(device.room)
+        return actions
+
+
+    def run_schedules(self, now=None):
+        """Runs the schedules due by `now`; returns the device changes they made like a rule pass."""
+        self._actions = actions = []
+        try:
+            with self.commands.tick():
+                for schedule in self.schedules.due(now):
+                    if schedule.modes is None or self.system_mode in schedule.modes:
+                        self._run_schedule(schedule)
+        finally:
+            self._actions = None
+        if actions:
+            # a schedule switches devices no sensor change points at (a sprinkler started on
+            # wet soil): re-check every rule on the next pass, as after a manual command
+            self.automation_rules.needs_full_pass = True
+        return actions
+
+
+    def _run_schedule(self, schedule):
+        if isinstance(schedule.device, str):
+            device = self.get_device(schedule.device)
+            targets = [device] if device is not None else []
+        elif schedule.room is not None:
+            targets = self.device_index.in_room(schedule.room, schedule.device)
+        else:
+            targets = self.device_index.of_type(schedule.device)
+
+        ran = 0
+        for device in list(targets):
+            if schedule.when is not None and self.commands.intended(device, schedule.when[0]) != schedule.when[1]:
+                continue
+            self.commands.submit(device, schedule.method, *schedule.args)
+            ran += 1
+        if ran and schedule.message:
+            log.info(schedule.message)
+        log.debug("Schedule %s ran on %s devices", schedule.name, ran)
+
+
+    def _on_motion(self, event):
+        self._arm_motion_timeout(event.source)
+
+
+    def _arm_motion_timeout(self, sensor):
+        # the deadline only moves when motion is recorded; a reading without motion re-arms
+        # a timeout that already fired while the sensor still reported motion
+        deadline = sensor.last_motion_time + MOTION_TIMEOUT
+        timer = self.motion_timers.get(id(sensor))
+        if timer is None:
+            self.motion_timers[id(sensor)] = self.timers.schedule(deadline, self._motion_timeout, sensor)
+        elif timer.deadline != deadline or not timer.armed:
+            self.timers.reschedule(timer, deadline)
+
+
+    def _motion_timeout(self, sensor):
+        # outside Auto the timeout just expires; _resume_timeouts() applies it when Auto returns
+        if self.system_mode == "Auto":
+            self.automation_rules.motion_timeout(sensor)
+
+
+    def _resume_timeouts(self):
+        # every sensor whose timeout has expired (its timer is no longer armed) still gets its light
+        # turned off if it reports no motion, like a timeout expiring now
+        sensors = self.sensor_index.of_type(MotionSensor)
+        with self.commands.tick():
+            for sensor in sensors:
+                timer = self.motion_timers.get(id(sensor))
+                if timer is not None and not timer.armed:
+                    self.automation_rules.motion_timeout(sensor)
+
+
+    def _record_action(self, event):
+        if self._actions is not None:
+            self._actions.append((event.source.name, event.field, event.old, event.new))
+        else:
+            # changed outside automation (GUI, homi, runtime commands, modes): rules may now
+            # want something else for devices no sensor change points at, so re-check them all
+            self.automation_rules.needs_full_pass = True
+
+
+    def ingest_batch(self, readings, run_rules=True):
+        """Applies many (sensor, value, timestamp) readings, then runs a single rule pass.
+
+        `sensor` may be a Sensor or a sensor name and `timestamp` may be None. Readings
+        outside a sensor's accepted range are rejected without touching the sensor.
+        With run_rules=False the changed sensors stay dirty for a later pass.
+        Returns {"results": [(name, accepted, reason)], "accepted": n, "rejected": n,
+        "actions": [(device, field, old, new)]}.
+        """
+        results = []
+        accepted = 0
+
+        for sensor, value, timestamp in readings:
+            if isinstance(sensor, str):
+                name, sensor = sensor, self.get_sensor(sensor)
+                if sensor is None:
+                    results.append((name, False, "unknown sensor"))
+                    continue
+
+            if not sensor.accepts(value):
+                low_high = sensor.value_range()
+                reason = f"out of range {low_high[0]}-{low_high[1]}" if low_high else "invalid value"
+                results.append((sensor.name, False, reason))
+                continue
+
+            sensor.update_value(value, timestamp=timestamp)
+            results.append((sensor.name, True, None))
+            accepted += 1
+
+        actions = self.apply_automation_rules() if accepted and run_rules else []
+        log.info("Batch ingested: %s accepted, %s rejected, %s device actions",
+                 accepted, len(results) - accepted, len(actions))
+        return {
+            "results": results,
+            "accepted": accepted,
+            "rejected": len(results) - accepted,
+            "actions": actions,
+        }
 
 
 
@@ -0,0 +1,318 @@
+import customtkinter as ctk
+from bisect import bisect_right
+from devices import SmartMusicSystem, SmartDoorLock, SmartBlinds
+
+# fixed row heights let the grid place rows without measuring widgets
+CARD_ROW = 190
+MUSIC_ROW = 260
+OVERSCAN = 1  # rows built above and below the visible area
+ALL = "All"
+
+
+class DeviceCard(ctk.CTkFrame):
+    """A generic device card that can be re-bound to another device instead of rebuilt."""
+
+    def __init__(self, parent, app):
+        super().__init__(parent, corner_radius=15, fg_color="#2b2b2b", border_width=1, border_color="#3a3a3a",
+                         height=CARD_ROW - 20)
+        self.pack_propagate(False)  # keep the row height whatever the controls need
+        self.app = app
+        self.device = None
+        self.attr = None  # the attribute the slider shows
+        self.setter = None
+
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.pack(fill="x", padx=15, pady=12)
+        self.title = ctk.CTkLabel(header, font=("Arial", 16, "bold"), text_color="white")
+        self.title.pack(side="left")
+        self.indicator = ctk.CTkLabel(header, text="●", font=("Arial", 20))
+        self.indicator.pack(side="right")
+
+        self.room = ctk.CTkLabel(self, font=("Arial", 12), text_color="gray")
+        self.room.pack(anchor="w", padx=15, pady=(0, 10))
+
+        controls = ctk.CTkFrame(self, fg_color="#212121", corner_radius=10)
+        controls.pack(fill="x", padx=15, pady=(0, 15))
+
+        self.switch_var = ctk.StringVar(value="off")
+        self.switch = ctk.CTkSwitch(controls, variable=self.switch_var, onvalue="on", offvalue="off",
+                                    command=self.on_toggle, font=("Arial", 13, "bold"))
+        self.switch.pack(side="right", padx=10, pady=10)
+
+        self.slider_box = ctk.CTkFrame(controls, fg_color="transparent")
+        self.slider_label = ctk.CTkLabel(self.slider_box, font=("Arial", 10))
+        self.slider_label.pack(side="left", padx=2)
+        self.slider = ctk.CTkSlider(self.slider_box, from_=0, to=100, width=100, progress_color="#5dade2")
+        self.slider.pack(side="left")
+        self.slider.bind("<ButtonRelease-1>", self.on_slide)
+
+
+    def bind_device(self, device):
+        self.device = device
+        self.title.configure(text=f"{self.app.get_icon(device)}  {device.name}")
+        self.room.configure(text=f"📍 {device.room}")
+        self.switch.configure(text="Lock" if isinstance(device, SmartDoorLock) else "Power")
+
+        if hasattr(device, 'set_brightness'):
+            slider = ("Bright", 0, 100, "brightness", "set_brightness")
+        elif hasattr(device, 'set_temperature'):
+            slider = ("Temp", 16, 30, "temperature", "set_temperature")
+        elif isinstance(device, SmartBlinds):
+            slider = ("Open", 0, 100, "position", "set_position")
+        else:
+            slider = None
+
+        if slider:
+            label, low, high, self.attr, self.setter = slider
+            self.slider_label.configure(text=label)
+            self.slider.configure(from_=low, to=high, number_of_steps=high - low)
+            self.slider_box.pack(side="left", padx=5)
+        else:
+            self.attr = self.setter = None
+            self.slider_box.pack_forget()
+        self.refresh()
+
+
+    def refresh(self):
+        device = self.device
+        is_on = device.locked if isinstance(device, SmartDoorLock) else device.status == "ON"
+        self.indicator.configure(text_color=self.app.get_status_color(device))
+        self.switch_var.set("on" if is_on else "off")
+        if self.attr is not None:
+            self.slider.set(getattr(device, self.attr))
+
+
+    def on_toggle(self):
+        self.app.handle_toggle_no_reload(self.device, self.switch_var)
+
+
+    def on_slide(self, event):
+        if self.setter:
+            self.app.run_async(getattr(self.device, self.setter), int(self.slider.get()))
+
+
+class MusicCard(ctk.CTkFrame):
+    """The media center card, re-bindable like DeviceCard."""
+
+    def __init__(self, parent, app):
+        super().__init__(parent, corner_radius=15, fg_color="#1e1e2e", border_width=2, border_color="#8e44ad",
+                         height=MUSIC_ROW - 20)
+        self.pack_propagate(False)
+        self.app = app
+        self.device = None
+
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.pack(fill="x", padx=20, pady=10)
+        ctk.CTkLabel(header, text="🎵  Media Center", font=("Arial", 16, "bold"), text_color="#bb86fc").pack(side="left")
+        self.name_label = ctk.CTkLabel(header, text_color="gray")
+        self.name_label.pack(side="right")
+
+        screen = ctk.CTkFrame(self, fg_color="black", corner_radius=10, height=40)
+        screen.pack(fill="x", padx=20, pady=5)
+        self.song_label = ctk.CTkLabel(screen, font=("Consolas", 14), text_color="#03dac6")
+        self.song_label.pack(pady=10)
+
+        ctrl = ctk.CTkFrame(self, fg_color="transparent")
+        ctrl.pack(fill="x", padx=20, pady=10)
+        box = ctk.CTkFrame(ctrl, fg_color="transparent")
+        box.pack(side="left", padx=5)
+        ctk.CTkLabel(box, text="Vol", font=("Arial", 10)).pack(side="left", padx=2)
+        self.volume = ctk.CTkSlider(box, from_=0, to=100, number_of_steps=100, width=100, progress_color="#5dade2")
+        self.volume.pack(side="left")
+        self.volume.bind("<ButtonRelease-1>",
+                         lambda e: self.app.run_async(self.device.set_volume, int(self.volume.get())))
+
+        self.menu = ctk.CTkOptionMenu(ctrl, values=["(Empty)"], width=150, dynamic_resizing=False,
+                                      command=lambda s: self.app.play_specific_song_smooth(self.device, s))
+        self.menu.pack(side="right", padx=10)
+        ctk.CTkButton(ctrl, text="🗑️", width=30, fg_color="#c0392b",
+                      command=lambda: self.app.remove_song_gui(self.device, self.menu)).pack(side="right", padx=2)
+        ctk.CTkButton(ctrl, text="➕", width=30, fg_color="#27ae60",
+                      command=lambda: self.app.add_song_gui(self.device, self.menu)).pack(side="right", padx=2)
+
+        btns = ctk.CTkFrame(self, fg_color="transparent")
+        btns.pack(pady=(0, 15))
+        ctk.CTkButton(btns, text="⏮", width=50, fg_color="#333",
+                      command=lambda: self.app.run_async(self.device.previous_song,
+                                                         then=lambda _: self.app.update_music_ui(self.device))).pack(side="left", padx=5)
+        self.play_btn = ctk.CTkButton(btns, width=80, command=lambda: self.app.handle_music_toggle_smooth(self.device))
+        self.play_btn.pack(side="left", padx=5)
+        ctk.CTkButton(btns, text="⏭", width=50, fg_color="#333",
+                      command=lambda: self.app.run_async(self.device.next_song,
+                                                         then=lambda _: self.app.update_music_ui(self.device))).pack(side="left", padx=5)
+
+
+    def bind_device(self, device):
+        self.device = device
+        self.name_label.configure(text=device.name)
+        self.volume.set(device.volume)
+        self.menu.set("Playlist")
+        self.refresh()
+
+
+    def widgets(self):
+        # the shape SmartHomeApp.update_music_ui expects
+        return {"label": self.song_label, "play_btn": self.play_btn, "menu": self.menu}
+
+
+    def refresh(self):
+        self.app.update_music_ui(self.device)
+
+
+class DeviceGrid(ctk.CTkFrame):
+    """Virtualized dashboard: only the rows in view have card widgets.
+
+    Rows are laid out as data (two device cards, or one music card per row). Scrolling
+    places the visible rows' cards at their offsets, re-binding cards from a pool
+    instead of creating widgets, so opening or scrolling the page costs the same for
+    ten devices or ten thousand. Room and type filters only recompute the layout.
+    """
+
+    def __init__(self, parent, app, devices_for):
+        super().__init__(parent, fg_color="transparent")
+        self.app = app
+        self.devices_for = devices_for   # (room or None, class or None) -> devices
+        self.room = None
+        self.cls = None
+
+        self.rows = []      # [(kind, [devices])]
+        self.offsets = []   # top of each row
+        self.total_height = 0
+        self.offset = 0
+
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.pools = {"card": [], "music": []}   # unbound cards ready for reuse
+        self.bound = {}                           # id(device) -> card currently showing it
+
+        # wheel events are bound once by the app, which forwards them to the open grid's on_wheel()
+        self.viewport.bind("<Configure>", lambda e: self.render())
+        self.relayout()
+
+
+    #layout
+
+    def set_filter(self, room=None, cls=None):
+        self.room, self.cls = room, cls
+        self.offset = 0
+        self.relayout()
+
+
+    def relayout(self):
+        rows, pair = [], []
+        for device in self.devices_for(self.room, self.cls):
+            if isinstance(device, SmartMusicSystem):
+                if pair:
+                    rows.append(("card", pair))
+                    pair = []
+                rows.append(("music", [device]))
+            else:
+                pair.append(device)
+                if len(pair) == 2:
+                    rows.append(("card", pair))
+                    pair = []
+        if pair:
+            rows.append(("card", pair))
+
+        self.rows, self.offsets, y = rows, [], 0
+        for kind, _ in rows:
+            self.offsets.append(y)
+            y += MUSIC_ROW if kind == "music" else CARD_ROW
+        self.total_height = y
+        self.render()
+
+
+    #scrolling
+
+    def view_height(self):
+        return max(1, self.viewport.winfo_height())
+
+
+    def scroll_to(self, offset):
+        self.offset = max(0, min(offset, self.total_height - self.view_height()))
+        self.render()
+
+
+    def yview(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(float(amount) * self.total_height)
+        elif unit == "pages":
+            self.scroll_to(self.offset + int(amount) * self.view_height())
+        else:
+            self.scroll_to(self.offset + int(amount) * CARD_ROW // 2)
+
+
+    def on_wheel(self, event):
+        # the scrollbar handles wheel events over itself
+        if not self.winfo_exists() or not str(event.widget).startswith(str(self.viewport)):
+            return
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - CARD_ROW // 2)
+        else:
+            self.scroll_to(self.offset + CARD_ROW // 2)
+
+
+    #rendering
+
+    def render(self):
+        height = self.view_height()
+        first = max(0, bisect_right(self.offsets, self.offset) - 1 - OVERSCAN)
+        last = min(len(self.rows), bisect_right(self.offsets, self.offset + height) + OVERSCAN)
+
+        visible = {}
+        for r in range(first, last):
+            kind, devices = self.rows[r]
+            for col, device in enumerate(devices):
+                visible[id(device)] = (r, col, kind, device)
+
+        # cards whose device scrolled out (or was filtered away) go back to their pool
+        for key in [k for k in self.bound if k not in visible]:
+            self.release(self.bound.pop(key))
+
+        for key, (r, col, kind, device) in visible.items():
+            card = self.bound.get(key)
+            if card is None:
+                card = self.bound[key] = self.acquire(kind, device)
+            y = self.offsets[r] - self.offset
+            if kind == "music":
+                card.place(relx=0.01, y=y + 10, relwidth=0.98)
+            else:
+                card.place(relx=col / 2 + 0.01, y=y + 10, relwidth=0.48)
+
+        if self.total_height:
+            self.scrollbar.set(self.offset / self.total_height, min(1, (self.offset + height) / self.total_height))
+        else:
+            self.scrollbar.set(0, 1)
+
+
+    def acquire(self, kind, device):
+        pool = self.pools[kind]
+        card = pool.pop() if pool else (MusicCard if kind == "music" else DeviceCard)(self.viewport, self.app)
+        # registered first: binding a music card refreshes it through app.update_music_ui
+        if kind == "music":
+            self.app.music_widgets[device.name] = card.widgets()
+        else:
+            self.app.status_indicators[device.name] = card.indicator
+        card.bind_device(device)
+        return card
+
+
+    def release(self, card):
+        card.place_forget()
+        name = card.device.name
+        if isinstance(card, MusicCard):
+            self.app.music_widgets.pop(name, None)
+            self.pools["music"].append(card)
+        else:
+            self.app.status_indicators.pop(name, None)
+            self.pools["card"].append(card)
+        card.device = None
+
+
+    def refresh(self, device):
+        card = self.bound.get(id(device))
+        if card is not None:
+            card.refresh()
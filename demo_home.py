@@ -0,0 +1,42 @@
+"""The demo home the app starts with when no saved state exists."""
+from devices import (SmartMusicSystem, SmartAC, SmartLight, SmartBlinds, SmartTV, SmartFan, SmartHeater,
+                     SmartDishwasher, SmartCoffeeMaker, SmartDoorLock, SmartCamera, SmartSprinkler)
+from sensors import TemperatureSensor, MotionSensor, DoorSensor, SoilMoistureSensor
+
+
+def build_demo_home(c):
+    # Music
+    m = SmartMusicSystem("Living Room Audio", "Living Room")
+    m.add_song("Morning Jazz"); m.add_song("LoFi Beats"); m.add_song("Classical")
+    c.add_device(m)
+    
+    # Living Room
+    c.add_device(SmartAC("Main AC", "Living Room"))
+    c.add_device(SmartLight("Ceiling Light", "Living Room"))
+    c.add_device(SmartBlinds("Main Window", "Living Room"))
+    c.add_device(SmartTV("Samsung TV", "Living Room"))
+    
+    # Bedroom
+    c.add_device(SmartAC("Air conditioner", "Bedroom"))
+    c.add_device(SmartLight("Night Lamp", "Bedroom"))
+    c.add_device(SmartFan("Ceiling Fan", "Bedroom"))
+    c.add_device(SmartHeater("Heater", "Bedroom"))
+
+    # Kitchen
+    c.add_device(SmartLight("Kitchen Light", "Kitchen"))
+    c.add_device(SmartDishwasher("Dishwasher", "Kitchen"))
+    c.add_device(SmartCoffeeMaker("Coffee Machine", "Kitchen"))
+
+    # Security
+    c.add_device(SmartDoorLock("Front Door Lock", "Entrance"))
+    c.add_device(SmartCamera("Door Cam", "Entrance"))
+
+    # Garden
+    c.add_device(SmartSprinkler("Lawn Sprinkler", "Backyard"))
+    c.add_device(SmartCamera("Backyard Cam", "Main Garden"))
+
+    # Sensors
+    c.add_sensor(TemperatureSensor("LR Thermostat", "Living Room", 22))
+    c.add_sensor(MotionSensor("LR Motion", "Living Room", True))
+    c.add_sensor(DoorSensor("Main Door Sensor", "Entrance", False))
+    c.add_sensor(SoilMoistureSensor("Soil Sensor", "Backyard", 40))
@@ -1,34 +1,79 @@
-import time
+import clock
+from events import DeviceChanged
+from tracing import get_logger
+
+log = get_logger("devices")
 
 class Device:
+    # slots instead of a per-instance __dict__: large simulated homes hold 100k+ devices
+    __slots__ = ("name", "power_usage", "room", "_on", "start_time", "total_hours", "energy_kwh", "bus")
+
     def __init__(self, name, room, power_usage, status='OFF'):
         self.name = name
         self.power_usage = power_usage
         self.room = room
         self.status = status
-        self.start_time = None
+        self.start_time = clock.now() if self.status == 'ON' else None
         self.total_hours = 0
+        self.energy_kwh = 0.0  # finished sessions only; see running_kwh() for the current one
+        self.bus = None  # set by the controller; state changes are published on it
+
+    # stored as a bool, exposed as the 'ON'/'OFF' string the rest of the system uses
+    @property
+    def status(self):
+        return 'ON' if self._on else 'OFF'
+
+    @status.setter
+    def status(self, value):
+        self._on = value == 'ON' if isinstance(value, str) else bool(value)
+
+    @property
+    def is_on(self):
+        return self._on
+
+    def _publish(self, field, old, new, timestamp=None):
+        if self.bus:
+            self.bus.publish(DeviceChanged(self, field, old, new, clock.now() if timestamp is None else timestamp))
+
+    def _set(self, field, value):
+        old = getattr(self, field)
+        setattr(self, field, value)
+        self._publish(field, old, value)
 
     def turn_on(self):
         if self.status == 'OFF':
             self.status = 'ON'
-            self.start_time = time.time()
-            print(f"{self.name} is now {self.status}.")
+            self.start_time = clock.now()
+            log.info("%s is now %s.", self.name, self.status)
+            self._publish("status", 'OFF', 'ON', self.start_time)
 
     def turn_off(self):
         if self.status == 'ON':
             self.status = 'OFF'
-            end_time = time.time()
-            hours_used = (end_time - self.start_time) / 3600
+            end_time = clock.now()
+            hours_used = (end_time - self.start_time) / 3600 if self.start_time is not None else 0
             self.total_hours += hours_used
+            self.energy_kwh += self.power_usage * hours_used / 1000
             self.start_time = None
-            print(f"{self.name} is now {self.status}. Total hours used: {self.total_hours:.2f} hours.")
+            log.info("%s is now %s. Total hours used: %.2f hours.", self.name, self.status, self.total_hours)
+            self._publish("status", 'ON', 'OFF', end_time)
+
+    # the session in progress, for reports that include devices still running
+    def running_hours(self, now=None):
+        if self.status != 'ON' or self.start_time is None:
+            return 0.0
+        return ((clock.now() if now is None else now) - self.start_time) / 3600
+
+    def running_kwh(self, now=None):
+        return self.power_usage * self.running_hours(now) / 1000
 
     def get_status(self):
         return f"{self.name} is currently {self.status}."
     
 
 class SmartLight(Device):
+    __slots__ = ("brightness", "color")
+
     def __init__(self, name, room, power_usage=5, brightness=50, color='White'):
         super().__init__(name, room, power_usage)
         self.brightness = brightness
@@ -36,20 +81,20 @@ class SmartLight(Device):
 
     def set_brightness(self, brightness):
         if 0 <= brightness <= 100:
-            self.brightness = brightness
-            print(f"{self.name} brightness set to {self.brightness}%.")
+            self._set("brightness", brightness)
+            log.info("%s brightness set to %s%%.", self.name, self.brightness)
 
         else:
-            print("Brightness must be between 0 and 100.")
+            log.warning("Brightness must be between 0 and 100.")
         
 
     def set_color(self, color):
-        self.color = color
-        print(f"{self.name} color set to {self.color}.")
+        self._set("color", color)
+        log.info("%s color set to %s.", self.name, self.color)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now {self.status} with brightness {self.brightness}% and color {self.color}.")   
+        log.debug("%s is now %s with brightness %s%% and color %s.", self.name, self.status, self.brightness, self.color)
 
 
     def turn_off(self):
@@ -57,97 +102,109 @@ class SmartLight(Device):
 
 
 class SmartFan(Device):
+    __slots__ = ("speed",)
+
     def __init__(self, name, room, power_usage=10, speed=1):
         super().__init__(name, room, power_usage)
         self.speed = speed
 
     def set_speed(self, speed):
-        self.speed = speed
-        print(f"{self.name} speed set to {self.speed}.")
+        self._set("speed", speed)
+        log.info("%s speed set to %s.", self.name, self.speed)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now {self.status} at speed {self.speed}.")
+        log.debug("%s is now %s at speed %s.", self.name, self.status, self.speed)
 
     def turn_off(self):
         super().turn_off()
 
 
 class SmartAC(Device):
+    __slots__ = ("temperature",)
+
     def __init__(self, name, room, power_usage=1500, temperature=24):
         super().__init__(name, room, power_usage)
         self.temperature = temperature
 
     def set_temperature(self, temperature):
         if temperature < 16 or temperature > 30:
-            print("Temperature must be between 16°C and 30°C.") 
+            log.warning("Temperature must be between 16°C and 30°C.")
 
         else:
-            self.temperature = temperature
-            print(f"{self.name} temperature set to {self.temperature}°C.")  
+            self._set("temperature", temperature)
+            log.info("%s temperature set to %s°C.", self.name, self.temperature)
 
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now {self.status} at {self.temperature}°C.")
+        log.debug("%s is now %s at %s°C.", self.name, self.status, self.temperature)
 
     def turn_off(self):
         super().turn_off()
 
 
 class SmartHeater(Device):
+    __slots__ = ("temperature",)
+
     def __init__(self, name, room, power_usage=2000, temperature=22):
         super().__init__(name, room, power_usage)
         self.temperature = temperature
 
     def set_temperature(self, temperature):
-        self.temperature = temperature
-        print(f"{self.name} temperature set to {self.temperature}°C.")
+        self._set("temperature", temperature)
+        log.info("%s temperature set to %s°C.", self.name, self.temperature)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now {self.status} at {self.temperature}°C.")
+        log.debug("%s is now %s at %s°C.", self.name, self.status, self.temperature)
 
     def turn_off(self):
         super().turn_off()
-        print(f"{self.name} is now {self.status}.")
+        log.debug("%s is now %s.", self.name, self.status)
 
 
 class SmartDoorLock(Device):
+    __slots__ = ("locked",)
+
     def __init__(self, name, room, power_usage=2, locked=True):
         super().__init__(name, room, power_usage)
         self.locked = locked
 
     def lock(self):
-        self.locked = True
-        print(f"{self.name} is now locked.")
+        self._set("locked", True)
+        log.info("%s is now locked.", self.name)
 
     def unlock(self):
-        self.locked = False
-        print(f"{self.name} is now unlocked.")
+        self._set("locked", False)
+        log.info("%s is now unlocked.", self.name)
 
     def get_status(self):
         return super().get_status() + f" It is currently {'locked' if self.locked else 'unlocked'}."
     
 
 class SmartCamera(Device):
+    __slots__ = ("recording",)
+
     def __init__(self, name, room, power_usage=8, recording=False):
         super().__init__(name, room, power_usage)
         self.recording = recording
 
     def start_recording(self):
-        self.recording = True
-        print(f"{self.name} has started recording.")
+        self._set("recording", True)
+        log.info("%s has started recording.", self.name)
 
     def stop_recording(self):
-        self.recording = False
-        print(f"{self.name} has stopped recording.")
+        self._set("recording", False)
+        log.info("%s has stopped recording.", self.name)
 
     def get_status(self):
         return super().get_status() + f" It is currently {'recording' if self.recording else 'not recording'}."
     
 
 class SmartMusicSystem(Device):
+    __slots__ = ("volume", "playlist", "current_song")
+
     def __init__(self, name, room, power_usage=20, volume=50):
         super().__init__(name, room, power_usage)
         self.volume = volume
@@ -156,23 +213,27 @@ class SmartMusicSystem(Device):
 
 
     def add_song(self, song):
+        old_playlist = list(self.playlist)
         self.playlist.append(song)
-        print(f"'{song}' added to {self.name} playlist.")
+        self._publish("playlist", old_playlist, list(self.playlist))
+        log.info("'%s' added to %s playlist.", song, self.name)
 
     def remove_song(self, song):
         if song in self.playlist:
+            old_playlist = list(self.playlist)
             self.playlist.remove(song)
-            print(f"'{song}' removed from {self.name} playlist.")
+            self._publish("playlist", old_playlist, list(self.playlist))
+            log.info("'%s' removed from %s playlist.", song, self.name)
         else:
-            print(f"'{song}' not found in {self.name} playlist.")
+            log.warning("'%s' not found in %s playlist.", song, self.name)
 
     def set_volume(self, volume):
         if 0 <= volume <= 100:
-            self.volume = volume
-            print(f"{self.name} volume set to {self.volume}%.")
+            self._set("volume", volume)
+            log.info("%s volume set to %s%%.", self.name, self.volume)
 
         else:
-            print("Volume must be between 0 and 100.")
+            log.warning("Volume must be between 0 and 100.")
 
 
     def show_playlist(self):
@@ -185,35 +246,49 @@ class SmartMusicSystem(Device):
 
     def turn_on(self):
         if self.playlist:
+            was_on = self.status == 'ON'
             self.status = 'ON'
-            self.start_time = time.time()
-            self.current_song = self.playlist[0]
-            print(f"{self.name} is now {self.status}. Playing '{self.current_song}' at volume {self.volume}%.")
+            if not was_on:
+                # restarting while already playing must not reset the running session
+                self.start_time = clock.now()
+            self._set("current_song", self.playlist[0])
+            log.info("%s is now %s. Playing '%s' at volume %s%%.", self.name, self.status, self.current_song, self.volume)
+            if not was_on:
+                self._publish("status", 'OFF', 'ON', self.start_time)
         else:
-            print(f"{self.name} cannot be turned on. Playlist is empty.")
+            log.warning("%s cannot be turned on. Playlist is empty.", self.name)
 
     def turn_off(self):
         super().turn_off()
-        self.current_song = None
-        print(f"{self.name} has stopped playing music.")
+        self._set("current_song", None)
+        log.debug("%s has stopped playing music.", self.name)
+
+    def play_song(self, song):
+        if song in self.playlist:
+            if self.status == 'OFF':
+                self.turn_on()
+            self._set("current_song", song)
+            log.info("%s is now playing '%s'.", self.name, self.current_song)
+        else:
+            log.warning("'%s' not found in %s playlist.", song, self.name)
 
     def next_song(self):
         if self.playlist and self.current_song:
             current_index = self.playlist.index(self.current_song)
             next_index = (current_index + 1) % len(self.playlist)
-            self.current_song = self.playlist[next_index]
-            print(f"{self.name} is now playing '{self.current_song}'.")
+            self._set("current_song", self.playlist[next_index])
+            log.info("%s is now playing '%s'.", self.name, self.current_song)
         else:
-            print(f"{self.name} cannot go to the next song. Playlist is empty or music is not playing.")
+            log.warning("%s cannot go to the next song. Playlist is empty or music is not playing.", self.name)
 
     def previous_song(self):
         if self.playlist and self.current_song:
             current_index = self.playlist.index(self.current_song)
             previous_index = (current_index - 1) % len(self.playlist)
-            self.current_song = self.playlist[previous_index]
-            print(f"{self.name} is now playing '{self.current_song}'.")
+            self._set("current_song", self.playlist[previous_index])
+            log.info("%s is now playing '%s'.", self.name, self.current_song)
         else:
-            print(f"{self.name} cannot go to the previous song. Playlist is empty or music is not playing.")
+            log.warning("%s cannot go to the previous song. Playlist is empty or music is not playing.", self.name)
 
     def get_status(self):
         status = super().get_status()
@@ -225,113 +300,125 @@ class SmartMusicSystem(Device):
 
 
 class SmartBlinds(Device):
+    __slots__ = ("position",)
+
     def __init__(self, name, room, power_usage=3, position=0):
         super().__init__(name, room, power_usage)
         self.position = position  # 0 = closed, 100 = fully open
 
     def set_position(self, position):
-        self.position = position
-        print(f"{self.name} position set to {self.position}% open.")
+        self._set("position", position)
+        log.info("%s position set to %s%% open.", self.name, self.position)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} blinds are now open at {self.position}%.")
+        log.debug("%s blinds are now open at %s%%.", self.name, self.position)
 
     def turn_off(self):
         super().turn_off()
-        self.position = 0
-        print(f"{self.name} blinds are  now closed.")
+        self._set("position", 0)
+        log.debug("%s blinds are  now closed.", self.name)
 
     
 class SmartSprinkler(Device):
+    __slots__ = ("duration",)
+
     def __init__(self, name, room, power_usage=12, duration=10):
         super().__init__(name, room, power_usage)
         self.duration = duration  # in minutes
 
     def set_duration(self, duration):
-        self.duration = duration
-        print(f"{self.name} watering duration set to {self.duration} minutes.")
+        self._set("duration", duration)
+        log.info("%s watering duration set to %s minutes.", self.name, self.duration)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now watering for {self.duration} minutes.")
+        log.debug("%s is now watering for %s minutes.", self.name, self.duration)
 
     def turn_off(self):
         super().turn_off()
-        print(f"{self.name} has stopped watering.")
+        log.debug("%s has stopped watering.", self.name)
 
     
 class SmartCoffeeMaker(Device):
+    __slots__ = ("brew_strength",)
+
     def __init__(self, name, room, power_usage=800, brew_strength='Medium'):
         super().__init__(name, room, power_usage)
         self.brew_strength = brew_strength
 
     def set_brew_strength(self, strength):
-        self.brew_strength = strength
-        print(f"{self.name} brew strength set to {self.brew_strength}.")
+        self._set("brew_strength", strength)
+        log.info("%s brew strength set to %s.", self.name, self.brew_strength)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now brewing coffee with {self.brew_strength} strength.")
+        log.debug("%s is now brewing coffee with %s strength.", self.name, self.brew_strength)
 
     def turn_off(self):
         super().turn_off()
-        print(f"{self.name} has stopped brewing coffee.")
+        log.debug("%s has stopped brewing coffee.", self.name)
 
 
 class SmartVacuumCleaner(Device):
+    __slots__ = ("cleaning_mode",)
+
     def __init__(self, name, room, power_usage=150, cleaning_mode='Auto'):
         super().__init__(name, room, power_usage)
         self.cleaning_mode = cleaning_mode
 
     def set_cleaning_mode(self, mode):
-        self.cleaning_mode = mode
-        print(f"{self.name} cleaning mode set to {self.cleaning_mode}.")
+        self._set("cleaning_mode", mode)
+        log.info("%s cleaning mode set to %s.", self.name, self.cleaning_mode)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now cleaning in {self.cleaning_mode} mode.")
+        log.debug("%s is now cleaning in %s mode.", self.name, self.cleaning_mode)
 
     def turn_off(self):
         super().turn_off()
-        print(f"{self.name} has stopped cleaning.")
+        log.debug("%s has stopped cleaning.", self.name)
 
 
 class SmartDishwasher(Device):
+    __slots__ = ("wash_cycle",)
+
     def __init__(self, name, room, power_usage=1200, wash_cycle='Normal'):
         super().__init__(name, room, power_usage)
         self.wash_cycle = wash_cycle
 
     def set_wash_cycle(self, cycle):
-        self.wash_cycle = cycle
-        print(f"{self.name} wash cycle set to {self.wash_cycle}.")
+        self._set("wash_cycle", cycle)
+        log.info("%s wash cycle set to %s.", self.name, self.wash_cycle)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now running the {self.wash_cycle} wash cycle.")
+        log.debug("%s is now running the %s wash cycle.", self.name, self.wash_cycle)
 
     def turn_off(self):
         super().turn_off()
-        print(f"{self.name} has stopped the wash cycle.")
+        log.debug("%s has stopped the wash cycle.", self.name)
 
 
 class SmartTV(Device):
+    __slots__ = ("channel", "volume")
+
     def __init__(self, name, room, power_usage=100, channel=1, volume=20):
         super().__init__(name, room, power_usage)
         self.channel = channel
         self.volume = volume
 
     def set_channel(self, channel):
-        self.channel = channel
-        print(f"{self.name} channel set to {self.channel}.")
+        self._set("channel", channel)
+        log.info("%s channel set to %s.", self.name, self.channel)
 
     def set_volume(self, volume):
-        self.volume = volume
-        print(f"{self.name} volume set to {self.volume}%.")
+        self._set("volume", volume)
+        log.info("%s volume set to %s%%.", self.name, self.volume)
 
     def turn_on(self):
         super().turn_on()
-        print(f"{self.name} is now on channel {self.channel} at volume {self.volume}%.")
+        log.debug("%s is now on channel %s at volume %s%%.", self.name, self.channel, self.volume)
 
     def turn_off(self):
         super().turn_off()
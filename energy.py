@@ -0,0 +1,128 @@
+import clock
+
+from events import DeviceChanged
+
+
+# watts x seconds -> kWh
+WS_PER_KWH = 3600 * 1000
+
+
+class EnergyLedger:
+    """Running kWh totals per device, per room and for the whole home.
+
+    Finished sessions are folded into closed totals when a device turns off. Devices
+    that are still on are counted in-flight from two running sums per room - the power
+    drawn and power x start time - so the whole-home total is O(1) and a per-room
+    report is O(rooms), however many devices the home has. Start times are stored
+    relative to the ledger's epoch to keep those sums small and precise.
+    """
+
+    def __init__(self, bus=None, clock=clock.now):
+        self.clock = clock
+        self.epoch = clock()
+        self.closed_kwh = 0.0
+        self.on_watts = 0.0
+        self.on_watt_seconds = 0.0   # sum of power x (start - epoch) over running devices
+        self.rooms = {}              # room -> [closed_kwh, on_watts, on_watt_seconds]
+        self.sessions = {}           # id(device) -> (room, watts, start - epoch)
+        if bus is not None:
+            bus.subscribe(self.on_device_changed, DeviceChanged)
+
+
+    def _room(self, room):
+        totals = self.rooms.get(room)
+        if totals is None:
+            totals = self.rooms[room] = [0.0, 0.0, 0.0]
+        return totals
+
+
+    #session bookkeeping
+
+    def start(self, device, timestamp):
+        if id(device) in self.sessions:
+            return
+        watts = device.power_usage
+        offset = timestamp - self.epoch
+        self.sessions[id(device)] = (device.room, watts, offset)
+        self.on_watts += watts
+        self.on_watt_seconds += watts * offset
+        room = self._room(device.room)
+        room[1] += watts
+        room[2] += watts * offset
+
+
+    def _drop_session(self, device):
+        session = self.sessions.pop(id(device), None)
+        if session is None:
+            return None
+        room_name, watts, offset = session
+        self.on_watts -= watts
+        self.on_watt_seconds -= watts * offset
+        room = self._room(room_name)
+        room[1] -= watts
+        room[2] -= watts * offset
+        return session
+
+
+    def stop(self, device, timestamp):
+        session = self._drop_session(device)
+        if session is None:
+            return
+        room_name, watts, offset = session
+        kwh = watts * (timestamp - self.epoch - offset) / WS_PER_KWH
+        self.closed_kwh += kwh
+        self.rooms[room_name][0] += kwh
+
+
+    def on_device_changed(self, event):
+        if event.field != "status":
+            return
+        if event.new == "ON":
+            self.start(event.source, event.timestamp)
+        else:
+            self.stop(event.source, event.timestamp)
+
+
+    #membership
+
+    def add(self, device):
+        # energy the device used before it joined this home
+        self.closed_kwh += device.energy_kwh
+        self._room(device.room)[0] += device.energy_kwh
+        if device.status == "ON":
+            self.start(device, device.start_time or self.clock())
+
+
+    def remove(self, device):
+        # the device takes its history and its running session with it
+        self._drop_session(device)
+        self.closed_kwh -= device.energy_kwh
+        self._room(device.room)[0] -= device.energy_kwh
+
+
+    def move(self, device, old_room):
+        # room totals always describe the devices currently in the room
+        session = self._drop_session(device)
+        self._room(old_room)[0] -= device.energy_kwh
+        self._room(device.room)[0] += device.energy_kwh
+        if session is not None:
+            self.start(device, self.epoch + session[2])
+
+
+    #reports
+
+    def total_kwh(self, now=None):
+        now = self.clock() if now is None else now
+        running = (self.on_watts * (now - self.epoch) - self.on_watt_seconds) / WS_PER_KWH
+        return self.closed_kwh + running
+
+
+    def room_kwh(self, now=None):
+        now = self.clock() if now is None else now
+        elapsed = now - self.epoch
+        return {room: closed + (watts * elapsed - watt_seconds) / WS_PER_KWH
+                for room, (closed, watts, watt_seconds) in self.rooms.items()}
+
+
+    def running_watts(self):
+        return self.on_watts
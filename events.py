@@ -0,0 +1,169 @@
+from collections import deque
+from tracing import get_logger
+
+log = get_logger("events")
+
+
+class ChangeEvent:
+    """One field of a sensor or device changed from `old` to `new` at `timestamp`."""
+
+    __slots__ = ("source", "field", "old", "new", "timestamp")
+
+    def __init__(self, source, field, old, new, timestamp):
+        self.source = source
+        self.field = field
+        self.old = old
+        self.new = new
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.source.name}.{self.field}: {self.old!r} -> {self.new!r})"
+
+
+class SensorChanged(ChangeEvent):
+    __slots__ = ()
+
+
+class DeviceChanged(ChangeEvent):
+    __slots__ = ()
+
+
+class Subscription:
+    __slots__ = ("handler", "event_type", "source_class", "room", "name", "queued", "bucket")
+
+    def __init__(self, handler, event_type, source_class, room, name, queued):
+        self.handler = handler
+        self.event_type = event_type
+        self.source_class = source_class
+        self.room = room
+        self.name = name
+        self.queued = queued
+        self.bucket = None
+
+    def matches(self, event):
+        source = event.source
+        if self.name is not None and source.name != self.name:
+            return False
+        if self.room is not None and source.room != self.room:
+            return False
+        if self.source_class is not None and not isinstance(source, self.source_class):
+            return False
+        return True
+
+
+class EventBus:
+    """In-process publish/subscribe for sensor and device changes.
+
+    Each subscription is filed under its most selective key (name, then room,
+    then source class), so publishing an event only looks at a few buckets
+    and the subscribers inside them - never at every sensor or subscriber.
+    Queued subscriptions are collected and run later by drain(); the controller
+    drains them on every tick(). With `max_queued` the oldest queued call is
+    dropped when the queue is full, and counted in `dropped`.
+    """
+
+    def __init__(self, max_queued=None):
+        self._by_name = {}    # (event_type, name) -> [Subscription]
+        self._by_room = {}    # (event_type, room) -> [Subscription]
+        self._by_class = {}   # (event_type, source_class) -> [Subscription]
+        self._all = {}        # event_type -> [Subscription]
+        self._route_cache = {}
+        self.queue = deque(maxlen=max_queued)
+        self.published = 0
+        self.dropped = 0
+        self._overflowing = False
+
+
+    def subscribe(self, handler, event_type=ChangeEvent, source_class=None, room=None, name=None, queued=False):
+        sub = Subscription(handler, event_type, source_class, room, name, queued)
+
+        if name is not None:
+            table, key = self._by_name, (event_type, name)
+        elif room is not None:
+            table, key = self._by_room, (event_type, room)
+        elif source_class is not None:
+            table, key = self._by_class, (event_type, source_class)
+        else:
+            table, key = self._all, event_type
+
+        sub.bucket = table.setdefault(key, [])
+        sub.bucket.append(sub)
+        return sub
+
+
+    def unsubscribe(self, sub):
+        if sub.bucket is not None and sub in sub.bucket:
+            sub.bucket.remove(sub)
+        sub.bucket = None
+
+
+    def _routes(self, event_type, source_type):
+        # the (event class, source class) keys worth probing, computed once per pair
+        key = (event_type, source_type)
+        routes = self._route_cache.get(key)
+        if routes is None:
+            event_types = [t for t in event_type.__mro__ if issubclass(t, ChangeEvent)]
+            source_types = [t for t in source_type.__mro__ if t is not object]
+            routes = (event_types, [(e, s) for e in event_types for s in source_types])
+            self._route_cache[key] = routes
+        return routes
+
+
+    def publish(self, event):
+        self.published += 1
+        source = event.source
+        event_types, class_keys = self._routes(type(event), type(source))
+
+        for event_type in event_types:
+            self._deliver(self._all.get(event_type), event)
+            if self._by_name:
+                self._deliver(self._by_name.get((event_type, source.name)), event)
+            if self._by_room:
+                self._deliver(self._by_room.get((event_type, source.room)), event)
+
+        if self._by_class:
+            for key in class_keys:
+                self._deliver(self._by_class.get(key), event)
+
+
+    def _deliver(self, subs, event):
+        if not subs:
+            return
+        for sub in list(subs):
+            if not sub.matches(event):
+                continue
+            if sub.queued:
+                queue = self.queue
+                if queue.maxlen is not None and len(queue) == queue.maxlen:
+                    self.dropped += 1
+                    # once per overflow, not once per event; drain() re-arms the warning
+                    if not self._overflowing:
+                        self._overflowing = True
+                        log.warning("⚠️ Event queue full (%s calls): dropping the oldest, %s dropped so far",
+                                    queue.maxlen, self.dropped)
+                queue.append((sub.handler, event))
+            else:
+                self._call(sub.handler, event)
+
+
+    def _call(self, handler, event):
+        try:
+            handler(event)
+        except Exception:
+            log.exception("⚠️ Event handler %r failed on %r", handler, event)
+
+
+    def drain(self, limit=None):
+        """Run queued handlers in arrival order; returns how many ran."""
+        count = 0
+        while self.queue and (limit is None or count < limit):
+            handler, event = self.queue.popleft()
+            self._call(handler, event)
+            count += 1
+        if not self.queue:
+            self._overflowing = False
+        return count
+
+
+    def stats(self):
+        return {"published": self.published, "queued": len(self.queue), "dropped": self.dropped}
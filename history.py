@@ -0,0 +1,161 @@
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from tracing import get_logger
+
+log = get_logger("history")
+
+
+# one spilled reading: timestamp, value (little-endian doubles)
+RECORD = struct.Struct("<dd")
+
+
+def spill_path(spill_dir, sensor):
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{sensor.room}__{sensor.name}")
+    return os.path.join(spill_dir, safe + ".hist")
+
+
+class SensorHistory:
+    """Timestamped readings of one sensor.
+
+    The newest `capacity` readings stay in memory in a ring buffer of two flat double
+    arrays. When the ring is full, its oldest half is appended to the sensor's spill
+    file in one write (fixed-size records, oldest first); without a spill file those
+    readings are dropped. Range queries binary-search the in-memory readings and a
+    read-only mmap of the spill file, so they only touch the records they return.
+    Readings are expected in time order, as live sensors deliver them.
+    """
+
+    def __init__(self, capacity=1024, path=None):
+        self.capacity = max(2, capacity)
+        self.path = path
+        self.times = array("d")
+        self.values = array("d")
+        self.head = 0        # index of the oldest reading once the ring has wrapped
+        self.spilled = 0     # readings written to the spill file by this history
+        self.dropped = 0     # readings evicted with nowhere to go
+
+
+    def __len__(self):
+        return len(self.times)
+
+
+    def append(self, timestamp, value):
+        if len(self.times) < self.capacity:
+            self.times.append(timestamp)
+            self.values.append(float(value))
+            return
+        if self.head == 0:
+            self._spill()
+            if len(self.times) < self.capacity:
+                self.times.append(timestamp)
+                self.values.append(float(value))
+                return
+        self.times[self.head] = timestamp
+        self.values[self.head] = float(value)
+        self.head = (self.head + 1) % self.capacity
+
+
+    def _ordered(self):
+        # the ring as chronological arrays
+        if self.head == 0:
+            return self.times, self.values
+        h = self.head
+        return self.times[h:] + self.times[:h], self.values[h:] + self.values[:h]
+
+
+    def _spill(self):
+        # moves the oldest half out of memory in one write, leaving the ring unwrapped
+        times, values = self._ordered()
+        half = len(times) // 2
+        if self.path is not None:
+            chunk = array("d", [0.0]) * (2 * half)
+            chunk[0::2] = times[:half]
+            chunk[1::2] = values[:half]
+            if sys.byteorder == "big":
+                chunk.byteswap()  # spill files are little-endian on every platform
+            with open(self.path, "ab") as f:
+                f.write(chunk.tobytes())
+            self.spilled += half
+            log.debug("Spilled %s readings to %s", half, self.path)
+        else:
+            self.dropped += half
+        self.times, self.values = times[half:], values[half:]
+        self.head = 0
+
+
+    #queries
+
+    def latest(self):
+        if not self.times:
+            return None
+        i = (self.head - 1) % len(self.times)
+        return self.times[i], self.values[i]
+
+
+    def query(self, start=None, end=None):
+        """Readings with start <= timestamp <= end, oldest first, as (timestamp, value) pairs."""
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        readings = self._query_spill(start, end)
+
+        times, values = self._ordered()
+        lo, hi = bisect_left(times, start), bisect_right(times, end)
+        readings.extend(zip(times[lo:hi], values[lo:hi]))
+        return readings
+
+
+    def _query_spill(self, start, end):
+        if self.path is None or not os.path.exists(self.path):
+            return []
+        size = os.path.getsize(self.path)
+        count = size // RECORD.size
+        if count == 0:
+            return []
+
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), count * RECORD.size, access=mmap.ACCESS_READ) as m:
+            def time_at(i):
+                return RECORD.unpack_from(m, i * RECORD.size)[0]
+
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if time_at(mid) < start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+
+            readings = []
+            for i in range(lo, count):
+                record = RECORD.unpack_from(m, i * RECORD.size)
+                if record[0] > end:
+                    break
+                readings.append(record)
+        return readings
+
+
+class HistoryRecorder:
+    """Gives sensors a SensorHistory, spilling to one file per sensor under `spill_dir`."""
+
+    def __init__(self, capacity=1024, spill_dir=None):
+        self.capacity = capacity
+        self.spill_dir = spill_dir
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+
+    def attach(self, sensor):
+        if sensor.history is None:
+            path = spill_path(self.spill_dir, sensor) if self.spill_dir is not None else None
+            sensor.history = SensorHistory(self.capacity, path)
+        return sensor.history
+
+
+    def detach(self, sensor):
+        # the spill file stays on disk; re-adding the sensor picks it up again
+        sensor.history = None
@@ -0,0 +1,266 @@
+"""Headless Homi: runs a home's controller and automation loop without the GUI.
+
+    python -m homi                                  # commands on stdin
+    python -m homi --socket 127.0.0.1:7800          # ... and on a local TCP socket
+    python -m homi --no-state -c status -c "mode Sleep"
+
+The home is restored from --state-dir (the demo home when nothing was saved yet) and
+saved back on exit. Commands are one per line, with quoted names for names that
+contain spaces:
+
+    status | devices | sensors | energy | rules | stats | schedules | help | quit
+    on "Ceiling Light"        off "Ceiling Light"
+    call "Ceiling Light" set_brightness 80
+    set "LR Thermostat" 18
+    mode Sleep
+
+Nothing here imports customtkinter or tkinter, so scripts and tests can drive a
+home on machines without a display.
+"""
+import argparse
+import logging
+import shlex
+import socketserver
+import sys
+import threading
+import time
+
+import tracing
+from demo_home import build_demo_home
+from persistence import StateStore, DEFAULT_DIR
+from controller import SmartHomeController
+from runtime import ControllerRuntime
+from rules import format_stats
+
+log = tracing.get_logger("homi")
+
+COMMAND_TIMEOUT = 10  # seconds a command may wait for the runtime
+
+HELP = """\
+status | devices | sensors | energy | rules | stats | schedules | help | quit
+on NAME | off NAME                  switch a device
+call NAME METHOD [ARGS...]          any device method, e.g. call "Ceiling Light" set_brightness 80
+set SENSOR VALUE                    feed a sensor reading
+mode Auto|Sleep|Away"""
+
+
+def parse_value(text):
+    lowered = text.lower()
+    if lowered in ("true", "on", "yes"):
+        return True
+    if lowered in ("false", "off", "no"):
+        return False
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+class Daemon:
+    """A controller on a ControllerRuntime plus the text commands that drive it.
+
+    execute() may be called from any thread (stdin, socket handlers); controller work
+    always runs on the runtime's loop.
+    """
+
+    def __init__(self, controller, runtime):
+        self.controller = controller
+        self.runtime = runtime
+        self.stopping = threading.Event()
+        self.commands = {
+            "status": self.cmd_status,
+            "devices": self.cmd_devices,
+            "sensors": self.cmd_sensors,
+            "energy": self.cmd_energy,
+            "rules": self.cmd_rules,
+            "stats": self.cmd_stats,
+            "schedules": self.cmd_schedules,
+            "on": lambda name: self.cmd_call(name, "turn_on"),
+            "off": lambda name: self.cmd_call(name, "turn_off"),
+            "call": self.cmd_call,
+            "set": self.cmd_set,
+            "mode": self.cmd_mode,
+            "help": self.cmd_help,
+            "quit": self.cmd_quit,
+        }
+
+
+    def execute(self, line):
+        """Runs one command line and returns its output text."""
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            return f"error: {e}"
+        if not words:
+            return ""
+        handler = self.commands.get(words[0].lower())
+        if handler is None:
+            return f"error: unknown command {words[0]!r} (try 'help')"
+        try:
+            return handler(*words[1:])
+        except TypeError:
+            return f"error: wrong arguments for {words[0]!r} (try 'help')"
+        except Exception as e:
+            log.exception("Command %r failed", line)
+            return f"error: {e}"
+
+
+    def _run(self, fn, *args):
+        return self.runtime.submit(fn, *args).result(COMMAND_TIMEOUT)
+
+
+    #commands
+
+    def cmd_status(self):
+        c = self.controller
+        on = self._run(lambda: sum(1 for d in c.devices if d.is_on))
+        return (f"mode {c.system_mode}, {len(c.devices)} devices ({on} on), {len(c.sensors)} sensors, "
+                f"{self.runtime.passes} rule passes, rules {'pending' if self.runtime.rules_pending else 'idle'}")
+
+
+    def cmd_devices(self):
+        return "\n".join(f"[{d.room}] {d.get_status()}" for d in self._run(list, self.controller.devices))
+
+
+    def cmd_sensors(self):
+        return "\n".join(f"[{s.room}] {s.name}: {s.value}" for s in self._run(list, self.controller.sensors))
+
+
+    def cmd_energy(self):
+        rooms, total, watts = self._run(self.controller.get_room_energy_report)
+        lines = [f"{r['room']}: {r['kwh']} kWh" for r in rooms]
+        lines.append(f"total {total} kWh, drawing {watts} W now")
+        return "\n".join(lines)
+
+
+    def cmd_rules(self):
+        actions = self._run(self.controller.apply_automation_rules, True)
+        return "\n".join(f"{name}: {field} {old} -> {new}" for name, field, old, new in actions) or "no changes"
+
+
+    def cmd_stats(self):
+        if self.controller.pass_stats is None:
+            return "rule stats are off (start with --rule-stats)"
+        return format_stats(self._run(self.controller.get_stats))
+
+
+    def cmd_schedules(self):
+        upcoming = self._run(self.controller.schedules.upcoming)
+        return "\n".join(f"{time.strftime('%a %H:%M', time.localtime(fire))}  {s.name}" for fire, s in upcoming)
+
+
+    def cmd_call(self, name, method, *args):
+        device = self.controller.get_device(name)
+        if device is None:
+            return f"error: unknown device {name!r}"
+        if method.startswith("_") or not callable(getattr(device, method, None)):
+            return f"error: {type(device).__name__} has no command {method!r}"
+        result = self.runtime.send_command(device, method, *map(parse_value, args)).result(COMMAND_TIMEOUT)
+        return device.get_status() if result is None else str(result)
+
+
+    def cmd_set(self, name, value):
+        accepted, reason = self.runtime.submit_reading(name, parse_value(value)).result(COMMAND_TIMEOUT)
+        return f"{name} = {value}" if accepted else f"rejected: {reason}"
+
+
+    def cmd_mode(self, mode):
+        summary = self._run(self.controller.set_system_mode, mode)
+        return f"mode {mode}: {summary['changed']} device changes in {summary['duration_ms']:.1f} ms"
+
+
+    def cmd_help(self):
+        return HELP
+
+
+    def cmd_quit(self):
+        self.stopping.set()
+        return "bye"
+
+
+    #frontends
+
+    def serve_lines(self, lines, out):
+        for line in lines:
+            reply = self.execute(line)
+            if reply:
+                out.write(reply + "\n")
+                out.flush()
+            if self.stopping.is_set():
+                return
+
+
+    def serve_socket(self, host, port):
+        """Accepts line-based command connections on host:port in a background thread."""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    reply = daemon.execute(raw.decode("utf-8", "replace"))
+                    self.wfile.write((reply + "\n").encode("utf-8"))
+                    if daemon.stopping.is_set():
+                        return
+
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="homi-socket", daemon=True).start()
+        log.info("Listening for commands on %s:%s", *server.server_address)
+        return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a Homi home without the GUI")
+    parser.add_argument("--state-dir", default=DEFAULT_DIR, help="snapshot and change log directory")
+    parser.add_argument("--no-state", action="store_true", help="start from the demo home and save nothing")
+    parser.add_argument("--socket", metavar="HOST:PORT", help="also accept commands on a local TCP socket")
+    parser.add_argument("--tick", type=float, default=None, help="seconds between periodic rule passes")
+    parser.add_argument("--debounce", type=float, default=0.25, help="quiet period before a rule pass")
+    parser.add_argument("--rule-stats", type=float, default=None, metavar="SECONDS", nargs="?", const=0,
+                        help="profile rule passes; with SECONDS also log the counters that often")
+    parser.add_argument("-c", "--command", action="append", default=[],
+                        help="run a command and exit when all -c commands ran (repeatable)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log controller activity to stderr")
+    args = parser.parse_args(argv)
+
+    tracing.configure(logging.INFO if args.verbose else logging.WARNING)
+
+    store = None if args.no_state else StateStore(args.state_dir)
+    c = store.restore() if store else SmartHomeController()
+    if not c.devices and not c.sensors:
+        build_demo_home(c)
+    if store:
+        store.attach(c)
+
+    if args.rule_stats is not None:
+        c.enable_rule_stats(args.rule_stats or None)
+
+    runtime = ControllerRuntime(c, tick_interval=args.tick, debounce=args.debounce).start()
+    daemon = Daemon(c, runtime)
+    server = None
+    try:
+        if args.command:
+            daemon.serve_lines(args.command, sys.stdout)
+        else:
+            if args.socket:
+                host, _, port = args.socket.rpartition(":")
+                server = daemon.serve_socket(host or "127.0.0.1", int(port))
+            daemon.serve_lines(sys.stdin, sys.stdout)
+            # stdin closed (e.g. running as a service): keep serving the socket until 'quit'
+            if server is not None:
+                daemon.stopping.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+        runtime.stop()
+        if store:
+            store.snapshot()
+            store.detach()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,50 @@
 import customtkinter as ctk
 from tkinter import messagebox
-import time
+import logging
+import threading
 from devices import *
 from sensors import *
-from controller import SmartHomeController
+from runtime import ControllerRuntime
+from persistence import StateStore, DEFAULT_DIR
+from demo_home import build_demo_home
+from dashboard import DeviceGrid, ALL
+from events import DeviceChanged, SensorChanged
+import tracing
+
+log = tracing.get_logger("gui")
+
+# state changes are applied to widgets at most once per frame
+FRAME_MS = 33
 
 # -----theme-----
 ctk.set_appearance_mode("Dark") 
 ctk.set_default_color_theme("dark-blue")
 
 class SmartHomeApp(ctk.CTk):
-    def __init__(self, controller):
+    def __init__(self, controller, runtime):
         super().__init__()
         self.controller = controller
+        self.runtime = runtime  # every controller mutation runs on the runtime's thread
         self.title("🏠 Smart Home Ultimate OS")
         self.geometry("1280x850")
         
         self.status_indicators = {} 
         self.music_widgets = {} 
+        self.dashboard = None  # DeviceGrid while the dashboard page is open
+        self.sensor_widgets = {}  # sensor name -> (value label, input widget, unit) on the simulator page
+        self.mode_buttons = {}    # mode -> (button, color) on the modes page
+        self.shown_mode = controller.system_mode
+        self.energy_total_label = None
+        self.energy_job = None
+        self.energy_request = None
+        self.automation_label = None
+
+        # bus events arrive on the runtime thread; they only record what changed
+        self.changes_lock = threading.Lock()
+        self.changed_devices = set()
+        self.changed_sensors = set()
+        self.runtime.submit(controller.bus.subscribe, self.on_device_changed, DeviceChanged).result()
+        self.runtime.submit(controller.bus.subscribe, self.on_sensor_changed, SensorChanged).result()
 
         
         self.device_classes = {
@@ -34,7 +61,105 @@ class SmartHomeApp(ctk.CTk):
             "Floor Clean Sensor": FloorCleanSensor, "Humidity Sensor": HumiditySensor
         }
 
+        # bound once for the app, not per grid: each dashboard visit builds a new DeviceGrid
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_all(sequence, self.on_wheel, add="+")
+
         self.show_login_screen()
+        self.flush_changes()
+
+
+    # --------runtime bridge--------
+
+    def run_async(self, fn, *args, then=None):
+        future = self.runtime.submit(fn, *args)
+        if then:
+            self.when_done(future, then)
+        return future
+
+    def when_done(self, future, callback):
+        # futures resolve on the runtime thread; Tk may only be touched from this one
+        if not future.done():
+            self.after(20, lambda: self.when_done(future, callback))
+            return
+        error = future.exception()
+        if error:
+            messagebox.showerror("Error", str(error))
+        else:
+            callback(future.result())
+
+    def on_device_changed(self, event):
+        with self.changes_lock:
+            self.changed_devices.add(event.source.name)
+
+    def on_sensor_changed(self, event):
+        with self.changes_lock:
+            self.changed_sensors.add(event.source.name)
+
+    def flush_changes(self):
+        # one pass per frame patches every widget whose component changed since the last one,
+        # however many events arrived in between
+        with self.changes_lock:
+            devices, self.changed_devices = self.changed_devices, set()
+            sensors, self.changed_sensors = self.changed_sensors, set()
+
+        last_pass = None
+        while not self.runtime.results.empty():
+            result = self.runtime.results.get_nowait()
+            if result["kind"] == "rules":
+                last_pass = result
+        if last_pass is not None or self.runtime.rules_pending:
+            self.show_automation_status(last_pass)
+
+        for name in devices:
+            self.refresh_device_widgets(name)
+        for name in sensors:
+            self.refresh_sensor_widgets(name)
+        if devices and self.energy_total_label is not None and self.energy_total_label.winfo_exists():
+            self.refresh_energy()
+        if self.controller.system_mode != self.shown_mode:
+            self.refresh_mode_buttons()
+        self.after(FRAME_MS, self.flush_changes)
+
+    def on_wheel(self, event):
+        if self.dashboard is not None and self.dashboard.winfo_exists():
+            self.dashboard.on_wheel(event)
+
+    def refresh_device_widgets(self, name):
+        device = self.controller.get_device(name)
+        if device is None:
+            return
+        if self.dashboard is not None and self.dashboard.winfo_exists():
+            self.dashboard.refresh(device)
+
+    def show_automation_status(self, last_pass=None):
+        if self.automation_label is None:
+            return
+        if self.runtime.rules_pending:
+            self.automation_label.configure(text="⏳ Automation pending…", text_color="#f1c40f")
+        elif last_pass is not None:
+            log.debug("Rule pass finished: %s actions in %.1f ms", len(last_pass["actions"]), last_pass["duration_ms"])
+            self.automation_label.configure(
+                text=f"✅ Rules evaluated: {len(last_pass['actions'])} actions ({last_pass['duration_ms']:.0f} ms)",
+                text_color="#2ecc71")
+
+    def refresh_sensor_widgets(self, name):
+        sensor = self.controller.get_sensor(name)
+        widgets = self.sensor_widgets.get(name)
+        if sensor is None or widgets is None or not widgets[1].winfo_exists():
+            return
+        label, control, unit = widgets
+        if isinstance(control, ctk.CTkSegmentedButton):
+            control.set("Active" if sensor.value else "Inactive")
+        else:
+            control.set(sensor.value)
+            label.configure(text=f"{sensor.value}{unit}")
+
+    def refresh_mode_buttons(self):
+        self.shown_mode = mode = self.controller.system_mode
+        for name, (btn, color) in self.mode_buttons.items():
+            if btn.winfo_exists():
+                btn.configure(border_color="white" if name == mode else color, border_width=4 if name == mode else 0)
 
     # --------login screen--------
     def show_login_screen(self):
@@ -86,6 +211,9 @@ class SmartHomeApp(ctk.CTk):
         self.create_nav_btn("➕  Add Component", self.show_add_page)
         self.create_nav_btn("🛡️  Settings", self.show_settings)
         
+        self.automation_label = ctk.CTkLabel(self.sidebar, text="🤖 Automation idle", font=("Arial", 12), text_color="gray")
+        self.automation_label.pack(side="bottom", pady=(0, 5))
+
         ctk.CTkButton(self.sidebar, text="⏻ Log Out", command=self.quit, fg_color="#c0392b", hover_color="#e74c3c", height=40).pack(side="bottom", fill="x", padx=20, pady=30)
 
         self.content_area = ctk.CTkFrame(self, corner_radius=0, fg_color="#1a1a1a")
@@ -116,77 +244,43 @@ class SmartHomeApp(ctk.CTk):
         self.clear_content()
         self.add_header("Dashboard", "Real-time device control")
 
-        scroll = ctk.CTkScrollableFrame(self.content_area, fg_color="transparent")
-        scroll.pack(fill="both", expand=True, padx=20, pady=10)
-
         self.status_indicators = {}
-        self.music_widgets = {} 
-
-        row, col = 0, 0
-        for device in self.controller.devices:
-            if isinstance(device, SmartMusicSystem):
-                if col == 1: 
-                    row += 1
-                    col = 0
-                self.create_music_card(scroll, device, row, col)
-                row += 1
-                col = 0
-            else:
-                self.create_generic_card(scroll, device, row, col)
-                col += 1
-                if col > 1:
-                    col = 0
-                    row += 1
-
-    def create_generic_card(self, parent, device, r, c):
-        card = ctk.CTkFrame(parent, corner_radius=15, fg_color="#2b2b2b", border_width=1, border_color="#3a3a3a")
-        card.grid(row=r, column=c, padx=10, pady=10, sticky="ew")
-        
-        status_color = self.get_status_color(device)
-
-        header = ctk.CTkFrame(card, fg_color="transparent")
-        header.pack(fill="x", padx=15, pady=12)
-        
-        icon = self.get_icon(device)
-        ctk.CTkLabel(header, text=f"{icon}  {device.name}", font=("Arial", 16, "bold"), text_color="white").pack(side="left")
-        
-        indicator = ctk.CTkLabel(header, text="●", text_color=status_color, font=("Arial", 20))
-        indicator.pack(side="right")
-        self.status_indicators[device.name] = indicator
-
-        ctk.CTkLabel(card, text=f"📍 {device.room}", font=("Arial", 12), text_color="gray").pack(anchor="w", padx=15, pady=(0, 10))
-
-        controls = ctk.CTkFrame(card, fg_color="#212121", corner_radius=10)
-        controls.pack(fill="x", padx=15, pady=(0, 15))
-
-        is_on = (device.status == "ON")
-        if isinstance(device, SmartDoorLock): is_on = device.locked
-
-        switch_var = ctk.StringVar(value="on" if is_on else "off")
-        switch_txt = "Lock" if isinstance(device, SmartDoorLock) else "Power"
-        
-        ctk.CTkSwitch(controls, text=switch_txt, variable=switch_var, onvalue="on", offvalue="off",
-                      command=lambda: self.handle_toggle_no_reload(device, switch_var), 
-                      font=("Arial", 13, "bold")).pack(side="right", padx=10, pady=10)
-
-        if hasattr(device, 'set_brightness'):
-            self.add_slider(controls, device, "Bright", 0, 100, device.brightness, device.set_brightness)
-        elif hasattr(device, 'set_temperature'):
-            self.add_slider(controls, device, "Temp", 16, 30, device.temperature, device.set_temperature)
-        elif isinstance(device, SmartBlinds):
-             self.add_slider(controls, device, "Open", 0, 100, device.position, device.set_position)
+        self.music_widgets = {}
+
+        bar = ctk.CTkFrame(self.content_area, fg_color="transparent")
+        bar.pack(fill="x", padx=30)
+        rooms = [ALL] + sorted(self.controller.device_index.rooms())
+        room_menu = ctk.CTkOptionMenu(bar, values=rooms, width=180)
+        room_menu.pack(side="left", padx=(0, 10))
+        type_menu = ctk.CTkOptionMenu(bar, values=[ALL] + list(self.device_classes), width=180)
+        type_menu.pack(side="left")
+
+        # filters only recompute which rows exist; the visible cards are re-bound in place
+        def apply_filter(_=None):
+            room = None if room_menu.get() == ALL else room_menu.get()
+            cls = self.device_classes.get(type_menu.get())
+            self.dashboard.set_filter(room, cls)
+        room_menu.configure(command=apply_filter)
+        type_menu.configure(command=apply_filter)
+
+        self.dashboard = DeviceGrid(self.content_area, self, self.devices_for)
+        self.dashboard.pack(fill="both", expand=True, padx=20, pady=10)
+
+    def devices_for(self, room, cls):
+        index = self.controller.device_index
+        if room is not None:
+            return list(index.in_room(room, cls))
+        if cls is not None:
+            return list(index.of_type(cls))
+        return list(self.controller.devices)
 
     def handle_toggle_no_reload(self, device, var):
         if isinstance(device, SmartDoorLock):
-            if var.get() == "on": device.lock()
-            else: device.unlock()
+            action = device.lock if var.get() == "on" else device.unlock
         else:
-            if var.get() == "on": device.turn_on()
-            else: device.turn_off()
-        
-        if device.name in self.status_indicators:
-            new_color = self.get_status_color(device)
-            self.status_indicators[device.name].configure(text_color=new_color)
+            action = device.turn_on if var.get() == "on" else device.turn_off
+
+        self.run_async(action, then=lambda _: self.refresh_device_widgets(device.name))
 
     def get_status_color(self, device):
         if isinstance(device, SmartDoorLock):
@@ -207,57 +301,6 @@ class SmartHomeApp(ctk.CTk):
 
     #--------- music card ---------
 
-    def create_music_card(self, parent, device, r, c):
-        card = ctk.CTkFrame(parent, corner_radius=15, fg_color="#1e1e2e", border_width=2, border_color="#8e44ad")
-        card.grid(row=r, column=c, columnspan=2, padx=10, pady=10, sticky="ew")
-        
-        header = ctk.CTkFrame(card, fg_color="transparent")
-        header.pack(fill="x", padx=20, pady=10)
-        ctk.CTkLabel(header, text="🎵  Media Center", font=("Arial", 16, "bold"), text_color="#bb86fc").pack(side="left")
-        ctk.CTkLabel(header, text=f"{device.name}", text_color="gray").pack(side="right")
-
-        screen = ctk.CTkFrame(card, fg_color="black", corner_radius=10, height=40)
-        screen.pack(fill="x", padx=20, pady=5)
-        
-        song_txt = f"🎶 {device.current_song}" if device.status == "ON" and device.current_song else "⏹ Stopped"
-        song_label = ctk.CTkLabel(screen, text=song_txt, font=("Consolas", 14), text_color="#03dac6")
-        song_label.pack(pady=10)
-
-        ctrl = ctk.CTkFrame(card, fg_color="transparent")
-        ctrl.pack(fill="x", padx=20, pady=10)
-        self.add_slider(ctrl, device, "Vol", 0, 100, device.volume, device.set_volume)
-
-        vals = device.playlist if device.playlist else ["(Empty)"]
-        music_menu = ctk.CTkOptionMenu(ctrl, values=vals, width=150, dynamic_resizing=False,
-                                            command=lambda s: self.play_specific_song_smooth(device, s))
-        music_menu.set("Playlist")
-        music_menu.pack(side="right", padx=10)
-
-        ctk.CTkButton(ctrl, text="🗑️", width=30, fg_color="#c0392b", command=lambda: self.remove_song_gui(device, music_menu)).pack(side="right", padx=2)
-        ctk.CTkButton(ctrl, text="➕", width=30, fg_color="#27ae60", command=lambda: self.add_song_gui(device, music_menu)).pack(side="right", padx=2)
-
-        btns = ctk.CTkFrame(card, fg_color="transparent")
-        btns.pack(pady=(0, 15))
-        
-        ctk.CTkButton(btns, text="⏮", width=50, fg_color="#333", 
-                      command=lambda: [device.previous_song(), self.update_music_ui(device)]).pack(side="left", padx=5)
-        
-        play_txt = "⏹ Stop" if device.status == "ON" else "▶ Play"
-        play_col = "#c0392b" if device.status == "ON" else "#27ae60"
-  
-        play_btn = ctk.CTkButton(btns, text=play_txt, width=80, fg_color=play_col, 
-                      command=lambda: self.handle_music_toggle_smooth(device))
-        play_btn.pack(side="left", padx=5)
-        
-        ctk.CTkButton(btns, text="⏭", width=50, fg_color="#333", 
-                      command=lambda: [device.next_song(), self.update_music_ui(device)]).pack(side="left", padx=5)
-
-        self.music_widgets[device.name] = {
-            "label": song_label,
-            "play_btn": play_btn,
-            "menu": music_menu
-        }
-
     def update_music_ui(self, device):
         """تحديث شكل كارت الموسيقى فقط"""
         widgets = self.music_widgets.get(device.name)
@@ -274,43 +317,27 @@ class SmartHomeApp(ctk.CTk):
         widgets["menu"].configure(values=new_vals)
 
     def handle_music_toggle_smooth(self, device):
-        if device.status == "ON": device.turn_off()
-        else: device.turn_on()
-        self.update_music_ui(device) 
+        action = device.turn_off if device.status == "ON" else device.turn_on
+        self.run_async(action, then=lambda _: self.update_music_ui(device))
 
     def play_specific_song_smooth(self, device, song):
         if song in device.playlist:
-            device.current_song = song
-            if device.status == "OFF": device.turn_on()
-            self.update_music_ui(device)
+            self.run_async(device.play_song, song, then=lambda _: self.update_music_ui(device))
 
     def add_song_gui(self, device, menu_widget):
         dialog = ctk.CTkInputDialog(text="Enter Song Name:", title="Add to Playlist")
         song = dialog.get_input()
         if song:
-            device.add_song(song)
-            self.update_music_ui(device)
+            self.run_async(device.add_song, song, then=lambda _: self.update_music_ui(device))
 
     def remove_song_gui(self, device, menu_widget):
         selected = menu_widget.get()
         if selected in device.playlist:
-            device.remove_song(selected)
-            self.update_music_ui(device)
+            self.run_async(device.remove_song, selected, then=lambda _: self.update_music_ui(device))
             menu_widget.set("Playlist") 
         else:
             messagebox.showwarning("Error", "Select a song from the dropdown first.")
 
-    def add_slider(self, parent, device, label, min_v, max_v, current, setter):
-        f = ctk.CTkFrame(parent, fg_color="transparent")
-        f.pack(side="left", padx=5)
-        ctk.CTkLabel(f, text=label, font=("Arial", 10)).pack(side="left", padx=2)
-        s = ctk.CTkSlider(f, from_=min_v, to=max_v, number_of_steps=(max_v-min_v), width=100, progress_color="#5dade2")
-        s.set(current)
-        s.pack(side="left")
-        s.bind("<ButtonRelease-1>", lambda e: setter(int(s.get())))
-
-
-
     #-------- sensor simulation page ---------
  
     def show_simulation(self):
@@ -318,6 +345,7 @@ class SmartHomeApp(ctk.CTk):
         self.add_header("Sensor Simulator", "Manually change environment values")
         scroll = ctk.CTkScrollableFrame(self.content_area, fg_color="transparent")
         scroll.pack(fill="both", expand=True, padx=20)
+        self.sensor_widgets = {}
         for sensor in self.controller.sensors:
             card = ctk.CTkFrame(scroll, fg_color="#2b2b2b")
             card.pack(fill="x", pady=5)
@@ -331,37 +359,40 @@ class SmartHomeApp(ctk.CTk):
                                              command=lambda v, s=sensor: self.update_bool_sensor(s, v))
                 seg.set("Active" if sensor.value else "Inactive")
                 seg.pack()
+                self.sensor_widgets[sensor.name] = (None, seg, "")
             elif isinstance(sensor, TemperatureSensor):
                 lbl = ctk.CTkLabel(input_frame, text=f"{sensor.value}°C", width=50); lbl.pack(side="left")
                 slider = ctk.CTkSlider(input_frame, from_=0, to=50, width=150)
                 slider.set(sensor.value); slider.pack(side="left")
                 slider.bind("<ButtonRelease-1>", lambda e, s=sensor, l=lbl, sl=slider: self.update_num_sensor(s, sl.get(), l, "°C"))
+                self.sensor_widgets[sensor.name] = (lbl, slider, "°C")
             else:
                 lbl = ctk.CTkLabel(input_frame, text=f"{sensor.value}%", width=50); lbl.pack(side="left")
                 slider = ctk.CTkSlider(input_frame, from_=0, to=100, width=150)
                 slider.set(sensor.value); slider.pack(side="left")
                 slider.bind("<ButtonRelease-1>", lambda e, s=sensor, l=lbl, sl=slider: self.update_num_sensor(s, sl.get(), l, "%"))
+                self.sensor_widgets[sensor.name] = (lbl, slider, "%")
 
+    # readings go to the runtime, which applies them at once and merges their rule
+    # passes into one debounced evaluation on its own thread
     def update_bool_sensor(self, sensor, value_str):
         new_val = True if value_str == "Active" else False
-        sensor.update_value(new_val)
-        
-        self.trigger_automation_check()
+        self.submit_reading(sensor, new_val)
 
     def update_num_sensor(self, sensor, val, label_widget, unit):
         new_val = int(val)
-        sensor.update_value(new_val)
+        self.submit_reading(sensor, new_val)
         label_widget.configure(text=f"{new_val}{unit}")
-        
-        self.trigger_automation_check()
 
-    def trigger_automation_check(self):
-        if self.controller.system_mode != "Auto":
-            print(f"⚠️ Rules Skipped: System is in '{self.controller.system_mode}' mode.")
-            return
+    def submit_reading(self, sensor, value):
+        self.when_done(self.runtime.submit_reading(sensor, value), self.on_reading_done)
+        if self.automation_label is not None:
+            self.automation_label.configure(text="⏳ Automation pending…", text_color="#f1c40f")
 
-        print("🔄 Sensor changed -> Running Rules...")
-        self.controller.apply_automation_rules()
+    def on_reading_done(self, outcome):
+        accepted, reason = outcome
+        if not accepted:
+            messagebox.showwarning("Reading rejected", reason)
 
 
 
@@ -373,6 +404,8 @@ class SmartHomeApp(ctk.CTk):
         grid = ctk.CTkFrame(self.content_area, fg_color="transparent")
         grid.pack(fill="x", expand=False, padx=40, pady=40)
         grid.grid_columnconfigure((0, 1, 2), weight=1)
+        self.mode_buttons = {}
+        self.shown_mode = self.controller.system_mode
         self.create_big_mode_btn(grid, 0, "🤖 AUTO", "AI Control", "#4bb577", "Auto")
         self.create_big_mode_btn(grid, 1, "💤 SLEEP", "Lights OFF", "#377ca9", "Sleep")
         self.create_big_mode_btn(grid, 2, "👋 AWAY", "Secure Mode", "#884fd3", "Away")
@@ -384,11 +417,12 @@ class SmartHomeApp(ctk.CTk):
                             corner_radius=20, border_color=border_col, border_width=border_w,height=400,
                             command=lambda: self.activate_mode(mode_name))
         btn.grid(row=0, column=col, padx=10, sticky="ew")
+        self.mode_buttons[mode_name] = (btn, color)
 
     def activate_mode(self, mode):
-        self.controller.set_system_mode(mode)
-        messagebox.showinfo("Mode Activated", f"System switched to {mode} Mode!")
-        self.show_modes()
+        def done(summary):
+            messagebox.showinfo("Mode Activated", f"System switched to {mode} Mode! ({summary['changed']} device changes)")
+        self.run_async(self.controller.set_system_mode, mode, then=done)
 
 
     # --------- energy reporter page ---------
@@ -396,15 +430,45 @@ class SmartHomeApp(ctk.CTk):
     def show_energy(self):
         self.clear_content()
         self.add_header("Energy Monitor", "Usage Stats")
-        data, total = self.controller.get_energy_report()
         sum_card = ctk.CTkFrame(self.content_area, fg_color="#20847f", height=80)
         sum_card.pack(fill="x", padx=20, pady=10)
-        ctk.CTkLabel(sum_card, text=f"Total: {total} kWh", font=("Arial", 28, "bold"), text_color="white").pack(side="left", padx=30)
-        tbl = ctk.CTkScrollableFrame(self.content_area); tbl.pack(fill="both", expand=True, padx=20)
-        for item in data:
-            r = ctk.CTkFrame(tbl, fg_color="#2b2b2b"); r.pack(fill="x", pady=2)
-            ctk.CTkLabel(r, text=f"{item['name']}", width=200, anchor="w").pack(side="left", padx=10, pady=10)
-            ctk.CTkLabel(r, text=f"{item['kwh']} kWh", text_color="#2DD0E9").pack(side="right", padx=20)
+        self.energy_total_label = ctk.CTkLabel(sum_card, text="Total: ... kWh", font=("Arial", 28, "bold"), text_color="white")
+        self.energy_total_label.pack(side="left", padx=30)
+        self.energy_power_label = ctk.CTkLabel(sum_card, text="", font=("Arial", 16), text_color="white")
+        self.energy_power_label.pack(side="right", padx=30)
+        self.energy_table = ctk.CTkScrollableFrame(self.content_area); self.energy_table.pack(fill="both", expand=True, padx=20)
+        self.energy_rows = {}
+        if self.energy_job is not None:
+            self.after_cancel(self.energy_job)
+        self.tick_energy()
+
+    def tick_energy(self):
+        # devices that stay on keep using energy without any event, so totals also tick every second
+        self.energy_job = None
+        if self.energy_total_label.winfo_exists():
+            self.refresh_energy()
+            self.energy_job = self.after(1000, self.tick_energy)
+
+    def refresh_energy(self):
+        # per-room totals from the controller's running ledger: O(rooms); one request in flight at a time
+        if self.energy_request is not None and not self.energy_request.done():
+            return
+        self.energy_request = self.run_async(self.controller.get_room_energy_report, then=self.render_energy)
+
+    def render_energy(self, report):
+        if not self.energy_total_label.winfo_exists():
+            return
+        rooms, total, watts = report
+        self.energy_total_label.configure(text=f"Total: {total} kWh")
+        self.energy_power_label.configure(text=f"⚡ {watts:.0f} W now")
+        for item in rooms:
+            label = self.energy_rows.get(item["room"])
+            if label is None:
+                r = ctk.CTkFrame(self.energy_table, fg_color="#2b2b2b"); r.pack(fill="x", pady=2)
+                ctk.CTkLabel(r, text=f"📍 {item['room']}", width=200, anchor="w").pack(side="left", padx=10, pady=10)
+                label = ctk.CTkLabel(r, text_color="#2DD0E9"); label.pack(side="right", padx=20)
+                self.energy_rows[item["room"]] = label
+            label.configure(text=f"{item['kwh']} kWh")
 
 
 
@@ -432,10 +496,12 @@ class SmartHomeApp(ctk.CTk):
         try:
             cls = self.device_classes[typ] if cat == "Device" else self.sensor_classes[typ]
             obj = cls(name=nm, room=rm)
-            if cat == "Device": self.controller.add_device(obj)
-            else: self.controller.add_sensor(obj)
+        except Exception as e: return messagebox.showerror("Error", str(e))
+
+        def done(_):
             messagebox.showinfo("Success", "Added"); self.name_ent.delete(0,'end'); self.room_ent.delete(0,'end')
-        except Exception as e: messagebox.showerror("Error", str(e))
+        add = self.controller.add_device if cat == "Device" else self.controller.add_sensor
+        self.run_async(add, obj, then=done)
 
 
     # -------settings page ---------
@@ -457,56 +523,32 @@ class SmartHomeApp(ctk.CTk):
         new_entry = ctk.CTkEntry(panel, show="*", width=250)
         new_entry.pack(pady=5)
 
-        def update_pin():
-            success, msg = self.controller.change_pin(old_entry.get(), new_entry.get())
+        def pin_changed(result):
+            success, msg = result
             if success:
                 messagebox.showinfo("Success", msg)
                 old_entry.delete(0, 'end'); new_entry.delete(0, 'end')
             else:
                 messagebox.showerror("Error", msg)
 
+        def update_pin():
+            self.run_async(self.controller.change_pin, old_entry.get(), new_entry.get(), then=pin_changed)
+
         ctk.CTkButton(panel, text="Update Password", command=update_pin, fg_color="#e67e22", width=250, height=40).pack(pady=30)
 
 
 
 if __name__ == "__main__":
-    c = SmartHomeController()
-    
-    # Music
-    m = SmartMusicSystem("Living Room Audio", "Living Room")
-    m.add_song("Morning Jazz"); m.add_song("LoFi Beats"); m.add_song("Classical")
-    c.add_device(m)
-    
-    # Living Room
-    c.add_device(SmartAC("Main AC", "Living Room"))
-    c.add_device(SmartLight("Ceiling Light", "Living Room"))
-    c.add_device(SmartBlinds("Main Window", "Living Room"))
-    c.add_device(SmartTV("Samsung TV", "Living Room"))
-    
-    # Bedroom
-    c.add_device(SmartAC("Air conditioner", "Bedroom"))
-    c.add_device(SmartLight("Night Lamp", "Bedroom"))
-    c.add_device(SmartFan("Ceiling Fan", "Bedroom"))
-    c.add_device(SmartHeater("Heater", "Bedroom"))
-
-    # Kitchen
-    c.add_device(SmartLight("Kitchen Light", "Kitchen"))
-    c.add_device(SmartDishwasher("Dishwasher", "Kitchen"))
-    c.add_device(SmartCoffeeMaker("Coffee Machine", "Kitchen"))
-
-    # Security
-    c.add_device(SmartDoorLock("Front Door Lock", "Entrance"))
-    c.add_device(SmartCamera("Door Cam", "Entrance"))
-
-    # Garden
-    c.add_device(SmartSprinkler("Lawn Sprinkler", "Backyard"))
-    c.add_device(SmartCamera("Backyard Cam", "Main Garden"))
-
-    # Sensors
-    c.add_sensor(TemperatureSensor("LR Thermostat", "Living Room", 22))
-    c.add_sensor(MotionSensor("LR Motion", "Living Room", True))
-    c.add_sensor(DoorSensor("Main Door Sensor", "Entrance", False))
-    c.add_sensor(SoilMoistureSensor("Soil Sensor", "Backyard", 40))
-
-    app = SmartHomeApp(c)
-    app.mainloop()
\ No newline at end of file
+    tracing.configure(logging.INFO)
+    store = StateStore(DEFAULT_DIR)
+    c = store.restore()
+    if not c.devices and not c.sensors:
+        build_demo_home(c)
+    store.attach(c)
+
+    runtime = ControllerRuntime(c, debounce=0.25).start()
+    app = SmartHomeApp(c, runtime)
+    app.mainloop()
+    runtime.stop()
+    store.snapshot()
+    store.detach()
@@ -0,0 +1,125 @@
+import time
+
+from devices import (SmartDoorLock, SmartLight, SmartMusicSystem, SmartTV, SmartCoffeeMaker, SmartSprinkler,
+                     SmartBlinds, SmartCamera, SmartAC, SmartHeater, SmartVacuumCleaner)
+from events import DeviceChanged
+from commands import CommandQueue
+from tracing import get_logger
+
+log = get_logger("modes")
+
+
+class ModeStep:
+    """Devices of `classes` should end up with every attribute in `target`; `method` gets them there."""
+
+    __slots__ = ("classes", "method", "target")
+
+    def __init__(self, classes, method, **target):
+        self.classes = classes
+        self.method = method
+        self.target = target
+
+    def applies_to(self, device):
+        return isinstance(device, self.classes)
+
+    def at_target(self, device):
+        for attr, value in self.target.items():
+            if getattr(device, attr, value) != value:
+                return False
+        return True
+
+
+OFF = "OFF"
+ON = "ON"
+
+MODES = {
+    "Sleep": [
+        ModeStep((SmartDoorLock,), "lock", locked=True),
+        ModeStep((SmartLight, SmartTV, SmartCoffeeMaker, SmartSprinkler), "turn_off", status=OFF),
+        ModeStep((SmartMusicSystem,), "turn_off", status=OFF, current_song=None),
+        ModeStep((SmartBlinds,), "turn_off", status=OFF, position=0),
+        ModeStep((SmartCamera,), "turn_on", status=ON),
+        ModeStep((SmartCamera,), "start_recording", recording=True),
+    ],
+    "Away": [
+        ModeStep((SmartDoorLock,), "lock", locked=True),
+        ModeStep((SmartAC, SmartHeater, SmartCoffeeMaker, SmartTV), "turn_off", status=OFF),
+        ModeStep((SmartMusicSystem,), "turn_off", status=OFF, current_song=None),
+        ModeStep((SmartCamera,), "turn_on", status=ON),
+        ModeStep((SmartCamera,), "start_recording", recording=True),
+        ModeStep((SmartVacuumCleaner,), "turn_on", status=ON),
+    ],
+}
+
+
+class ModePlanner:
+    """Keeps, for every mode step, the devices whose state differs from the step's target.
+
+    The sets are filled as devices are added and kept current from DeviceChanged events,
+    so applying a mode only calls methods on devices that actually need to change - the
+    cost is proportional to the changes, not to the size of the home.
+    """
+
+    def __init__(self, bus=None, modes=MODES, commands=None):
+        self.modes = modes
+        self.commands = commands if commands is not None else CommandQueue()
+        # mode -> [(step, {id(device): device} not at target)]
+        self.pending = {mode: [(step, {}) for step in steps] for mode, steps in modes.items()}
+        self._by_type = {}
+        if bus is not None:
+            bus.subscribe(self.on_device_changed, DeviceChanged)
+
+
+    def _entries(self, device_type):
+        # the (step, pending) pairs devices of this concrete class take part in
+        entries = self._by_type.get(device_type)
+        if entries is None:
+            entries = [(step, pending) for plan in self.pending.values() for step, pending in plan
+                       if issubclass(device_type, step.classes)]
+            self._by_type[device_type] = entries
+        return entries
+
+
+    def _update(self, device, step, pending):
+        if step.at_target(device):
+            pending.pop(id(device), None)
+        else:
+            pending[id(device)] = device
+
+
+    def add(self, device):
+        for step, pending in self._entries(type(device)):
+            self._update(device, step, pending)
+
+
+    def remove(self, device):
+        for step, pending in self._entries(type(device)):
+            pending.pop(id(device), None)
+
+
+    def on_device_changed(self, event):
+        device = event.source
+        for step, pending in self._entries(type(device)):
+            if event.field in step.target:
+                self._update(device, step, pending)
+
+
+    def apply(self, mode):
+        """Runs `mode`'s steps on the devices that differ from them; returns a summary of the changes."""
+        start = time.perf_counter()
+        changes = []
+        with self.commands.tick():
+            for step, pending in self.pending.get(mode, ()):
+                for device in list(pending.values()):
+                    self.commands.submit(device, step.method)
+                    changes.append((device.name, step.method))
+        return {
+            "mode": mode,
+            "changes": changes,
+            "changed": len(changes),
+            "duration_ms": (time.perf_counter() - start) * 1000,
+        }
+
+
+    def pending_count(self, mode):
+        return sum(len(pending) for _, pending in self.pending.get(mode, ()))
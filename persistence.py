@@ -0,0 +1,270 @@
+import os
+import pickle
+import struct
+import time
+
+from controller import SmartHomeController
+from devices import Device
+from sensors import Sensor
+from events import SensorChanged, DeviceChanged
+from tracing import get_logger
+
+log = get_logger("persistence")
+
+
+# where the app and the headless daemon keep the home between runs
+DEFAULT_DIR = "homi_state"
+
+SNAPSHOT_FILE = "snapshot.bin"
+LOG_FILE = "changes.log"
+SNAPSHOT_VERSION = 1
+
+# change log framing: 4-byte little-endian length, then one pickled record
+FRAME = struct.Struct("<I")
+
+# runtime wiring that is rebuilt on restore rather than saved
+TRANSIENT = {"bus", "_store", "_slot", "_value", "history"}
+
+_layouts = {}
+
+
+def layout(cls):
+    """Names of the saved fields of `cls`, in the order its state tuples use."""
+    fields = _layouts.get(cls)
+    if fields is None:
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for slot in klass.__dict__.get("__slots__", ()):
+                if slot not in TRANSIENT and slot not in fields:
+                    fields.append(slot)
+        if issubclass(cls, Sensor):
+            fields.append("value")
+        fields = _layouts[cls] = tuple(fields)
+    return fields
+
+
+def _classes(base):
+    found = {base.__name__: base}
+    for sub in base.__subclasses__():
+        found.update(_classes(sub))
+    return found
+
+
+def component_state(component):
+    return tuple(getattr(component, field) for field in layout(type(component)))
+
+
+def build_component(cls, state):
+    # skips __init__: sensors with ranges would otherwise draw a random initial reading
+    component = cls.__new__(cls)
+    component.bus = None
+    if isinstance(component, Sensor):
+        component._store = None
+        component._slot = -1
+        component.history = None
+    for field, value in zip(layout(cls), state):
+        setattr(component, field, value)
+    return component
+
+
+def snapshot_state(controller):
+    return {
+        "version": SNAPSHOT_VERSION,
+        "settings": {"pin": controller.pin, "system_mode": controller.system_mode},
+        "devices": [(type(d).__name__, component_state(d)) for d in controller.devices],
+        "sensors": [(type(s).__name__, component_state(s)) for s in controller.sensors],
+    }
+
+
+def restore_state(state, controller=None):
+    """Builds a controller (or fills an empty one) from a snapshot_state() dict."""
+    c = controller if controller is not None else SmartHomeController()
+    c.pin = state["settings"]["pin"]
+    c.system_mode = state["settings"]["system_mode"]
+
+    for kind, add, base in (("devices", c.add_device, Device), ("sensors", c.add_sensor, Sensor)):
+        classes = _classes(base)
+        for cls_name, component_state in state[kind]:
+            add(build_component(classes[cls_name], component_state))
+    return c
+
+
+#change log
+
+class ChangeLog:
+    """Append-only log of controller mutations since the last snapshot.
+
+    Every device or sensor change is written as the component's full saved state, so
+    replay is a plain overwrite. Each record is flushed to the OS as it is written -
+    a crashed process loses nothing - and fsync'd at most every `fsync_interval`
+    seconds, which bounds what a power loss can take.
+    """
+
+    def __init__(self, path, fsync_interval=0.05):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.file = open(path, "ab")
+        self.last_sync = time.monotonic()
+        self.records = 0
+
+
+    def write(self, record):
+        data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        self.file.write(FRAME.pack(len(data)) + data)
+        self.file.flush()
+        self.records += 1
+        now = time.monotonic()
+        if now - self.last_sync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_sync = now
+
+
+    def log_component(self, component):
+        kind = "sensor" if isinstance(component, Sensor) else "device"
+        self.write((kind, component.name, type(component).__name__, component_state(component)))
+
+
+    def log_removed(self, component):
+        kind = "sensor" if isinstance(component, Sensor) else "device"
+        self.write(("remove_" + kind, component.name))
+
+
+    def log_setting(self, name, value):
+        self.write(("setting", name, value))
+
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+
+def read_log(path):
+    """Yields the records of a change log, stopping at a torn final record."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + FRAME.size <= len(data):
+        (size,) = FRAME.unpack_from(data, pos)
+        end = pos + FRAME.size + size
+        if end > len(data):
+            log.warning("Ignoring torn record at the end of %s", path)
+            return
+        try:
+            record = pickle.loads(data[pos + FRAME.size:end])
+        except Exception:
+            log.warning("Ignoring unreadable record at the end of %s", path)
+            return
+        yield record
+        pos = end
+
+
+def replay(state, records):
+    # applies change log records to a snapshot_state() dict, keyed by component name
+    # every saved layout starts with the component's name
+    tables = {kind: {s[0]: (c, s) for c, s in state[kind]} for kind in ("devices", "sensors")}
+    for record in records:
+        op = record[0]
+        if op == "device" or op == "sensor":
+            _, name, cls_name, component_state = record
+            tables[op + "s"][name] = (cls_name, component_state)
+        elif op == "remove_device" or op == "remove_sensor":
+            tables[op[len("remove_"):] + "s"].pop(record[1], None)
+        elif op == "setting":
+            state["settings"][record[1]] = record[2]
+    for kind, table in tables.items():
+        state[kind] = list(table.values())
+    return state
+
+
+class StateStore:
+    """Snapshot plus change log of one controller in `directory`.
+
+        store = StateStore("state")
+        controller = store.restore()   # empty controller when nothing was saved yet
+        store.attach(controller)       # snapshot now, then log every change
+    """
+
+    def __init__(self, directory, fsync_interval=0.05):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self.controller = None
+        self.changes = None
+        self._subs = []
+        os.makedirs(directory, exist_ok=True)
+
+
+    def load_state(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {state.get('version')} in {self.snapshot_path}")
+        else:
+            state = snapshot_state(SmartHomeController())
+        return replay(state, read_log(self.log_path))
+
+
+    def restore(self, controller=None):
+        start = time.perf_counter()
+        state = self.load_state()
+        c = restore_state(state, controller)
+        log.info("Restored %s devices and %s sensors in %.0f ms",
+                 len(c.devices), len(c.sensors), (time.perf_counter() - start) * 1000)
+        return c
+
+
+    def attach(self, controller):
+        """Checkpoints `controller` and records its changes from now on."""
+        self.detach()
+        self.controller = controller
+        self.snapshot()
+        controller.journal = self.changes
+        self._subs = [controller.bus.subscribe(self._on_change, DeviceChanged),
+                      controller.bus.subscribe(self._on_change, SensorChanged)]
+        return self
+
+
+    def snapshot(self):
+        """Writes a full snapshot and starts an empty change log."""
+        start = time.perf_counter()
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(snapshot_state(self.controller), f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        # the snapshot now covers everything the old log held
+        if self.changes is not None:
+            self.changes.close()
+        open(self.log_path, "wb").close()
+        self.changes = ChangeLog(self.log_path, self.fsync_interval)
+        if self._subs:
+            self.controller.journal = self.changes
+        log.info("Snapshot written in %.0f ms", (time.perf_counter() - start) * 1000)
+
+
+    def _on_change(self, event):
+        self.changes.log_component(event.source)
+
+
+    def detach(self):
+        if self.controller is not None:
+            for sub in self._subs:
+                self.controller.bus.unsubscribe(sub)
+            self.controller.journal = None
+        self._subs = []
+        if self.changes is not None:
+            self.changes.close()
+            self.changes = None
@@ -0,0 +1,71 @@
+class ComponentIndex:
+    """Live lookup tables for devices or sensors, keyed by room and class.
+
+    Every component is registered under each class of its MRO (up to `base`),
+    so a query for a base class sees subclasses just like isinstance() would.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.by_room_type = {}   # (room, cls) -> [components]
+        self.by_type = {}        # cls -> [components]
+        self.by_room = {}        # room -> [components]
+
+
+    def _classes(self, component):
+        for cls in type(component).__mro__:
+            yield cls
+            if cls is self.base:
+                break
+
+
+    def add(self, component):
+        room = component.room
+        for cls in self._classes(component):
+            self.by_room_type.setdefault((room, cls), []).append(component)
+            self.by_type.setdefault(cls, []).append(component)
+        self.by_room.setdefault(room, []).append(component)
+
+
+    def remove(self, component):
+        room = component.room
+        for cls in self._classes(component):
+            self._discard(self.by_room_type, (room, cls), component)
+            self._discard(self.by_type, cls, component)
+        self._discard(self.by_room, room, component)
+
+
+    def move(self, component, new_room):
+        self.remove(component)
+        component.room = new_room
+        self.add(component)
+
+
+    def _discard(self, table, key, component):
+        bucket = table.get(key)
+        if not bucket:
+            return
+        for i, item in enumerate(bucket):
+            if item is component:
+                del bucket[i]
+                break
+        if not bucket:
+            del table[key]
+
+
+    #queries
+
+    def of_type(self, cls):
+        return self.by_type.get(cls, [])
+
+    def in_room(self, room, cls=None):
+        if cls is None:
+            return self.by_room.get(room, [])
+        return self.by_room_type.get((room, cls), [])
+
+    def first(self, room, cls):
+        bucket = self.by_room_type.get((room, cls))
+        return bucket[0] if bucket else None
+
+    def rooms(self):
+        return list(self.by_room)
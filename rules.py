@@ -1,232 +1,666 @@
+import logging
+import operator
 import time
-from datetime import datetime
-from devices import SmartHeater, SmartAC, SmartLight, SmartSprinkler, SmartDishwasher, SmartDoorLock, SmartVacuumCleaner
-from sensors import TemperatureSensor, MotionSensor, LightSensor, SoilMoistureSensor, DirtSensor, FloorCleanSensor
+from devices import Device, SmartHeater, SmartAC, SmartLight, SmartSprinkler, SmartDishwasher, SmartVacuumCleaner
+from sensors import Sensor, TemperatureSensor, MotionSensor, LightSensor, SoilMoistureSensor, DirtSensor, FloorCleanSensor
+from registry import ComponentIndex
+import clock
+from commands import CommandQueue
+from tracing import get_logger
+
+log = get_logger("rules")
 
 
 TEMP_LOW = 20
 TEMP_HIGH = 25
 LIGHT_THRESHOLD = 30
 MOTION_TIMEOUT = 10 * 60
+SOIL_DRY = 30
+SOIL_WET = 80
+DIRT_HIGH = 70
+DIRT_LOW = 30
+
+# band labels used by the rule table
+COLD, HOT, COMFORTABLE = 0, 1, 2
+START, STOP = 0, 1
+
+ON = ("status", "ON")
+OFF = ("status", "OFF")
+
+
+#rule table
+
+class Action:
+    """Calls `method(*args)` on a device - the first device of a class in the sensor's
+    room, or the device with a given name. `when` = (attribute, value) skips devices
+    not in that state; `message` is logged with {room} and {value} filled in."""
+
+    __slots__ = ("device", "method", "args", "when", "message")
+
+    def __init__(self, device, method, *args, when=None, message=None):
+        self.device = device
+        self.method = method
+        self.args = args
+        self.when = when
+        self.message = message
+
+
+class Band:
+    """Actions for readings matching every condition.
+
+    A condition is (input, op, threshold): input is "value" (the triggering sensor),
+    "hour" (the clock) or a sensor class (that sensor in the same room). A band whose
+    `requires` devices are missing hands over to the rule's `otherwise` band.
+    """
+
+    __slots__ = ("label", "conditions", "actions", "requires")
+
+    def __init__(self, label, conditions, actions, requires=()):
+        self.label = label
+        self.conditions = conditions
+        self.actions = actions
+        self.requires = requires
+
+
+class Rule:
+    """Selects sensors (a class, or one sensor by name) and acts on the first band they match.
+
+    Readings matching no band run `otherwise`, or nothing - the gap between a start
+    and a stop band is the rule's hysteresis. `requires` lists devices or sensors that
+    must exist for the rule to run at all.
+    """
+
+    __slots__ = ("name", "sensor", "bands", "otherwise", "requires", "group")
+
+    def __init__(self, name, sensor, bands, otherwise=None, requires=(), group=None):
+        self.name = name
+        self.sensor = sensor
+        self.bands = bands
+        self.otherwise = otherwise
+        self.requires = requires
+        self.group = group or name
+
+
+RULES = [
+    Rule("temperature", TemperatureSensor, [
+        Band(COLD, [("value", "<", TEMP_LOW)], requires=[SmartHeater], actions=[
+            Action(SmartHeater, "turn_on", message="Temperature in {room} is {value}°C. Turning on heater."),
+            Action(SmartAC, "turn_off"),
+        ]),
+        Band(HOT, [("value", ">", TEMP_HIGH)], requires=[SmartAC], actions=[
+            Action(SmartAC, "turn_on", message="Temperature in {room} is {value}°C. Turning on AC."),
+            Action(SmartHeater, "turn_off"),
+        ]),
+    ], otherwise=Band(COMFORTABLE, [], [
+        Action(SmartHeater, "turn_off", when=ON, message="Temperature in {room} is Comfortable. Turning off heater."),
+        Action(SmartAC, "turn_off", when=ON, message="Temperature in {room} is Comfortable. Turning off AC."),
+    ])),
+
+    Rule("light", MotionSensor, requires=[SmartLight, LightSensor], bands=[
+        Band(START, [("value", "truthy", None), (LightSensor, "<", LIGHT_THRESHOLD)], [
+            Action(SmartLight, "turn_on", when=OFF, message="Motion detected in dark {room}. Turning on light."),
+            Action(SmartLight, "set_brightness", 80, when=OFF),
+        ]),
+    ]),
+
+    Rule("security_camera", "Main Door Sensor", group="security", requires=["Security Camera"], bands=[
+        Band(START, [("value", "truthy", None)], [
+            Action("Security Camera", "start_recording", when=("recording", False),
+                   message="Main door opened. Starting security camera recording."),
+        ]),
+        Band(STOP, [("value", "falsy", None)], [
+            Action("Security Camera", "stop_recording", when=("recording", True),
+                   message="Main door closed. Stopping security camera recording."),
+        ]),
+    ]),
+
+    Rule("garden", SoilMoistureSensor, [
+        Band(START, [("value", "<", SOIL_DRY)], [
+            Action(SmartSprinkler, "turn_on", when=OFF, message="Soil moisture in {room} is low ({value}%). Starting sprinkler."),
+        ]),
+        Band(STOP, [("value", ">=", SOIL_WET)], [
+            Action(SmartSprinkler, "turn_off", when=ON, message="Soil moisture in {room} is sufficient ({value}%). Stopping sprinkler."),
+        ]),
+    ]),
+
+    Rule("dishwasher", DirtSensor, [
+        Band(START, [("value", ">", DIRT_HIGH)], [
+            Action(SmartDishwasher, "turn_on", when=OFF, message="Dirt level in {room} is high . Starting dishwasher."),
+        ]),
+        Band(STOP, [("value", "<=", DIRT_LOW)], [
+            Action(SmartDishwasher, "turn_off", when=ON, message="Dirt level in {room} is low . Stopping dishwasher."),
+        ]),
+    ]),
+
+    Rule("vacuum", FloorCleanSensor, [
+        Band(START, [("value", "falsy", None)], [
+            Action(SmartVacuumCleaner, "turn_on", when=OFF, message="Floor in {room} is dirty. Starting vacuum cleaner."),
+        ]),
+        Band(STOP, [("value", "truthy", None)], [
+            Action(SmartVacuumCleaner, "turn_off", when=ON, message="Floor in {room} is clean. Stopping vacuum cleaner."),
+        ]),
+    ]),
+]
+
+
+# op -> (per-reading test, mask over a NumPy values column)
+OPS = {
+    "<": (operator.lt, operator.lt),
+    "<=": (operator.le, operator.le),
+    ">": (operator.gt, operator.gt),
+    ">=": (operator.ge, operator.ge),
+    "==": (operator.eq, operator.eq),
+    "truthy": (lambda v, _: bool(v), lambda v, _: v != 0),
+    "falsy": (lambda v, _: not v, lambda v, _: v == 0),
+}
+
+
+#compiled plan
+
+class CompiledBand:
+    """A band with its conditions turned into tests and its targets into room lookups."""
+
+    __slots__ = ("band", "value_tests", "other_tests", "requires", "actions", "mask")
+
+    def __init__(self, band, resolve):
+        self.band = band
+        self.value_tests = [(OPS[op][0], threshold) for source, op, threshold in band.conditions if source == "value"]
+        self.other_tests = [(source, OPS[op][0], threshold) for source, op, threshold in band.conditions if source != "value"]
+        self.requires = [resolve(target) for target in band.requires]
+        self.actions = [(resolve(a.device), a.method, a.args,
+                         a.when[0] if a.when else None, a.when[1] if a.when else None, a.message)
+                        for a in band.actions]
+
+        self.mask = None
+        if not self.other_tests:
+            masks = [(OPS[op][1], threshold) for _, op, threshold in band.conditions]
+            if masks:
+                self.mask = lambda v: _all_masks(v, masks)
+            else:
+                self.mask = lambda v: v == v  # every (non-NaN) reading
+
+
+def _all_masks(values, masks):
+    result = None
+    for op, threshold in masks:
+        mask = op(values, threshold)
+        result = mask if result is None else result & mask
+    return result
+
+
+class CompiledRule:
+    __slots__ = ("rule", "bands", "otherwise", "requires", "inputs", "vector")
+
+    def __init__(self, rule, resolve):
+        self.rule = rule
+        self.bands = [CompiledBand(b, resolve) for b in rule.bands]
+        self.otherwise = CompiledBand(rule.otherwise, resolve) if rule.otherwise is not None else None
+        self.requires = [resolve(target) for target in rule.requires]
+        everything = self.bands + ([self.otherwise] if self.otherwise else [])
+        self.inputs = {source for b in everything for source, _, _ in b.band.conditions}
+        # rules reading only their own sensor's value can be classified with array ops
+        self.vector = (isinstance(rule.sensor, type) and not rule.requires
+                       and all(b.mask is not None for b in everything))
+
+    def all_bands(self):
+        return self.bands + ([self.otherwise] if self.otherwise else [])
+
+
+class Plan:
+    """The rule table compiled for evaluation, indexed by the sensor types rules depend on.
+
+    A changed sensor re-runs the rules it feeds for the rule's sensors in its room,
+    whether it is of the rule's own type or only read by it (the light level for the
+    light rule).
+    Rules selecting one sensor by name are a fixed handful of lookups and clock rules
+    change without any sensor event, so both run on every dirty pass.
+    """
+
+    def __init__(self, rules, resolve):
+        self.rules = [CompiledRule(r, resolve) for r in rules]
+        self.groups = {}
+        for compiled in self.rules:
+            self.groups.setdefault(compiled.rule.group, []).append(compiled)
+        self.every_pass = [c for c in self.rules if not isinstance(c.rule.sensor, type) or "hour" in c.inputs]
+        self._by_type = {}
+
+    def rules_for(self, sensor_type):
+        """(compiled rule, triggered) pairs a changed sensor of `sensor_type` feeds."""
+        entries = self._by_type.get(sensor_type)
+        if entries is None:
+            entries = []
+            for compiled in self.rules:
+                selector = compiled.rule.sensor
+                if not isinstance(selector, type) or compiled in self.every_pass:
+                    continue
+                if issubclass(sensor_type, selector):
+                    entries.append((compiled, True))
+                elif any(isinstance(s, type) and issubclass(sensor_type, s) for s in compiled.inputs):
+                    entries.append((compiled, False))
+            self._by_type[sensor_type] = entries
+        return entries
+
+
+#profiling
+
+class RuleStats:
+    """Counters for one rule (or for whole passes): runs, time spent, sensors examined, actions issued."""
+
+    __slots__ = ("calls", "total_s", "max_s", "sensors", "actions")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.sensors = 0
+        self.actions = 0
+
+    def add(self, seconds, sensors, actions):
+        self.calls += 1
+        self.total_s += seconds
+        if seconds > self.max_s:
+            self.max_s = seconds
+        self.sensors += sensors
+        self.actions += actions
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total_s += other.total_s
+        self.max_s = max(self.max_s, other.max_s)
+        self.sensors += other.sensors
+        self.actions += other.actions
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "total_ms": self.total_s * 1000,
+            "mean_ms": self.total_s * 1000 / self.calls if self.calls else 0.0,
+            "max_ms": self.max_s * 1000,
+            "sensors": self.sensors,
+            "actions": self.actions,
+        }
+
+
+def format_stats(stats):
+    """A get_stats() dict as a text table, slowest rule first."""
+    lines = [f"{'rule':<18}{'calls':>8}{'total ms':>11}{'mean ms':>10}{'max ms':>9}{'sensors':>10}{'actions':>9}"]
+    rows = sorted(stats["rules"].items(), key=lambda item: -item[1]["total_ms"])
+    if "passes" in stats:
+        rows.append(("(passes)", stats["passes"]))
+    for name, r in rows:
+        lines.append(f"{name:<18}{r['calls']:>8}{r['total_ms']:>11.2f}{r['mean_ms']:>10.3f}"
+                     f"{r['max_ms']:>9.2f}{r['sensors']:>10}{r['actions']:>9}")
+    return "\n".join(lines)
 
 
 class AutomationRules:
-    def __init__(self, devices_list, sensors_list):
+    def __init__(self, devices_list, sensors_list, device_index=None, sensor_index=None, rules=None, commands=None):
         self.devices = devices_list
         self.sensors = sensors_list
         self.device_map = {d.name: d for d in devices_list}
         self.sensor_map = {s.name: s for s in sensors_list}
 
+        # the controller passes its live indexes; standalone use builds private ones
+        if device_index is None:
+            device_index = ComponentIndex(Device)
+            for d in devices_list:
+                device_index.add(d)
+        if sensor_index is None:
+            sensor_index = ComponentIndex(Sensor)
+            for s in sensors_list:
+                sensor_index.add(s)
+        self.device_index = device_index
+        self.sensor_index = sensor_index
 
-    def _find_device_in_same_room(self, target_room, device_class):
-        for d in self.devices:
-            if d.room == target_room and isinstance(d, device_class):
-                return d
-        return None
+        # optional columnar SensorStore; full passes then classify thresholds with array ops
+        self.store = None
 
+        # sensors changed since the last pass, in arrival order (id -> sensor)
+        self.dirty_sensors = {}
+        self.needs_full_pass = True
 
-    def _find_sensor_in_same_room(self, target_room, sensor_class):
-        for s in self.sensors:
-            if s.room == target_room and isinstance(s, sensor_class):
-                return s
-        return None 
-       
+        # the rule table and its compiled plan, rebuilt only when the table changes
+        self.rules = list(RULES if rules is None else rules)
+        self._plan = None
 
+        # device actions go through a command queue: each pass sends every device its final state once
+        self.commands = commands if commands is not None else CommandQueue()
 
-    #tempurature automation
+        # device actions issued so far; per-rule counters only while profiling (enable_stats)
+        self.fired = 0
+        self.stats = None
 
-    def apply_temperature_rules(self):
-        for sensor in self.sensors:
 
-            if not isinstance(sensor, TemperatureSensor):
-                continue
-            
-            room = sensor.room
-            temp = sensor.value
+    #rule set
 
-            heater = self._find_device_in_same_room(room, SmartHeater)
-            ac = self._find_device_in_same_room(room, SmartAC)
+    @property
+    def plan(self):
+        if self._plan is None:
+            self._plan = Plan(self.rules, self._resolver)
+            log.info("Compiled %s automation rules", len(self.rules))
+        return self._plan
 
-            
-            if heater and temp < TEMP_LOW:
-                heater.turn_on()
-                print(f"Temperature in {room} is {temp}°C. Turning on heater.")
-                if ac:
-                    ac.turn_off()
-                continue
 
-            
-            if ac and temp > TEMP_HIGH:
-                ac.turn_on()
-                print(f"Temperature in {room} is {temp}°C. Turning on AC.")
-                if heater:
-                    heater.turn_off()
-                continue
+    def add_rule(self, rule):
+        self.rules.append(rule)
+        self._plan = None
+        self.needs_full_pass = True
 
-            
-            if heater and heater.status == "ON" :
-                heater.turn_off()
-                print(f"Temperature in {room} is Comfortable. Turning off heater.")
 
-            if ac and ac.status == "ON":
-                ac.turn_off()
-                print(f"Temperature in {room} is Comfortable. Turning off AC.") 
+    def remove_rule(self, name):
+        self.rules = [r for r in self.rules if r.name != name]
+        self._plan = None
+        self.needs_full_pass = True
 
 
-    #light automation
+    #profiling
 
-    def apply_light_rules(self):
-        for sensor in self.sensors:
+    def enable_stats(self):
+        if self.stats is None:
+            self.stats = {}
 
-            if not isinstance(sensor, MotionSensor):
-                continue
-            
-            room = sensor.room
-            light = self._find_device_in_same_room(room, SmartLight)
-            light_sensor = self._find_sensor_in_same_room(room, LightSensor)
 
-            if not light or not light_sensor:
-                continue
+    def disable_stats(self):
+        self.stats = None
 
-            if not hasattr(sensor, "last_motion_time"):
-                continue
 
-            seconds_since_motion = time.time() - sensor.last_motion_time
-            
-            is_dark = True
+    def reset_stats(self):
+        if self.stats is not None:
+            self.stats = {}
 
-            if light_sensor and light_sensor.value >= LIGHT_THRESHOLD:
-                is_dark = False
 
-            if sensor.value and is_dark:
-                if light.status == "OFF":
-                    light.turn_on()
-                    print(f"Motion detected in dark {room}. Turning on light.")
-                    light.turn_on()
+    def get_stats(self):
+        """{"rules": {rule: counters}, "groups": {group: counters}}; empty while profiling is off.
 
-                    if hasattr(light, "set_brightness"):
-                        light.set_brightness(80)
+        A rule's calls are its runs: one per full pass, one per room with a changed sensor
+        feeding it on dirty passes; its actions are the device methods it called. Counters are dicts of
+        calls, total_ms, mean_ms, max_ms, sensors, actions.
+        """
+        stats = self.stats or {}
+        groups = {}
+        for compiled in self.plan.rules:
+            rule_stats = stats.get(compiled.rule.name)
+            if rule_stats is not None:
+                groups.setdefault(compiled.rule.group, RuleStats()).merge(rule_stats)
+        return {
+            "rules": {name: s.as_dict() for name, s in stats.items()},
+            "groups": {group: s.as_dict() for group, s in groups.items()},
+        }
 
-                elif not sensor.value and seconds_since_motion > MOTION_TIMEOUT:
-                    if light.status == "ON":
-                        print(f"No motion in {room} for {MOTION_TIMEOUT/60} minutes. Turning off light.")
-                        light.turn_off()     
-                    
 
+    def _record(self, compiled, seconds, sensors, actions):
+        rule_stats = self.stats.get(compiled.rule.name)
+        if rule_stats is None:
+            rule_stats = self.stats[compiled.rule.name] = RuleStats()
+        rule_stats.add(seconds, sensors, actions)
 
 
-    # security automation
+    #change tracking
 
-    def apply_security_rules(self):
-        door = self.sensor_map.get("Main Door Sensor")
-        camera = self.device_map.get("Security Camera")
-        door_lock = self.device_map.get("Main Door Lock")
+    def on_sensor_changed(self, event):
+        self.mark_dirty(event.source)
 
 
+    def mark_dirty(self, sensor):
+        self.dirty_sensors[id(sensor)] = sensor
 
-        if not door or not camera:
-            return
-    
-        is_recording = getattr(camera, "recording", False)
 
-        if door.value and not is_recording:
-            camera.start_recording()
-            print("Main door opened. Starting security camera recording.")
+    def mark_room_dirty(self, room):
+        for s in self.sensor_index.in_room(room):
+            self.dirty_sensors[id(s)] = s
 
-        elif not door.value and is_recording:
-            camera.stop_recording()
-            print("Main door closed. Stopping security camera recording.")
 
+    def add_device(self, device):
+        self.device_map[device.name] = device
+        self.mark_room_dirty(device.room)
 
-        if door_lock:
-            current_hour= datetime.now().hour
-            AUTO_LOCK_HOUR = 22
 
-            if current_hour >= AUTO_LOCK_HOUR and not door_lock.locked:
-                door_lock.lock()
-                print("It's late. Auto-locking the main door.")
+    def remove_device(self, device):
+        if self.device_map.get(device.name) is device:
+            del self.device_map[device.name]
 
 
-    # garden automation
+    def add_sensor(self, sensor):
+        self.sensor_map[sensor.name] = sensor
+        self.mark_dirty(sensor)
 
-    def apply_garden_rules(self):
-        for sensor in self.sensors:
 
-            if not isinstance(sensor, SoilMoistureSensor):
-                continue
-            
-            room = sensor.room
-            sprinkler = self._find_device_in_same_room(room, SmartSprinkler)
+    def remove_sensor(self, sensor):
+        if self.sensor_map.get(sensor.name) is sensor:
+            del self.sensor_map[sensor.name]
+        self.dirty_sensors.pop(id(sensor), None)
+
+
+    def _find_device_in_same_room(self, target_room, device_class):
+        return self.device_index.first(target_room, device_class)
 
-            if not sprinkler:
+
+    def _find_sensor_in_same_room(self, target_room, sensor_class):
+        return self.sensor_index.first(target_room, sensor_class)
+
+
+    def _resolver(self, target):
+        # room -> component lookups, built once per rule target when the plan compiles
+        if isinstance(target, str):
+            device_map = self.device_map
+            return lambda room: device_map.get(target)
+        # same as index.first(room, target), minus a call per lookup on the hot path
+        buckets = (self.sensor_index if issubclass(target, Sensor) else self.device_index).by_room_type
+
+        def lookup(room):
+            bucket = buckets.get((room, target))
+            return bucket[0] if bucket else None
+        return lookup
+
+
+    #evaluation
+
+    def _selected(self, compiled):
+        selector = compiled.rule.sensor
+        if isinstance(selector, str):
+            sensor = self.sensor_map.get(selector)
+            return [sensor] if sensor is not None else []
+        return self.sensor_index.of_type(selector)
+
+
+    def _input(self, source, sensor, reads):
+        # other sensors' values and the clock are read once per pass and shared by every rule
+        key = source if source == "hour" else (sensor.room, source)
+        if key not in reads:
+            if source == "hour":
+                reads[key] = clock.localtime().hour
+            else:
+                other = self._find_sensor_in_same_room(sensor.room, source)
+                reads[key] = other.value if other is not None else None
+        return reads[key]
+
+
+    def _evaluate(self, compiled, sensor, value, reads):
+        room = sensor.room
+        for lookup in compiled.requires:
+            if lookup(room) is None:
+                return
+
+        for band in compiled.bands:
+            for test, threshold in band.value_tests:
+                if not test(value, threshold):
+                    break
+            else:
+                for source, test, threshold in band.other_tests:
+                    if not test(self._input(source, sensor, reads), threshold):
+                        break
+                else:
+                    self._fire(compiled, band, room, value)
+                    return
+
+        if compiled.otherwise is not None:
+            self._fire(compiled, compiled.otherwise, room, value)
+
+
+    def _fire(self, compiled, band, room, value):
+        for lookup in band.requires:
+            if lookup(room) is None:
+                band = compiled.otherwise
+                if band is None:
+                    return
+                break
+
+        # guards read the state the pass's queued commands are heading for
+        commands = self.commands
+        actions = band.actions
+        if len(actions) == 1:
+            lookup, method, args, attr, expected, message = actions[0]
+            device = lookup(room)
+            if device is None or (attr is not None and commands.intended(device, attr) != expected):
+                return
+            commands.submit(device, method, *args)
+            self.fired += 1
+            if message and log.isEnabledFor(logging.INFO):
+                log.info(message.format(room=room, value=value))
+            return
+
+        # guards are checked against the state before any of the band's actions ran
+        planned = []
+        for lookup, method, args, attr, expected, message in band.actions:
+            device = lookup(room)
+            if device is None:
+                continue
+            if attr is not None and commands.intended(device, attr) != expected:
                 continue
+            planned.append((device, method, args, message))
 
-            if sensor.value < 30 and sprinkler.status == "OFF":
-                sprinkler.turn_on()
-                print(f"Soil moisture in {room} is low ({sensor.value}%). Starting sprinkler.")
+        self.fired += len(planned)
+        for device, method, args, message in planned:
+            commands.submit(device, method, *args)
+            if message and log.isEnabledFor(logging.INFO):
+                log.info(message.format(room=room, value=value))
 
-            elif sensor.value >= 80 and sprinkler.status == "ON":
-                sprinkler.turn_off()
-                print(f"Soil moisture in {room} is sufficient ({sensor.value}%). Stopping sprinkler.")  
-    
 
-    # dishwasher automation
+    def _run(self, compiled, reads):
+        if self.stats is not None:
+            fired, start = self.fired, time.perf_counter()
+            sensors = self._scan(compiled, reads)
+            self._record(compiled, time.perf_counter() - start, sensors, self.fired - fired)
+        else:
+            self._scan(compiled, reads)
 
-    def apply_dishwasher_rules(self):
-        for sensor in self.sensors:
 
-            if not isinstance(sensor, DirtSensor):
-                continue
-            
-            room = sensor.room
-            dirt_level = sensor.value
+    def _scan(self, compiled, reads):
+        # runs `compiled` over every sensor it selects; returns how many that was
+        if self.store is not None and compiled.vector:
+            bands = compiled.all_bands()
+            for sensor, i in self.store.where(compiled.rule.sensor, *[b.mask for b in bands]):
+                self._fire(compiled, bands[i], sensor.room, sensor.value)
+            return len(self.sensor_index.of_type(compiled.rule.sensor))
 
-            dishwasher = self._find_device_in_same_room(room, SmartDishwasher)
+        selected = self._selected(compiled)
+        for sensor in selected:
+            self._evaluate(compiled, sensor, sensor.value, reads)
+        return len(selected)
 
-            if not dishwasher:
-                continue
 
-            if dirt_level > 70 and dishwasher.status == "OFF":
-                dishwasher.turn_on()
-                print(f"Dirt level in {room} is high . Starting dishwasher.")
+    def _run_for(self, compiled, room, reads):
+        # a dirty pass's evaluation of one rule in one room, while profiling
+        targets = self.sensor_index.in_room(room, compiled.rule.sensor)
+        fired, start = self.fired, time.perf_counter()
+        for target in targets:
+            self._evaluate(compiled, target, target.value, reads)
+        self._record(compiled, time.perf_counter() - start, len(targets), self.fired - fired)
 
-            elif dirt_level <= 30 and dishwasher.status == "ON":
-                dishwasher.turn_off()
-                print(f"Dirt level in {room} is low . Stopping dishwasher.")
-        
 
+    def motion_timeout(self, sensor):
+        """Turns off the light of a room whose motion sensor has seen nothing for MOTION_TIMEOUT.
 
-    # vacuum cleaner automation
+        Called by the controller's timer wheel when the sensor's deadline expires.
+        """
+        if sensor.value or self.sensor_map.get(sensor.name) is not sensor:
+            return
+        room = sensor.room
+        light = self._find_device_in_same_room(room, SmartLight)
+        if light is None or self._find_sensor_in_same_room(room, LightSensor) is None:
+            return
+        if self.commands.intended(light, "status") == "ON":
+            self.commands.submit(light, "turn_off")
+            self.fired += 1
+            log.info("No motion in %s for %s minutes. Turning off light.", room, MOTION_TIMEOUT // 60)
 
-    def apply_vacuum_rules(self):
-        for sensor in self.sensors:
 
-            if not isinstance(sensor, FloorCleanSensor):
-                continue
-            
-            room = sensor.room
-            is_clean = sensor.value
+    def apply_group(self, group, reads=None):
+        reads = {} if reads is None else reads
+        with self.commands.tick():
+            for compiled in self.plan.groups.get(group, ()):
+                self._run(compiled, reads)
 
-            vacuum = self._find_device_in_same_room(room, SmartVacuumCleaner)
 
-            if not vacuum:
-                continue
+    def apply_temperature_rules(self):
+        self.apply_group("temperature")
 
-            if not is_clean and vacuum.status == "OFF":
-                vacuum.turn_on()
-                print(f"Floor in {room} is dirty. Starting vacuum cleaner.")
 
-            elif is_clean and vacuum.status == "ON":
-                vacuum.turn_off()
-                print(f"Floor in {room} is clean. Stopping vacuum cleaner.")   
+    def apply_light_rules(self):
+        self.apply_group("light")
 
 
+    def apply_security_rules(self):
+        self.apply_group("security")
+
+
+    def apply_garden_rules(self):
+        self.apply_group("garden")
+
+
+    def apply_dishwasher_rules(self):
+        self.apply_group("dishwasher")
+
+
+    def apply_vacuum_rules(self):
+        self.apply_group("vacuum")
 
 
     def apply_all_checks(self):
-        self.apply_temperature_rules()
-        self.apply_light_rules()
-        self.apply_security_rules()
-        self.apply_garden_rules()
-        self.apply_dishwasher_rules()
-        self.apply_vacuum_rules()
\ No newline at end of file
+        self.dirty_sensors.clear()
+        self.needs_full_pass = False
+
+        reads = {}
+        with self.commands.tick():
+            for compiled in self.plan.rules:
+                self._run(compiled, reads)
+
+
+    def apply_dirty(self):
+        # only the rules fed by sensors that changed since the last pass
+        if self.needs_full_pass:
+            self.apply_all_checks()
+            return
+        with self.commands.tick():
+            self._apply_dirty()
+
+
+    def _apply_dirty(self):
+        plan = self.plan
+        dirty = list(self.dirty_sensors.values())
+        self.dirty_sensors.clear()
+
+        # a rule is re-run for every sensor it selects in the changed sensor's room, in the
+        # order a full pass would visit them, so sensors of one type sharing a room settle
+        # their devices exactly as a full pass does; each (rule, room) runs once per pass
+        reads = {}
+        stats = self.stats
+        done = set()
+        for sensor in dirty:
+            entries = plan.rules_for(type(sensor))
+            if not entries:
+                continue
+            room = sensor.room
+            for compiled, _ in entries:
+                key = (id(compiled), room)
+                if key in done:
+                    continue
+                done.add(key)
+                if stats is not None:
+                    self._run_for(compiled, room, reads)
+                else:
+                    for target in self.sensor_index.in_room(room, compiled.rule.sensor):
+                        self._evaluate(compiled, target, target.value, reads)
+
+        for compiled in plan.every_pass:
+            self._run(compiled, reads)
@@ -0,0 +1,320 @@
+import asyncio
+import queue
+import threading
+import time
+
+import clock
+from tracing import get_logger
+
+log = get_logger("runtime")
+
+SCHEDULE_RECHECK = 3600  # longest sleep of the schedule worker, in seconds
+
+
+class RuntimeBusy(Exception):
+    """A bounded runtime queue stayed full for longer than the caller was willing to wait."""
+
+
+class ControllerRuntime:
+    """Runs a SmartHomeController on its own asyncio loop.
+
+    All controller code - sensor ingestion, rule passes and device commands - runs on
+    the runtime's loop, so frontends (the Tk GUI, a headless CLI) never execute it on
+    their own thread. Readings and commands go through bounded queues; a full queue
+    makes callers wait (or fail with RuntimeBusy after `timeout`) instead of growing
+    without limit. Readings that arrive together are handed to
+    controller.ingest_batch(), so they are validated and share a single rule pass.
+    With `debounce` set, readings are applied at once but their rule pass waits until
+    no reading arrived for `debounce` seconds (at most `max_debounce` in total), so a
+    burst of slider moves becomes one evaluation; `rules_pending` tells frontends
+    whether one is waiting or running.
+
+    Thread-side callers use start()/stop(), submit(), submit_reading() and
+    send_command(), which return concurrent.futures.Future objects, and read rule
+    pass summaries from `results` (a thread-safe queue), which also carries the device
+    changes of expired controller timers (kind "timers") and of schedules (kind
+    "schedules"). Coroutines already running on the loop can await ingest() and
+    call() directly.
+    """
+
+    def __init__(self, controller, max_readings=1000, max_commands=1000, max_results=1000, tick_interval=None,
+                 debounce=None, max_debounce=1.0):
+        self.controller = controller
+        self.max_readings = max_readings
+        self.max_commands = max_commands
+        self.tick_interval = tick_interval  # optional periodic rule pass, in seconds
+        self.debounce = debounce
+        self.max_debounce = max_debounce
+        self.rules_pending = False
+        self.results = queue.Queue(maxsize=max_results)
+
+        self.loop = None
+        self._thread = None
+        self._readings = None
+        self._commands = None
+        self._rules_due = None
+        self._tasks = []
+        self._started = threading.Event()
+
+        self.passes = 0
+        self.readings_applied = 0
+        self.readings_rejected = 0
+        self.results_dropped = 0
+
+
+    #lifecycle
+
+    def start(self):
+        """Starts the loop on a daemon thread and returns once it is accepting work."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._thread_main, name="homi-runtime", daemon=True)
+            self._thread.start()
+            self._started.wait()
+        return self
+
+
+    def _thread_main(self):
+        asyncio.run(self.run())
+
+
+    async def run(self):
+        """Runs the runtime on the current loop until stop() is called."""
+        self.loop = asyncio.get_running_loop()
+        self._readings = asyncio.Queue(self.max_readings)
+        self._commands = asyncio.Queue(self.max_commands)
+        self._rules_due = asyncio.Event()
+        self._schedules_changed = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._ingest_worker()),
+            asyncio.create_task(self._command_worker()),
+            asyncio.create_task(self._rule_worker()),
+            asyncio.create_task(self._timer_worker()),
+            asyncio.create_task(self._schedule_worker()),
+        ]
+        if self.tick_interval:
+            self._tasks.append(asyncio.create_task(self._ticker()))
+        self._started.set()
+        log.info("Controller runtime started")
+
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass
+        log.info("Controller runtime stopped")
+
+
+    def stop(self, timeout=5):
+        if self.loop is None:
+            return
+        # one callback: cancelling the first task ends run(), which may close the loop
+        # before separately scheduled cancels for the others arrive
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._cancel_tasks)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+    def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+
+
+    #thread-side API
+
+    def submit(self, fn, *args, timeout=None, **kwargs):
+        """Runs fn(*args, **kwargs) on the runtime; the future resolves with its return value."""
+        return asyncio.run_coroutine_threadsafe(self.call(fn, *args, timeout=timeout, **kwargs), self.loop)
+
+
+    def send_command(self, device, method, *args, timeout=None):
+        """Calls a device method such as "turn_on" or "set_brightness" on the runtime."""
+        return self.submit(getattr(device, method), *args, timeout=timeout)
+
+
+    def submit_reading(self, sensor, value, timestamp=None, timeout=None):
+        """Queues a sensor reading; the future resolves to (accepted, reason) once it was ingested."""
+        return asyncio.run_coroutine_threadsafe(self.ingest(sensor, value, timestamp, timeout=timeout), self.loop)
+
+
+    def request_rule_pass(self):
+        self.loop.call_soon_threadsafe(self._request_rules)
+
+
+    #loop-side API
+
+    async def call(self, fn, *args, timeout=None, **kwargs):
+        done = self.loop.create_future()
+        await self._put(self._commands, (fn, args, kwargs, done), timeout)
+        return await done
+
+
+    async def ingest(self, sensor, value, timestamp=None, timeout=None):
+        done = self.loop.create_future()
+        await self._put(self._readings, ((sensor, value, timestamp), done), timeout)
+        return await done
+
+
+    async def _put(self, q, item, timeout):
+        try:
+            await asyncio.wait_for(q.put(item), timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeBusy(f"runtime queue full ({q.maxsize} pending)") from None
+
+
+    #workers
+
+    async def _ingest_worker(self):
+        while True:
+            batch = [await self._readings.get()]
+            while not self._readings.empty():
+                batch.append(self._readings.get_nowait())
+
+            start = time.perf_counter()
+            try:
+                report = self.controller.ingest_batch([reading for reading, _ in batch],
+                                                      run_rules=self.debounce is None)
+            except Exception as e:
+                log.exception("Batch ingestion failed")
+                for _, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+                continue
+
+            for (_, done), (name, accepted, reason) in zip(batch, report["results"]):
+                if not done.done():
+                    done.set_result((accepted, reason))
+            self.readings_applied += report["accepted"]
+            self.readings_rejected += report["rejected"]
+
+            if report["accepted"]:
+                if self.debounce is None:
+                    self._publish_pass(report["actions"], start)
+                else:
+                    self._request_rules()
+            await asyncio.sleep(0)
+
+
+    async def _command_worker(self):
+        while True:
+            fn, args, kwargs, done = await self._commands.get()
+            try:
+                result = fn(*args, **kwargs)
+                if not done.done():
+                    done.set_result(result)
+            except Exception as e:
+                log.exception("Runtime command %r failed", fn)
+                if not done.done():
+                    done.set_exception(e)
+            await asyncio.sleep(0)
+
+
+    def _request_rules(self):
+        self.rules_pending = True
+        self._rules_due.set()
+
+
+    async def _rule_worker(self):
+        while True:
+            await self._rules_due.wait()
+            if self.debounce:
+                await self._settle()
+            self._rules_due.clear()
+            self._run_rule_pass()
+            self.rules_pending = self._rules_due.is_set()
+            await asyncio.sleep(0)
+
+
+    async def _settle(self):
+        # requests arriving while we wait merge into this pass; max_debounce bounds the delay
+        deadline = self.loop.time() + self.max_debounce
+        while True:
+            self._rules_due.clear()
+            await asyncio.sleep(max(0, min(self.debounce, deadline - self.loop.time())))
+            if not self._rules_due.is_set() or self.loop.time() >= deadline:
+                return
+
+
+    async def _timer_worker(self):
+        # fires the controller's expired timers (motion timeouts) once per wheel tick
+        while True:
+            await asyncio.sleep(self.controller.timers.tick)
+            start = time.perf_counter()
+            try:
+                actions = self.controller.tick()
+            except Exception:
+                log.exception("Timer tick failed")
+                continue
+            if actions:
+                self._publish_result({
+                    "kind": "timers",
+                    "mode": self.controller.system_mode,
+                    "actions": actions,
+                    "duration_ms": (time.perf_counter() - start) * 1000,
+                })
+
+
+    async def _schedule_worker(self):
+        # sleeps until the earliest schedule is due, or until the schedule set changes
+        schedules = self.controller.schedules
+        loop = self.loop
+        schedules.listener = lambda: loop.call_soon_threadsafe(self._schedules_changed.set)
+        try:
+            while True:
+                fire = schedules.next_fire()
+                # capped so a wall clock jump (suspend, NTP) is noticed within the hour
+                delay = None if fire is None else min(max(0, fire - clock.now()), SCHEDULE_RECHECK)
+                self._schedules_changed.clear()
+                try:
+                    await asyncio.wait_for(self._schedules_changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                start = time.perf_counter()
+                try:
+                    actions = self.controller.run_schedules()
+                except Exception:
+                    log.exception("Scheduled automation failed")
+                    continue
+                if actions:
+                    self._publish_result({
+                        "kind": "schedules",
+                        "mode": self.controller.system_mode,
+                        "actions": actions,
+                        "duration_ms": (time.perf_counter() - start) * 1000,
+                    })
+        finally:
+            schedules.listener = None
+
+
+    async def _ticker(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            self._request_rules()
+
+
+    def _run_rule_pass(self):
+        start = time.perf_counter()
+        try:
+            actions = self.controller.apply_automation_rules()
+        except Exception:
+            log.exception("Rule pass failed")
+            actions = []
+        self._publish_pass(actions, start)
+
+
+    def _publish_pass(self, actions, start):
+        self.passes += 1
+        self._publish_result({
+            "kind": "rules",
+            "mode": self.controller.system_mode,
+            "actions": actions,
+            "duration_ms": (time.perf_counter() - start) * 1000,
+        })
+
+
+    def _publish_result(self, result):
+        try:
+            self.results.put_nowait(result)
+        except queue.Full:
+            # frontends that stop polling must not stall the runtime
+            self.results_dropped += 1
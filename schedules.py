@@ -0,0 +1,155 @@
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+import clock
+from devices import SmartCoffeeMaker, SmartSprinkler
+from tracing import get_logger
+
+log = get_logger("schedules")
+
+
+WORKDAYS = (0, 1, 2, 3, 4)  # Monday = 0, like datetime.weekday()
+AUTO_LOCK = "22:00"
+MORNING_COFFEE = ("07:00", "07:30")
+SPRINKLER_WINDOW = ("06:00", "06:20")
+
+ON = ("status", "ON")
+OFF = ("status", "OFF")
+
+
+class Schedule:
+    """Calls `method(*args)` on devices every day at `at` ("HH:MM", local time).
+
+    `device` is a device name, or a device class meaning every device of that class
+    (only those in `room`, when given). `days` limits it to some weekdays (0 = Monday),
+    `when` = (attribute, value) skips devices not in that state and `modes` lists the
+    system modes it runs in (None = any mode).
+    """
+
+    __slots__ = ("name", "hour", "minute", "device", "method", "args", "days", "room", "when", "modes", "message")
+
+    def __init__(self, name, at, device, method, *args, days=None, room=None, when=None, modes=("Auto",),
+                 message=None):
+        hour, minute = at.split(":")
+        self.name = name
+        self.hour = int(hour)
+        self.minute = int(minute)
+        self.device = device
+        self.method = method
+        self.args = args
+        self.days = frozenset(days) if days is not None else None
+        self.room = room
+        self.when = when
+        self.modes = modes
+        self.message = message
+
+
+    def next_after(self, timestamp):
+        """The first time after `timestamp` this schedule fires, as a timestamp."""
+        fire = datetime.fromtimestamp(timestamp).replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if fire.timestamp() <= timestamp:
+            fire += timedelta(days=1)
+        if self.days is not None:
+            if not self.days:
+                return None
+            while fire.weekday() not in self.days:
+                fire += timedelta(days=1)
+        return fire.timestamp()
+
+
+def window(name, start, end, device, on="turn_on", off="turn_off", **options):
+    """A start and a stop schedule keeping `device` on from `start` to `end`."""
+    return [Schedule(f"{name} start", start, device, on, when=OFF, **options),
+            Schedule(f"{name} stop", end, device, off, when=ON, **options)]
+
+
+SCHEDULES = [
+    Schedule("auto_lock", AUTO_LOCK, "Main Door Lock", "lock", when=("locked", False), modes=None,
+             message="It's late. Auto-locking the main door."),
+    *window("morning_coffee", *MORNING_COFFEE, SmartCoffeeMaker, days=WORKDAYS),
+    *window("sprinkler", *SPRINKLER_WINDOW, SmartSprinkler),
+]
+
+
+class ScheduleEngine:
+    """Time-of-day schedules kept in a min-heap of their next fire times.
+
+    due(now) pops only the schedules whose time has come and pushes their next
+    occurrence, so thousands of schedules cost nothing between firings; a runner
+    sleeps until next_fire(). `listener` (if set) is called whenever the schedule
+    set changes, so a sleeping runner can recompute its wake-up time. A schedule
+    whose time passed while nothing was running fires once, not once per missed day.
+    """
+
+    def __init__(self, schedules=SCHEDULES, now=None):
+        self.heap = []          # [(fire time, seq, schedule)]
+        self.schedules = {}     # name -> schedule
+        self.listener = None
+        self._seq = itertools.count()
+        now = clock.now() if now is None else now
+        for schedule in schedules:
+            self.add(schedule, now)
+
+
+    def __len__(self):
+        return len(self.schedules)
+
+
+    def add(self, schedule, now=None):
+        if schedule.name in self.schedules:
+            raise ValueError(f"schedule {schedule.name!r} already exists")
+        self.schedules[schedule.name] = schedule
+        self._push(schedule, clock.now() if now is None else now)
+        self._changed()
+
+
+    def remove(self, name):
+        # its heap entry is dropped lazily when it reaches the top
+        schedule = self.schedules.pop(name, None)
+        self._changed()
+        return schedule
+
+
+    def _push(self, schedule, after):
+        fire = schedule.next_after(after)
+        if fire is not None:
+            heapq.heappush(self.heap, (fire, next(self._seq), schedule))
+
+
+    def _changed(self):
+        if self.listener is not None:
+            self.listener()
+
+
+    def _drop_removed(self):
+        heap = self.heap
+        while heap and self.schedules.get(heap[0][2].name) is not heap[0][2]:
+            heapq.heappop(heap)
+
+
+    def next_fire(self):
+        """Timestamp of the earliest pending firing, or None."""
+        self._drop_removed()
+        return self.heap[0][0] if self.heap else None
+
+
+    def due(self, now=None):
+        """Pops the schedules due by `now` and re-arms them; returns them in firing order."""
+        now = clock.now() if now is None else now
+        fired = []
+        heap = self.heap
+        while True:
+            self._drop_removed()
+            if not heap or heap[0][0] > now:
+                return fired
+            fire, _, schedule = heapq.heappop(heap)
+            fired.append(schedule)
+            self._push(schedule, max(fire, now))
+
+
+    def upcoming(self, limit=None):
+        """[(fire time, schedule)] in firing order."""
+        self._drop_removed()
+        live = sorted(entry for entry in self.heap if self.schedules.get(entry[2].name) is entry[2])
+        return [(fire, schedule) for fire, _, schedule in live[:limit]]
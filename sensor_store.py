@@ -0,0 +1,161 @@
+import clock
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed when the columnar store is enabled
+    np = None
+
+
+KIND_FLOAT = 0
+KIND_INT = 1
+KIND_BOOL = 2
+
+
+class SensorStore:
+    """Columnar storage for sensor readings.
+
+    Values, sensor types, room ids and last-update times live in NumPy arrays;
+    attached Sensor objects read and write their `value` through their slot.
+    Slots stay dense (0..count-1): detaching swaps the last sensor into the gap.
+    """
+
+    def __init__(self, capacity=64):
+        if np is None:
+            raise RuntimeError("The columnar sensor store requires numpy (pip install numpy).")
+
+        self.count = 0
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.kinds = np.zeros(capacity, dtype=np.int8)
+        self.types = np.zeros(capacity, dtype=np.int16)
+        self.rooms = np.zeros(capacity, dtype=np.int32)
+        self.updated = np.zeros(capacity, dtype=np.float64)
+        self.sensors = []
+
+        self.type_codes = {}   # sensor class -> code
+        self.room_ids = {}     # room name -> id
+        self._codes_for = {}   # queried class -> array of codes of its subclasses
+
+
+    #slots
+
+    def _grow(self):
+        capacity = len(self.values) * 2
+        for column in ("values", "kinds", "types", "rooms", "updated"):
+            old = getattr(self, column)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, column, new)
+
+
+    def _type_code(self, cls):
+        code = self.type_codes.get(cls)
+        if code is None:
+            code = len(self.type_codes)
+            self.type_codes[cls] = code
+            self._codes_for.clear()
+        return code
+
+
+    def room_id(self, room):
+        rid = self.room_ids.get(room)
+        if rid is None:
+            rid = len(self.room_ids)
+            self.room_ids[room] = rid
+        return rid
+
+
+    def attach(self, sensor):
+        value = sensor.value
+        if self.count == len(self.values):
+            self._grow()
+
+        slot = self.count
+        self.count += 1
+        self.sensors.append(sensor)
+        self.types[slot] = self._type_code(type(sensor))
+        self.rooms[slot] = self.room_id(sensor.room)
+        self.kinds[slot] = KIND_FLOAT
+        sensor._store = self
+        sensor._slot = slot
+        self.write(slot, value)
+
+
+    def detach(self, sensor):
+        slot = sensor._slot
+        value = self.read(slot)
+        last = self.count - 1
+
+        if slot != last:
+            moved = self.sensors[last]
+            for column in (self.values, self.kinds, self.types, self.rooms, self.updated):
+                column[slot] = column[last]
+            self.sensors[slot] = moved
+            moved._slot = slot
+
+        self.sensors.pop()
+        self.count = last
+        sensor._store = None
+        sensor._slot = -1
+        sensor._value = value
+
+
+    def move(self, sensor):
+        self.rooms[sensor._slot] = self.room_id(sensor.room)
+
+
+    #values
+
+    def read(self, slot):
+        kind = self.kinds[slot]
+        value = self.values[slot]
+        if kind == KIND_BOOL:
+            return bool(value)
+        if kind == KIND_INT:
+            return int(value)
+        return float(value)
+
+
+    def write(self, slot, value, timestamp=None):
+        if isinstance(value, bool):
+            self.kinds[slot] = KIND_BOOL
+        elif isinstance(value, int):
+            self.kinds[slot] = KIND_INT
+        else:
+            self.kinds[slot] = KIND_FLOAT
+        self.values[slot] = value
+        self.updated[slot] = clock.now() if timestamp is None else timestamp
+
+
+    #vectorized queries
+
+    def _codes(self, cls):
+        codes = self._codes_for.get(cls)
+        if codes is None:
+            codes = np.array([code for t, code in self.type_codes.items() if issubclass(t, cls)], dtype=np.int16)
+            self._codes_for[cls] = codes
+        return codes
+
+
+    def type_mask(self, cls):
+        return np.isin(self.types[:self.count], self._codes(cls))
+
+
+    def values_of(self, cls):
+        mask = self.type_mask(cls)
+        return self.values[:self.count][mask]
+
+
+    def where(self, cls, *conditions):
+        """Sensors of `cls` matching any condition, paired with the index of the first one they match.
+
+        Each condition maps the values array to a boolean mask, e.g. `lambda v: v < 30`.
+        Results are in slot order, which is attach order unless sensors have been detached.
+        """
+        count = self.count
+        values = self.values[:count]
+        branch = np.full(count, -1, dtype=np.int8)
+        for i in range(len(conditions) - 1, -1, -1):
+            branch[conditions[i](values)] = i
+
+        hits = np.flatnonzero(self.type_mask(cls) & (branch >= 0))
+        return [(self.sensors[i], int(branch[i])) for i in hits]
@@ -1,73 +1,139 @@
+import logging
 import random
-import time
+import clock
+from events import SensorChanged
+from tracing import get_logger
+
+log = get_logger("sensors")
 
 class Sensor:
+    __slots__ = ("name", "room", "_store", "_slot", "_value", "bus", "history")
+
     def __init__(self, name, room, value=0):
         self.name = name
         self.room = room
+        self._store = None  # columnar SensorStore holding the value, when enabled
+        self._slot = -1
         self.value = value
+        self.bus = None  # set by the controller; accepted updates are published on it
+        self.history = None  # SensorHistory of timestamped readings, when enabled
+
+    @property
+    def value(self):
+        if self._store is None:
+            return self._value
+        return self._store.read(self._slot)
+
+    @value.setter
+    def value(self, new_value):
+        if self._store is None:
+            self._value = new_value
+        else:
+            self._store.write(self._slot, new_value)
 
     def read_value(self):
         return f"{self.name} in {self.room}: {self.value}"   
     
-    def update_value(self, new_value):
+    def value_range(self):
+        """(min, max) of accepted readings, or None when the sensor has no fixed range."""
+        return None
+
+    def accepts(self, value):
+        value_range = self.value_range()
+        if value_range is None:
+            return True
+        low, high = value_range
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and low <= value <= high
+
+    def update_value(self, new_value, timestamp=None):
+        old_value = self.value
         self.value = new_value
+        if timestamp is None:
+            timestamp = clock.now()
+        elif self._store is not None:
+            self._store.updated[self._slot] = timestamp
+        if self.history is not None:
+            self.history.append(timestamp, new_value)
+        if self.bus:
+            self.bus.publish(SensorChanged(self, "value", old_value, new_value, timestamp))
+
+
+class BinarySensor(Sensor):
+    """Base for on/off sensors (motion, door, floor clean)."""
+    __slots__ = ()
+
+    def accepts(self, value):
+        return isinstance(value, bool) or value in (0, 1)
 
     
 class TemperatureSensor(Sensor):
+    __slots__ = ()
+    unit = "°C"
+
     def __init__(self, name, room, value=0):
         super().__init__(name, room, value)
-        self.unit = "°C"
+
+    def accepts(self, value):
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
 
     def read_value(self):
         return f"Temperature in {self.room}: {self.value} {self.unit}"
     
-    def update_value(self, new_value, verbose=True):
-        super().update_value(new_value)
-        if verbose:
-            print(f"Temperature updated to {self.value} {self.unit} in {self.room}")
+    def update_value(self, new_value, verbose=True, timestamp=None):
+        super().update_value(new_value, timestamp)
+        if verbose and log.isEnabledFor(logging.DEBUG):
+            log.debug("Temperature updated to %s %s in %s", self.value, self.unit, self.room)
+
 
+class MotionSensor(BinarySensor):
+    __slots__ = ("last_motion_time",)
 
-class MotionSensor(Sensor):
     def __init__(self, name, room, value=False):
         super().__init__(name, room, value)
-        self.last_motion_time = time.time()
+        self.last_motion_time = clock.now()
 
     def read_value(self):
         status = "Motion Detected" if self.value else "No Motion"
         return f"{self.room}: {status}"
     
-    def update_value(self, new_value, verbose=True):
-        super().update_value(new_value)
-
+    def update_value(self, new_value, verbose=True, timestamp=None):
         if new_value == True:
-            self.last_motion_time = time.time()
+            self.last_motion_time = clock.now() if timestamp is None else timestamp
+
+        super().update_value(new_value, timestamp)
             
-        if verbose:
+        if verbose and log.isEnabledFor(logging.DEBUG):
             status = "detected" if self.value else "not detected"
-            print(f"Motion is now {status} in {self.room}")
+            log.debug("Motion is now %s in %s", status, self.room)
 
 
 class LightSensor(Sensor):
+    __slots__ = ("min_value", "max_value")
+
     def __init__(self, name, room, min_value=0, max_value=100):
         super().__init__(name, room)
         self.min_value = min_value
         self.max_value = max_value
         self.value = random.randint(self.min_value, self.max_value)
 
+    def value_range(self):
+        return self.min_value, self.max_value
+
     def read_value(self):
         return f"Light in {self.room}: {self.value} % brightness"
     
-    def update_value(self, new_value, verbose=True):
+    def update_value(self, new_value, verbose=True, timestamp=None):
         if self.min_value <= new_value <= self.max_value:
-            super().update_value(new_value)
-            if verbose:
-                print(f"Brightness updated to {self.value} % in {self.room}")
+            super().update_value(new_value, timestamp)
+            if verbose and log.isEnabledFor(logging.DEBUG):
+                log.debug("Brightness updated to %s %% in %s", self.value, self.room)
         else:
-            print(f"Error: Brightness value {new_value} out of range ({self.min_value}-{self.max_value})")
+            log.warning("Error: Brightness value %s out of range (%s-%s)", new_value, self.min_value, self.max_value)
+
 
+class DoorSensor(BinarySensor):
+    __slots__ = ()
 
-class DoorSensor(Sensor):
     def __init__(self, name, room, value=False):
         super().__init__(name, room, value)
 
@@ -75,52 +141,64 @@ class DoorSensor(Sensor):
         status = "Open" if self.value else "Closed"
         return f"Door in {self.room}: {status}"
     
-    def update_value(self, new_value, verbose=True):
-        super().update_value(new_value)
-        if verbose:
+    def update_value(self, new_value, verbose=True, timestamp=None):
+        super().update_value(new_value, timestamp)
+        if verbose and log.isEnabledFor(logging.DEBUG):
             status = "open" if self.value else "closed"
-            print(f"The door is now {status} in {self.room}")
+            log.debug("The door is now %s in %s", status, self.room)
 
 
 class HumiditySensor(Sensor):
+    __slots__ = ("min_humidity", "max_humidity")
+
     def __init__(self, name, room, min_humidity=20, max_humidity=70):
         super().__init__(name, room)
         self.min_humidity = min_humidity
         self.max_humidity = max_humidity
         self.value = random.randint(self.min_humidity, self.max_humidity)
 
+    def value_range(self):
+        return self.min_humidity, self.max_humidity
+
     def read_value(self):
         return f"Humidity in {self.room}: {self.value} % "  
     
-    def update_value(self, new_value, verbose=True):
+    def update_value(self, new_value, verbose=True, timestamp=None):
         if self.min_humidity <= new_value <= self.max_humidity:
-            super().update_value(new_value)
-            if verbose:
-                print(f"Humidity updated to {self.value} % in {self.room}")
+            super().update_value(new_value, timestamp)
+            if verbose and log.isEnabledFor(logging.DEBUG):
+                log.debug("Humidity updated to %s %% in %s", self.value, self.room)
         else:
-            print(f"Error: Humidity value {new_value} out of range ({self.min_humidity}-{self.max_humidity})")  
+            log.warning("Error: Humidity value %s out of range (%s-%s)", new_value, self.min_humidity, self.max_humidity)
 
     
 class SoilMoistureSensor(Sensor):
+    __slots__ = ("min_moisture", "max_moisture")
+
     def __init__(self, name, room, min_moisture=0, max_moisture=100):
         super().__init__(name, room)
         self.min_moisture = min_moisture
         self.max_moisture = max_moisture
         self.value = random.randint(self.min_moisture, self.max_moisture)
 
+    def value_range(self):
+        return self.min_moisture, self.max_moisture
+
     def read_value(self):
         return f"Soil moisture in {self.room}: {self.value} % soil moisture"  
     
-    def update_value(self, new_value, verbose=True):
+    def update_value(self, new_value, verbose=True, timestamp=None):
         if self.min_moisture <= new_value <= self.max_moisture:
-            super().update_value(new_value)
-            if verbose:
-                print(f"Soil moisture updated to {self.value} % in {self.room}")
+            super().update_value(new_value, timestamp)
+            if verbose and log.isEnabledFor(logging.DEBUG):
+                log.debug("Soil moisture updated to %s %% in %s", self.value, self.room)
         else:
-            print(f"Error: Soil moisture value {new_value} out of range ({self.min_moisture}-{self.max_moisture})") 
+            log.warning("Error: Soil moisture value %s out of range (%s-%s)", new_value, self.min_moisture, self.max_moisture)
+
 
+class FloorCleanSensor(BinarySensor):
+    __slots__ = ()
 
-class FloorCleanSensor(Sensor):
     def __init__(self, name, room, value=False):
         super().__init__(name, room, value)
 
@@ -128,27 +206,32 @@ class FloorCleanSensor(Sensor):
         status = "Clean" if self.value else "Dirty"
         return f"The floor in {self.room}: {status}" 
     
-    def update_value(self, new_value, verbose=True):
-        super().update_value(new_value)
-        if verbose:
+    def update_value(self, new_value, verbose=True, timestamp=None):
+        super().update_value(new_value, timestamp)
+        if verbose and log.isEnabledFor(logging.DEBUG):
             status = "clean" if self.value else "dirty"
-            print(f"The floor is now {status} in {self.room}")  
+            log.debug("The floor is now %s in %s", status, self.room)
        
 
 class DirtSensor(Sensor):
+    __slots__ = ("min_dirt", "max_dirt")
+
     def __init__(self, name, room, min_dirt=0, max_dirt=100):
         super().__init__(name, room)
         self.min_dirt = min_dirt
         self.max_dirt = max_dirt
         self.value = random.randint(self.min_dirt, self.max_dirt)
 
+    def value_range(self):
+        return self.min_dirt, self.max_dirt
+
     def read_value(self):
         return f"Dirt level in {self.room}: {self.value} % dirt level"
     
-    def update_value(self, new_value,verbose=True):
+    def update_value(self, new_value, verbose=True, timestamp=None):
         if self.min_dirt <= new_value <= self.max_dirt:
-            super().update_value(new_value)
-            if verbose:
-                print(f"Dirt level updated to {self.value} % in {self.room}")
+            super().update_value(new_value, timestamp)
+            if verbose and log.isEnabledFor(logging.DEBUG):
+                log.debug("Dirt level updated to %s %% in %s", self.value, self.room)
         else:
-            print(f"Error: Dirt level value {new_value} out of range ({self.min_dirt}-{self.max_dirt})")
\ No newline at end of file
+            log.warning("Error: Dirt level value %s out of range (%s-%s)", new_value, self.min_dirt, self.max_dirt)
\ No newline at end of file
@@ -0,0 +1,245 @@
+"""Many homes spread over worker processes.
+
+    with HomeShards(shards=4) as homes:
+        for i in range(1000):
+            homes.add_home(i, generate_home, 5, 20, 20, i)   # built inside its worker
+        homes.submit_reading(7, "TemperatureSensor 0", 31)
+        actions = homes.run_checks()                        # {home_id: [(device, field, old, new)]}
+
+Each worker process owns the controllers of its shard and runs their rule passes
+locally. The manager never talks to a controller directly: calls are queued per
+shard and sent as one batch message when results are needed (flush(), run_checks(),
+get_state()), so a round over thousands of homes costs one message pair per shard.
+"""
+import multiprocessing
+import os
+import time
+
+from tracing import get_logger
+
+log = get_logger("sharding")
+
+
+class ShardError(Exception):
+    """An operation failed inside a shard worker."""
+
+
+#worker side
+
+def _build(source, args):
+    from persistence import restore_state
+    if callable(source):
+        return source(*args)
+    return restore_state(source)
+
+
+def _handle(homes, op):
+    kind, home_id = op[0], op[1]
+    if kind == "add":
+        homes[home_id] = _build(op[2], op[3])
+        return None
+    if kind == "check":
+        # home_id is None for every home of the shard, else a list of home ids
+        ids = homes if home_id is None else [h for h in home_id if h in homes]
+        return {h: homes[h].apply_automation_rules(full=True) for h in ids}
+
+    c = homes[home_id]
+    if kind == "readings":
+        report = c.ingest_batch(op[2], run_rules=False)
+        return report["rejected"]
+    if kind == "command":
+        device = c.get_device(op[2])
+        if device is None:
+            raise KeyError(f"unknown device {op[2]!r}")
+        return getattr(device, op[3])(*op[4])
+    if kind == "mode":
+        return c.set_system_mode(op[2])["changed"]
+    if kind == "state":
+        from persistence import snapshot_state
+        return snapshot_state(c)
+    if kind == "remove":
+        del homes[home_id]
+        return None
+    raise ValueError(f"unknown shard operation {kind!r}")
+
+
+def _worker(conn):
+    homes = {}
+    while True:
+        batch = conn.recv()
+        if batch is None:
+            break
+        replies = []
+        for op in batch:
+            try:
+                replies.append((True, _handle(homes, op)))
+            except Exception as e:
+                replies.append((False, f"{op[0]} {op[1]!r}: {type(e).__name__}: {e}"))
+        conn.send(replies)
+    conn.close()
+
+
+#manager side
+
+class HomeShards:
+    """Routes homes to `shards` worker processes (one per core by default).
+
+    add_home(), submit_reading(), send_command() and set_mode() only queue work;
+    it reaches the workers with the next flush(), run_checks() or get_state().
+    Workers process their batches in parallel. Operations that fail are collected
+    in `errors` rather than aborting the rest of the batch.
+    """
+
+    def __init__(self, shards=None, start_method=None):
+        self.shards = shards or os.cpu_count() or 1
+        self.context = multiprocessing.get_context(start_method)
+        self.placement = {}  # home id -> shard
+        self.loads = [0] * self.shards
+        self.outbox = [[] for _ in range(self.shards)]
+        self.errors = []
+        self.messages = 0
+        self._conns = []
+        self._procs = []
+
+
+    #lifecycle
+
+    def start(self):
+        if not self._procs:
+            for i in range(self.shards):
+                parent, child = self.context.Pipe()
+                proc = self.context.Process(target=_worker, args=(child,), name=f"homi-shard-{i}", daemon=True)
+                proc.start()
+                child.close()
+                self._conns.append(parent)
+                self._procs.append(proc)
+            log.info("Started %s shard workers", self.shards)
+        return self
+
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(5)
+        for conn in self._conns:
+            conn.close()
+        self._conns, self._procs = [], []
+
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    #queued operations
+
+    def _queue(self, home_id, op):
+        self.outbox[self.placement[home_id]].append(op)
+
+
+    def add_home(self, home_id, source, *args):
+        """Queues a home: `source` is a picklable factory called as source(*args) in the
+        worker, or a SmartHomeController whose saved state is shipped there."""
+        if home_id in self.placement:
+            raise ValueError(f"home {home_id!r} already exists")
+        if not callable(source):
+            from persistence import snapshot_state
+            source = snapshot_state(source)
+        shard = self.loads.index(min(self.loads))
+        self.placement[home_id] = shard
+        self.loads[shard] += 1
+        self._queue(home_id, ("add", home_id, source, args))
+
+
+    def remove_home(self, home_id):
+        self._queue(home_id, ("remove", home_id))
+        self.loads[self.placement.pop(home_id)] -= 1
+
+
+    def submit_reading(self, home_id, sensor_name, value, timestamp=None):
+        # consecutive readings for the same home share one ingest_batch() call
+        box = self.outbox[self.placement[home_id]]
+        if box and box[-1][0] == "readings" and box[-1][1] == home_id:
+            box[-1][2].append((sensor_name, value, timestamp))
+        else:
+            box.append(("readings", home_id, [(sensor_name, value, timestamp)]))
+
+
+    def send_command(self, home_id, device_name, method, *args):
+        self._queue(home_id, ("command", home_id, device_name, method, args))
+
+
+    def set_mode(self, home_id, mode):
+        self._queue(home_id, ("mode", home_id, mode))
+
+
+    #round trips
+
+    def flush(self):
+        """Sends every shard its queued batch; returns each shard's list of replies."""
+        self.start()
+        busy = []
+        for shard, batch in enumerate(self.outbox):
+            if batch:
+                self._conns[shard].send(batch)
+                self.outbox[shard] = []
+                self.messages += 1
+                busy.append(shard)
+
+        replies = [[] for _ in range(self.shards)]
+        for shard in busy:
+            try:
+                results = self._conns[shard].recv()
+            except (EOFError, OSError):
+                raise ShardError(f"shard {shard} worker exited") from None
+            for ok, value in results:
+                if ok:
+                    replies[shard].append(value)
+                else:
+                    self.errors.append(value)
+                    replies[shard].append(None)
+        return replies
+
+
+    def run_checks(self, home_ids=None):
+        """Runs a full rule pass (apply_all_checks) in every home, or in `home_ids`.
+
+        Queued operations are applied first. Returns {home_id: [(device, field, old, new)]}.
+        """
+        if home_ids is None:
+            for box in self.outbox:
+                box.append(("check", None))
+        else:
+            wanted = [[] for _ in range(self.shards)]
+            for home_id in home_ids:
+                wanted[self.placement[home_id]].append(home_id)
+            for shard, ids in enumerate(wanted):
+                if ids:
+                    self.outbox[shard].append(("check", ids))
+
+        start = time.perf_counter()
+        actions = {}
+        for shard_replies in self.flush():
+            if shard_replies and shard_replies[-1]:
+                actions.update(shard_replies[-1])
+        log.info("Rule checks in %s homes took %.0f ms", len(actions), (time.perf_counter() - start) * 1000)
+        return actions
+
+
+    def get_state(self, home_id):
+        """The home's snapshot_state() dict, after its queued operations ran."""
+        self._queue(home_id, ("state", home_id))
+        state = self.flush()[self.placement[home_id]][-1]
+        if state is None:
+            raise ShardError(self.errors[-1])
+        return state
+
+
+    def home_count(self):
+        return len(self.placement)
@@ -0,0 +1,123 @@
+"""Runs a home on a virtual clock, as fast as the CPU allows.
+
+    with Simulation(start=datetime(2026, 3, 2)) as sim:       # the demo home
+        report = sim.run(days=30, readings=trace)             # [(sensor, value, timestamp)]
+        print(report["speedup"], sim.controller.get_energy_total())
+
+The simulation jumps straight from one event to the next - a reading, a timer
+deadline (motion timeouts) or a schedule firing - so idle hours cost nothing and a
+simulated month takes seconds. Energy hours, motion timeouts and schedules all see
+the simulated time.
+"""
+import time
+
+import clock
+from tracing import get_logger
+
+log = get_logger("simulation")
+
+
+def _demo_home():
+    from controller import SmartHomeController
+    from demo_home import build_demo_home
+    c = SmartHomeController()
+    build_demo_home(c)
+    return c
+
+
+class Simulation:
+    """A controller built and driven on its own VirtualClock.
+
+    `factory(*args)` returns the controller (default: the demo home); it is called
+    with the virtual clock already installed so the home starts at `start`. The clock
+    stays installed until close(). With `step` (seconds) a rule pass also runs
+    at least that often, like the runtime's ticker.
+    """
+
+    def __init__(self, factory=None, *args, start=None, step=None):
+        self.clock = clock.VirtualClock(start)
+        self.step = step
+        self._previous = clock.get_clock()
+        clock.set_clock(self.clock)
+        try:
+            self.controller = (factory or _demo_home)(*args)
+        except BaseException:
+            clock.set_clock(self._previous)
+            raise
+        self.actions = []  # (timestamp, device, field, old, new) over every run()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if clock.get_clock() is self.clock:
+            clock.set_clock(self._previous)
+
+
+    def _next_wake(self, end, reading_time, last_pass):
+        c = self.controller
+        wake = end
+        for candidate in (reading_time, c.timers.next_check(), c.schedules.next_fire()):
+            if candidate is not None and candidate < wake:
+                wake = candidate
+        if self.step is not None:
+            wake = min(wake, last_pass + self.step)
+        return max(wake, self.clock.now)
+
+
+    def run(self, seconds=0.0, days=0.0, until=None, readings=()):
+        """Advances the simulation to `until` (or by seconds + days), feeding `readings` on the way.
+
+        `readings` are (sensor, value, timestamp) tuples as for ingest_batch(), with
+        timestamps, in time order; readings sharing a timestamp are ingested as one batch
+        and readings after the end are not used. Returns a summary.
+        """
+        c = self.controller
+        end = until if until is not None else self.clock.now + seconds + days * 86400
+        begin = self.clock.now
+        readings = iter(readings)
+        pending = next(readings, None)
+        counts = {"readings": 0, "rejected": 0, "actions": 0, "wakeups": 0}
+        last_pass = begin
+        wall = time.perf_counter()
+
+        while True:
+            reading_time = pending[2] if pending is not None else None
+            now = self.clock.set(self._next_wake(end, reading_time, last_pass))
+            counts["wakeups"] += 1
+            self._record(now, c.tick(now), counts)
+            self._record(now, c.run_schedules(now), counts)
+
+            batch = []
+            while pending is not None and pending[2] <= now:
+                batch.append(pending)
+                pending = next(readings, None)
+            if batch:
+                report = c.ingest_batch(batch, run_rules=False)
+                counts["readings"] += len(batch)
+                counts["rejected"] += report["rejected"]
+            if batch or (self.step is not None and now >= last_pass + self.step):
+                self._record(now, c.apply_automation_rules(), counts)
+                last_pass = now
+            if now >= end:
+                break
+
+        wall = time.perf_counter() - wall
+        simulated = end - begin
+        log.info("Simulated %.1f days in %.2f s: %s readings, %s device actions",
+                 simulated / 86400, wall, counts["readings"], counts["actions"])
+        return {
+            **counts,
+            "simulated_s": simulated,
+            "wall_s": wall,
+            "speedup": simulated / wall if wall else float("inf"),
+            "kwh": c.get_energy_total(),
+        }
+
+
+    def _record(self, now, actions, counts):
+        counts["actions"] += len(actions)
+        self.actions.extend((now, *action) for action in actions)
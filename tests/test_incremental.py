@@ -0,0 +1,37 @@
+"""Dirty rule passes must leave every device exactly as full passes do."""
+from datetime import datetime
+
+import pytest
+
+from benchmarks.check_incremental import first_difference
+from simulation import Simulation
+
+MONDAY = datetime(2026, 3, 2, 5)
+
+
+@pytest.mark.parametrize("rooms, seed", [(3, 0), (10, 1), (40, 2)])
+def test_dirty_passes_match_full_passes(rooms, seed):
+    # few rooms put several sensors of every type in each room; steps cross the morning schedules
+    assert first_difference(300, rooms, 100, 200, seed=seed) is None
+
+
+def test_sprinkler_window_on_wet_soil_stops_on_dirty_pass():
+    with Simulation(start=MONDAY) as sim:
+        c = sim.controller
+        c.get_sensor("Soil Sensor").update_value(90, verbose=False)
+        c.apply_automation_rules(full=True)
+        sprinkler = c.get_device("Lawn Sprinkler")
+
+        sim.run(until=datetime(2026, 3, 2, 6, 0).timestamp())
+        assert sprinkler.status == "ON"
+        c.apply_automation_rules()
+        assert sprinkler.status == "OFF"
+
+
+def test_morning_coffee_turns_off_after_its_window():
+    with Simulation(start=MONDAY) as sim:
+        sim.run(days=1)
+        coffee = [(datetime.fromtimestamp(t).strftime("%H:%M"), new)
+                  for t, name, field, old, new in sim.actions if name == "Coffee Machine" and field == "status"]
+        assert coffee == [("07:00", "ON"), ("07:30", "OFF")]
+        assert sim.controller.get_device("Coffee Machine").status == "OFF"
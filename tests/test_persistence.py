@@ -0,0 +1,45 @@
+"""A home restored after a crash must match the home that was running."""
+import random
+from datetime import datetime
+
+from benchmarks.synthetic import random_reading
+from persistence import StateStore, snapshot_state, FRAME
+from simulation import Simulation
+
+
+def run_day(sim, seed=0):
+    rng = random.Random(seed)
+    c = sim.controller
+    start = sim.clock.now
+    readings = []
+    for i in range(200):
+        sensor = rng.choice(c.sensors)
+        readings.append((sensor, random_reading(sensor, rng), start + i * 400))
+    sim.run(days=0.5, readings=readings)
+    c.set_system_mode("Away")
+    c.change_pin(c.pin, "4321")
+    c.get_device("Living Room Audio").play_song("LoFi Beats")
+    sim.run(days=0.5)
+    c.set_system_mode("Auto")
+
+
+def test_restore_replays_change_log_without_clean_close(tmp_path):
+    with Simulation(start=datetime(2026, 3, 2, 5), step=60) as sim:
+        store = StateStore(str(tmp_path))
+        store.attach(sim.controller)
+        run_day(sim)
+        # no detach(): the process "crashes" with the log still open
+        restored = StateStore(str(tmp_path)).restore()
+        assert snapshot_state(restored) == snapshot_state(sim.controller)
+        assert restored.pin == "4321"
+
+
+def test_restore_ignores_torn_final_record(tmp_path):
+    with Simulation(start=datetime(2026, 3, 2, 5), step=60) as sim:
+        store = StateStore(str(tmp_path))
+        store.attach(sim.controller)
+        run_day(sim)
+        expected = snapshot_state(sim.controller)
+        store.changes.file.write(FRAME.pack(1000) + b"partial")
+        store.changes.file.flush()
+        assert snapshot_state(StateStore(str(tmp_path)).restore()) == expected
@@ -0,0 +1,194 @@
+import math
+
+from tracing import get_logger
+
+log = get_logger("timers")
+
+
+class Timer:
+    """A scheduled callback; pass it to TimerWheel.cancel() to drop it."""
+
+    __slots__ = ("deadline", "ticks", "callback", "args", "bucket", "level")
+
+    def __init__(self, deadline, ticks, callback, args):
+        self.deadline = deadline
+        self.ticks = ticks
+        self.callback = callback
+        self.args = args
+        self.bucket = None  # the slot holding it while armed
+        self.level = None
+
+    @property
+    def armed(self):
+        return self.bucket is not None
+
+
+class TimerWheel:
+    """Hierarchical timing wheel: O(1) schedule and cancel, and advancing touches only due slots.
+
+    Time is cut into `tick`-second ticks. Level 0 has one slot per tick for the next
+    `slots` ticks, level 1 one slot per `slots` ticks, and so on; a timer lives in the
+    coarsest slot that still separates it from now and moves down a level each time
+    the finer wheel completes a turn, until it fires from level 0. Timers fire on the
+    first advance() at or after their deadline, never before it. Deadlines beyond the
+    top level wait in an overflow list that is re-sorted once per top-level turn.
+    """
+
+    def __init__(self, tick=1.0, slots=64, levels=4, now=0.0):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.overflow = {}
+        self.due = {}  # scheduled at or before the current tick: fire on the next advance()
+        self.sizes = [0] * (levels + 2)  # timers per wheel level, then overflow, then due
+        self.current = math.floor(now / tick)
+        self.count = 0
+        self.fired = 0
+
+
+    def __len__(self):
+        return self.count
+
+
+    def schedule(self, deadline, callback, *args):
+        """Calls callback(*args) once `deadline` (seconds, same clock as advance()) has passed."""
+        timer = Timer(deadline, math.ceil(deadline / self.tick), callback, args)
+        self._place(timer)
+        self.count += 1
+        return timer
+
+
+    def cancel(self, timer):
+        if timer.bucket is not None:
+            del timer.bucket[timer]
+            self.sizes[timer.level] -= 1
+            timer.bucket = None
+            self.count -= 1
+
+
+    def reschedule(self, timer, deadline):
+        self.cancel(timer)
+        timer.deadline = deadline
+        timer.ticks = math.ceil(deadline / self.tick)
+        self._place(timer)
+        self.count += 1
+        return timer
+
+
+    def _place(self, timer):
+        delta = timer.ticks - self.current
+        if delta <= 0:
+            level, bucket = self.levels + 1, self.due
+        else:
+            for level in range(self.levels):
+                if delta < 1 << (self.bits * (level + 1)):
+                    bucket = self.wheels[level][(timer.ticks >> (self.bits * level)) & self.mask]
+                    break
+            else:
+                level, bucket = self.levels, self.overflow
+        bucket[timer] = None
+        timer.bucket = bucket
+        timer.level = level
+        self.sizes[level] += 1
+
+
+    def advance(self, now):
+        """Fires every timer whose deadline is at or before `now`; returns how many fired."""
+        fired = self._fire(self.due) if self.due else 0
+        target = math.floor(now / self.tick)
+        if self.count == 0:
+            self.current = max(self.current, target)
+            return fired
+
+        while self.current < target:
+            # ticks with nothing to fire or cascade are skipped, not stepped through
+            if not self.wheels[0][(self.current + 1) & self.mask]:
+                event = self._next_event()
+                if event > target:
+                    self.current = target
+                    break
+                self.current = event - 1
+            self.current += 1
+            current = self.current
+            index = current & self.mask
+            if index == 0:
+                self._cascade(current)
+                if self.due:
+                    # cascaded timers due exactly now
+                    fired += self._fire(self.due)
+            bucket = self.wheels[0][index]
+            if bucket:
+                fired += self._fire(bucket)
+        return fired
+
+
+    def next_check(self):
+        """When advance() may next fire something (never after the earliest deadline), or None."""
+        if self.due:
+            return self.current * self.tick
+        if self.count == 0:
+            return None
+        return self._next_event() * self.tick
+
+
+    def _next_event(self):
+        # the first tick after now at which a non-empty slot fires or cascades
+        event = None
+        for level in range(self.levels):
+            if not self.sizes[level]:
+                continue
+            shift = self.bits * level
+            turn = self.current >> shift
+            wheel = self.wheels[level]
+            for offset in range(1, self.slots + 1):
+                if wheel[(turn + offset) & self.mask]:
+                    tick = (turn + offset) << shift
+                    if event is None or tick < event:
+                        event = tick
+                    break
+        if self.sizes[self.levels]:
+            shift = self.bits * self.levels
+            tick = ((self.current >> shift) + 1) << shift
+            if event is None or tick < event:
+                event = tick
+        return self.current + 1 if event is None else event
+
+
+    def _cascade(self, current):
+        # a finer wheel completed a turn: pull the next slot of each coarser wheel down
+        for level in range(1, self.levels):
+            index = (current >> (self.bits * level)) & self.mask
+            self._replace(self.wheels[level][index])
+            if index:
+                return
+        self._replace(self.overflow)
+
+
+    def _replace(self, bucket):
+        if bucket:
+            timers = list(bucket)
+            bucket.clear()
+            self.sizes[timers[0].level] -= len(timers)
+            for timer in timers:
+                self._place(timer)
+
+
+    def _fire(self, bucket):
+        timers = list(bucket)
+        bucket.clear()
+        self.sizes[timers[0].level] -= len(timers)
+        for timer in timers:
+            timer.bucket = None
+        self.count -= len(timers)
+        self.fired += len(timers)
+        for timer in timers:
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                log.exception("Timer callback %r failed", timer.callback)
+        return len(timers)
@@ -0,0 +1,360 @@
+"""Synthetic sensor traces, generated with NumPy, and a replay engine feeding them to a controller.
+
+    trace = generate(c.sensors, days=30, seed=1)         # every sensor type, millions of readings
+    report = replay(c, trace, speedup=3600)              # one trace hour per wall-clock second
+    print(format_replay(report))
+
+Each sensor type has its own model, computed for all sensors of that type at once:
+daily temperature cycles, a humidity cycle opposite to it, daylight, motion bursts
+and door openings that follow a household's day, soil drying between waterings and
+dirt building up between cleanings. A Trace keeps the readings as columns (time,
+sensor index, value) sorted by time; readings() turns them back into the
+(sensor, value, timestamp) tuples ingest_batch() and Simulation.run() take.
+"""
+import math
+import time
+from collections import Counter
+
+import clock
+from sensors import (TemperatureSensor, MotionSensor, LightSensor, DoorSensor, HumiditySensor,
+                     SoilMoistureSensor, FloorCleanSensor, DirtSensor)
+from tracing import get_logger
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed to generate traces
+    np = None
+
+log = get_logger("traces")
+
+DAY = 86400
+HOUR = 3600
+
+# relative household activity per hour of the day: quiet nights, busy mornings and evenings
+ACTIVITY = [0.05, 0.03, 0.02, 0.02, 0.03, 0.1, 0.5, 1.0, 0.9, 0.5, 0.4, 0.4,
+            0.6, 0.5, 0.4, 0.4, 0.5, 0.8, 1.0, 1.0, 0.9, 0.7, 0.4, 0.15]
+
+
+#trace container
+
+class Trace:
+    """Readings as time-sorted columns: `times` (timestamps), `index` (into `sensors`) and `values`."""
+
+    def __init__(self, sensors, times, index, values):
+        order = np.argsort(times, kind="stable")
+        self.sensors = list(sensors)
+        self.times = times[order]
+        self.index = index[order]
+        self.values = values[order]
+
+
+    def __len__(self):
+        return len(self.times)
+
+
+    @property
+    def start(self):
+        return float(self.times[0]) if len(self.times) else None
+
+
+    @property
+    def end(self):
+        return float(self.times[-1]) if len(self.times) else None
+
+
+    def counts(self):
+        """Readings per sensor type name."""
+        per_sensor = np.bincount(self.index, minlength=len(self.sensors))
+        totals = Counter()
+        for sensor, n in zip(self.sensors, per_sensor.tolist()):
+            totals[type(sensor).__name__] += n
+        return dict(totals)
+
+
+    def readings(self, chunk=65536):
+        """(sensor, value, timestamp) tuples in time order, values typed the way each sensor accepts them."""
+        convert = [_converter(sensor) for sensor in self.sensors]
+        sensors = self.sensors
+        for lo in range(0, len(self.times), chunk):
+            times = self.times[lo:lo + chunk].tolist()
+            index = self.index[lo:lo + chunk].tolist()
+            values = self.values[lo:lo + chunk].tolist()
+            for t, i, v in zip(times, index, values):
+                yield sensors[i], convert[i](v), t
+
+
+def _converter(sensor):
+    if isinstance(sensor, (MotionSensor, DoorSensor, FloorCleanSensor)):
+        return bool
+    if isinstance(sensor, TemperatureSensor):
+        return float
+    return int
+
+
+#models: each takes the sensors of one type and returns (times, sensor positions, values)
+
+def _grid(count, start, end, interval, rng):
+    # one reading per `interval` for every sensor, each sensor with its own phase
+    steps = max(1, int((end - start) // interval))
+    times = start + (np.arange(steps) * interval)[None, :] + rng.uniform(0, interval, (count, 1))
+    return times
+
+
+def _hours(times):
+    # local hour of day (fractional), using the UTC offset at the start of the trace
+    offset = time.localtime(float(times.flat[0])).tm_gmtoff if times.size else 0
+    return ((times + offset) % DAY) / HOUR
+
+
+def temperature(sensors, start, end, interval, rng):
+    """Daily cycle peaking mid-afternoon plus slow weather drift and sensor noise, 0.1 °C steps."""
+    n = len(sensors)
+    times = _grid(n, start, end, interval, rng)
+    hours = _hours(times)
+    base = rng.normal(21, 3, (n, 1))
+    swing = rng.uniform(3, 8, (n, 1))
+    drift = np.cumsum(rng.normal(0, 0.05, times.shape), axis=1)
+    drift -= drift.mean(axis=1, keepdims=True)
+    values = base + swing * np.cos((hours - 15) * (2 * math.pi / 24)) + drift + rng.normal(0, 0.3, times.shape)
+    return times, np.round(values, 1)
+
+
+def humidity(sensors, start, end, interval, rng):
+    """Highest before dawn and lowest mid-afternoon, within each sensor's range."""
+    n = len(sensors)
+    times = _grid(n, start, end, interval, rng)
+    low, high = _ranges(sensors)
+    mid, half = (low + high) / 2, (high - low) / 2
+    values = mid - 0.7 * half * np.cos((_hours(times) - 15) * (2 * math.pi / 24)) + rng.normal(0, 2, times.shape)
+    return times, np.clip(np.round(values), low, high)
+
+
+def daylight(sensors, start, end, interval, rng):
+    """Dark at night, a sine-shaped day from 06:00 to 18:00 dimmed by random cloud cover."""
+    n = len(sensors)
+    times = _grid(n, start, end, interval, rng)
+    low, high = _ranges(sensors)
+    sun = np.clip(np.sin((_hours(times) - 6) * (math.pi / 12)), 0, None)
+    clouds = rng.uniform(0.4, 1.0, times.shape)
+    values = low + (high - low) * sun * clouds
+    return times, np.clip(np.round(values), low, high)
+
+
+def soil(sensors, start, end, interval, rng):
+    """Moisture jumps up at each watering or rain, then dries out steadily until the next one."""
+    n = len(sensors)
+    times = _grid(n, start, end, interval, rng)
+    low, high = _ranges(sensors)
+    since = _since_reset(times, start, end, rng, mean_gap=2.5 * DAY)
+    dry_rate = rng.uniform(0.8, 1.5, (n, 1)) / HOUR  # % per second
+    values = high - rng.uniform(5, 15, (n, 1)) - dry_rate * since + rng.normal(0, 1, times.shape)
+    return times, np.clip(np.round(values), low, high)
+
+
+def dirt(sensors, start, end, interval, rng):
+    """Dirt builds up steadily and drops back to near zero when the floor is cleaned."""
+    n = len(sensors)
+    times = _grid(n, start, end, interval, rng)
+    low, high = _ranges(sensors)
+    since = _since_reset(times, start, end, rng, mean_gap=2 * DAY)
+    rate = rng.uniform(1, 3, (n, 1)) / HOUR
+    values = low + rate * since + rng.normal(0, 1, times.shape)
+    return times, np.clip(np.round(values), low, high)
+
+
+def _ranges(sensors):
+    bounds = np.array([sensor.value_range() for sensor in sensors], dtype=np.float64)
+    return bounds[:, :1], bounds[:, 1:]
+
+
+def _since_reset(times, start, end, rng, mean_gap):
+    # seconds since each sensor's latest reset (watering, cleaning), resets arriving at random
+    n = times.shape[0]
+    resets = int((end - start) / mean_gap * 2) + 8
+    first = -rng.uniform(0, mean_gap, (n, 1))  # the last reset before the trace
+    at = np.concatenate([first, first + np.cumsum(rng.exponential(mean_gap, (n, resets)), axis=1)], axis=1)
+    # one sorted row per sensor: shift each row into its own band and search them all at once
+    band = at.max() - at.min() + (end - start) + 1
+    rows = np.arange(n)[:, None] * band
+    flat = (at + rows).ravel()
+    last = np.searchsorted(flat, (times - start + rows).ravel(), side="right") - 1
+    return times - start - flat[last].reshape(times.shape) + rows
+
+
+def _episodes(n, start, end, per_day, rng):
+    # event start times following ACTIVITY (thinned Poisson process), with their sensor position
+    expected = per_day * (end - start) / DAY / np.mean(ACTIVITY) * max(ACTIVITY)
+    counts = rng.poisson(expected, n)
+    owner = np.repeat(np.arange(n), counts)
+    times = rng.uniform(start, end, counts.sum())
+    activity = np.asarray(ACTIVITY)[_hours(times).astype(np.int64) % 24]
+    keep = rng.random(times.shape) < activity / max(ACTIVITY)
+    return times[keep], owner[keep]
+
+
+def _on_off(n, start, end, per_day, duration, rng):
+    # True at the start of each episode and False when it ends
+    on, owner = _episodes(n, start, end, per_day, rng)
+    off = np.minimum(on + rng.exponential(duration, on.shape) + 1, end)
+    times = np.concatenate([on, off])
+    values = np.concatenate([np.ones_like(on), np.zeros_like(off)])
+    return times, np.concatenate([owner, owner]), values
+
+
+def motion(sensors, start, end, interval, rng):
+    """Bursts of presence, about 12 a day following household activity, lasting minutes."""
+    return _on_off(len(sensors), start, end, 12, 4 * 60, rng)
+
+
+def door(sensors, start, end, interval, rng):
+    """Doors opened a few times a day, mostly mornings and evenings, closed within a minute or two."""
+    return _on_off(len(sensors), start, end, 6, 60, rng)
+
+
+def floor(sensors, start, end, interval, rng):
+    """Floors get dirty (False) with activity and are reported clean (True) again hours later."""
+    n = len(sensors)
+    dirty, owner = _episodes(n, start, end, 1.5, rng)
+    clean = np.minimum(dirty + rng.exponential(3 * HOUR, dirty.shape), end)
+    times = np.concatenate([dirty, clean])
+    values = np.concatenate([np.zeros_like(dirty), np.ones_like(clean)])
+    return times, np.concatenate([owner, owner]), values
+
+
+# sensor class -> model; subclasses use their closest listed base
+MODELS = {
+    TemperatureSensor: temperature,
+    HumiditySensor: humidity,
+    LightSensor: daylight,
+    SoilMoistureSensor: soil,
+    DirtSensor: dirt,
+    MotionSensor: motion,
+    DoorSensor: door,
+    FloorCleanSensor: floor,
+}
+
+
+def _model(cls):
+    for base in cls.__mro__:
+        if base in MODELS:
+            return MODELS[base]
+    return None
+
+
+def generate(sensors, start=None, days=1.0, interval=300.0, seed=0):
+    """A Trace of `days` days for `sensors`, starting at `start` (default: clock.now()).
+
+    Sampled sensors (temperature, humidity, light, soil, dirt) report every `interval`
+    seconds; event sensors (motion, door, floor) report when their state changes.
+    Sensors of types without a model are left out.
+    """
+    if np is None:
+        raise RuntimeError("Trace generation requires numpy (pip install numpy).")
+    rng = np.random.default_rng(seed)
+    start = clock.now() if start is None else start
+    end = start + days * DAY
+
+    groups = {}
+    for position, sensor in enumerate(sensors):
+        model = _model(type(sensor))
+        if model is not None:
+            groups.setdefault(model, []).append(position)
+
+    columns = []
+    for model, positions in groups.items():
+        members = [sensors[p] for p in positions]
+        result = model(members, start, end, interval, rng)
+        if len(result) == 2:
+            times, values = result
+            owner = np.broadcast_to(np.arange(len(members))[:, None], times.shape)
+        else:
+            times, owner, values = result
+        columns.append((times.ravel(), np.asarray(positions, dtype=np.int32)[owner.ravel()], values.ravel()))
+
+    if not columns:
+        empty = np.empty(0)
+        return Trace(sensors, empty, np.empty(0, dtype=np.int32), empty)
+    times, index, values = (np.concatenate(parts) for parts in zip(*columns))
+    keep = times < end
+    return Trace(sensors, times[keep], index[keep], values[keep].astype(np.float64))
+
+
+#replay
+
+def replay(controller, trace, speedup=None, batch=60.0):
+    """Feeds `trace` to `controller`, one ingest_batch() and rule pass per `batch` trace seconds.
+
+    With `speedup` the replay is paced against the wall clock (speedup=60: one trace
+    minute per second); without it, it runs as fast as it can. Timers and schedules
+    are advanced to each batch's trace time, and a VirtualClock, when installed,
+    follows the trace. Returns the throughput and the device actions triggered.
+    """
+    virtual = clock.get_clock() if isinstance(clock.get_clock(), clock.VirtualClock) else None
+    readings = trace.readings()
+    pending = next(readings, None)
+    if pending is None:
+        return _report(0, 0, 0, 0.0, 0.0, [])
+
+    begin = pending[2]
+    accepted = rejected = batches = 0
+    actions = []
+    wall_start = time.perf_counter()
+    edge = begin
+    while pending is not None:
+        edge += batch
+        readings_batch = []
+        while pending is not None and pending[2] < edge:
+            readings_batch.append(pending)
+            pending = next(readings, None)
+        if not readings_batch:
+            # skip idle stretches of the trace in one step
+            edge = pending[2] - (pending[2] - edge) % batch
+            continue
+
+        now = readings_batch[-1][2]
+        if speedup:
+            delay = (now - begin) / speedup - (time.perf_counter() - wall_start)
+            if delay > 0:
+                time.sleep(delay)
+        if virtual is not None and now > virtual.now:
+            virtual.set(now)
+        stamped = controller.tick(now) + controller.run_schedules(now)
+        report = controller.ingest_batch(readings_batch)
+        stamped += report["actions"]
+        actions.extend((now, *action) for action in stamped)
+        accepted += report["accepted"]
+        rejected += report["rejected"]
+        batches += 1
+
+    wall = time.perf_counter() - wall_start
+    return _report(accepted, rejected, batches, wall, now - begin, actions)
+
+
+def _report(accepted, rejected, batches, wall, simulated, actions):
+    readings = accepted + rejected
+    return {
+        "readings": readings,
+        "accepted": accepted,
+        "rejected": rejected,
+        "batches": batches,
+        "wall_s": wall,
+        "simulated_s": simulated,
+        "readings_per_s": readings / wall if wall else 0.0,
+        "speedup": simulated / wall if wall else 0.0,
+        "actions": actions,  # [(timestamp, device, field, old, new)]
+        "triggered": dict(Counter((device, field, new) for _, device, field, old, new in actions)),
+    }
+
+
+def format_replay(report, top=10):
+    """The replay report as a few lines of text: throughput, then the most frequent actions."""
+    lines = [
+        f"{report['readings']:,} readings ({report['rejected']:,} rejected) in {report['batches']:,} batches, "
+        f"{report['wall_s']:.2f} s",
+        f"{report['readings_per_s']:,.0f} readings/s, {report['speedup']:,.0f}x real time, "
+        f"{len(report['actions']):,} device actions",
+    ]
+    ranked = sorted(report["triggered"].items(), key=lambda item: -item[1])[:top]
+    for (device, field, new), count in ranked:
+        lines.append(f"  {count:>8,}  {device}: {field} -> {new}")
+    return "\n".join(lines)
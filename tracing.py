@@ -0,0 +1,61 @@
+import logging
+from collections import deque
+
+
+ROOT_LOGGER = "homi"
+
+# quiet by default: until configure() is called only warnings reach the console,
+# and every debug/info call returns before any message is formatted
+logging.getLogger(ROOT_LOGGER).setLevel(logging.WARNING)
+
+
+def get_logger(name):
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last `capacity` log records in memory.
+
+    Records are stored as-is; their messages are only formatted when read back.
+    """
+
+    def __init__(self, capacity=1000, level=logging.NOTSET):
+        super().__init__(level)
+        self.buffer = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.buffer.append(record)
+
+    def records(self, level=logging.NOTSET, logger=None):
+        return [r for r in self.buffer
+                if r.levelno >= level and (logger is None or r.name.startswith(logger))]
+
+    def messages(self, level=logging.NOTSET, logger=None):
+        return [f"{r.levelname:<7} {r.name}: {r.getMessage()}" for r in self.records(level, logger)]
+
+    def clear(self):
+        self.buffer.clear()
+
+
+def configure(level=logging.INFO, console=True, ring_buffer=0):
+    """Sets the Homi log level and outputs; returns the ring buffer handler, if any."""
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(stream)
+    else:
+        root.addHandler(logging.NullHandler())
+
+    ring = None
+    if ring_buffer:
+        ring = RingBufferHandler(ring_buffer)
+        root.addHandler(ring)
+
+    root.propagate = False
+    return ring